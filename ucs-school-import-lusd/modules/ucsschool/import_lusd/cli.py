@@ -33,19 +33,23 @@ user and group data from LUSD and import the fetched data into
 the UCS@school domain.
 """
 import configparser
+import hashlib
 import json
 import logging
 import os
 import subprocess
 import sys
+import threading
 import time
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import jwt
 import requests
+from requests.adapters import HTTPAdapter
 
 from ucsschool.lib.models.school import School
 from ucsschool.lib.models.utils import get_file_handler, get_stream_handler
@@ -57,6 +61,9 @@ CONFIG_PATH: Path = Path("/etc/ucs-school-import-lusd/config.ini")
 LOCK_FILE = Path("/var/lib/ucs-school-import-lusd/lock")
 LOG_FILE = Path("/var/log/univention/ucs-school-import-lusd.log")
 
+TOKEN_LIFETIME = 30
+TOKEN_RENEWAL_MARGIN = 5
+
 ROLE_STUDENT = "student"
 ROLE_TEACHER = "teacher"
 
@@ -80,9 +87,12 @@ class Configuration:
     teacher_import_config_path: Path
 
     log_level: str = "ERROR"
+    force_import: bool = False
+    fetch_workers: int = 4
     school_id_map: Dict[str, List[str]] = field(default_factory=dict)
     authentication_key_file_path: Path = Path("/var/lib/ucs-school-import-lusd/auth_key")
     lusd_data_save_path: Path = Path("/var/lib/ucs-school-import-lusd/data/")
+    import_state_path: Path = Path("/var/lib/ucs-school-import-lusd/import_state.json")
     ucs_school_import_cli: Path = Path("/usr/share/ucs-school-import/scripts/ucs-school-user-import")
 
     def validate(self) -> None:
@@ -108,6 +118,11 @@ class Configuration:
         if not self.lusd_api_url:
             raise ConfigurationError(f"No valid LUSD API URL given: {self.lusd_api_url}.")
 
+        if self.fetch_workers < 1:
+            raise ConfigurationError(
+                f"Number of fetch workers must be at least 1, is: {self.fetch_workers}."
+            )
+
         if self.log_level not in LOG_LEVELS:
             raise ConfigurationError(
                 f"Not a valid log level: {self.log_level}, choose from: {LOG_LEVELS}"
@@ -144,6 +159,8 @@ class ImportLUSD:
             teacher_import_config_path=Path(file_config["Settings"]["teacher_import_config_path"]),
             dry_run=args.dry_run,
             skip_fetch=args.skip_fetch,
+            force_import=args.force_import,
+            fetch_workers=file_config["Settings"].getint("fetch_workers", fallback=4),
             log_level=args.log_level if args.log_level else file_config["Settings"]["log_level"],
             school_id_map=normalize_schools(dict(file_config["SchoolMappings"])),
             lusd_api_url=os.environ.get("LUSD_URL", "https://ucs.hessen.de"),
@@ -159,36 +176,70 @@ class ImportLUSD:
         except (ConfigurationError, FileNotFoundError) as exc:
             logger.error(exc)
             sys.exit(1)
+        self._session: Optional[requests.Session] = None
+        self._token: Optional[Tuple[str, int]] = None
+        self._token_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session reusing connections to the LUSD API, shared by the fetch threads"""
+        if self._session is None:
+            adapter = HTTPAdapter(pool_maxsize=self.configuration.fetch_workers)
+            self._session = requests.Session()
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+        return self._session
 
     def run_import(self) -> None:
         if not self.configuration.skip_fetch:
             self.fetch_and_store_lusd_data()
         else:
             logger.info("Skipping LUSD data download")
+        import_state = self.load_import_state()
         for school_name in self.configuration.school_id_map.keys():
-            self.run_sisopi_import(school_name)
+            self.run_sisopi_import(school_name, import_state)
 
     def fetch_and_store_lusd_data(self) -> None:
-        """fetch and store data for all configured schools"""
-        for school_name in self.configuration.school_id_map.keys():
-            school_ids = self.configuration.school_id_map[school_name]
-
-            for role in (ROLE_STUDENT, ROLE_TEACHER):
-                logger.info(f"Starting download of LUSD data for role: {role}, in school: {school_name}")
-                file_path = self.get_lusd_data_save_path(school_name, role)
-                data = self.fetch_school_lusd_data(school_ids, role, file_path)
-                data_dir_path = self.configuration.lusd_data_save_path.joinpath(school_name)
-                data_dir_path.mkdir(parents=True, exist_ok=True)
-                data_path = data_dir_path.joinpath(f"{role}.json")
-                with open(data_path, "w") as f:
-                    json.dump(data, f, indent=2)
-                logger.info(f"Finished download of LUSD data for role: {role}, in school: {school_name}")
-                logger.debug(f"Data saved to {data_path}")
+        """fetch and store data for all configured schools, `fetch_workers` at a time"""
+        jobs = [
+            (school_name, role)
+            for school_name in self.configuration.school_id_map.keys()
+            for role in (ROLE_STUDENT, ROLE_TEACHER)
+        ]
+        with ThreadPoolExecutor(max_workers=self.configuration.fetch_workers) as executor:
+            futures = [executor.submit(self.fetch_and_store_school_lusd_data, *job) for job in jobs]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            for future in done:
+                # re-raise the exception (or SystemExit) of a failed download
+                future.result()
+
+    def fetch_and_store_school_lusd_data(self, school_name: str, role: str) -> None:
+        """fetch and store data for role `role` in school `school_name`"""
+        logger.info(f"Starting download of LUSD data for role: {role}, in school: {school_name}")
+        data_path = self.get_lusd_data_save_path(school_name, role)
+        data = self.fetch_school_lusd_data(
+            self.configuration.school_id_map[school_name], role, data_path
+        )
+        tmp_path = data_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        tmp_path.replace(data_path)
+        logger.info(f"Finished download of LUSD data for role: {role}, in school: {school_name}")
+        logger.debug(f"Data saved to {data_path}")
 
     def get_bearer_token(self) -> str:
+        """Return a JWT, it is reused until shortly before it expires"""
+        with self._token_lock:
+            if self._token is None or self._token[1] - time.time() < TOKEN_RENEWAL_MARGIN:
+                self._token = self.create_bearer_token()
+            return self._token[0]
+
+    def create_bearer_token(self) -> Tuple[str, int]:
         private_key_file = self.configuration.authentication_key_file_path
         issued_at_time = int(time.time())
-        expiration_time = int(issued_at_time + 30)
+        expiration_time = int(issued_at_time + TOKEN_LIFETIME)
         jwt_payload = {
             "iss": self.configuration.lusd_api_oauth_iss,
             "aud": "LUSD externer Datenaustausch",
@@ -200,7 +251,7 @@ class ImportLUSD:
         except ValueError:
             logger.error(f"The authentication key {private_key_file} is not valid. Not a pem file?")
             sys.exit(1)
-        return str(jwt_token.decode())
+        return str(jwt_token.decode()), expiration_time
 
     def fetch_school_lusd_data(self, school_ids: List[str], role: str, file_path: Path) -> Any:
         """Store LUSD data for school `school_ids` in `file_path`"""
@@ -223,7 +274,7 @@ class ImportLUSD:
             }
         ]
 
-        response = requests.post(
+        response = self.session.post(
             request_url, json=request_data, headers={"Authorization": f"Bearer {token}"}
         )
         try:
@@ -238,12 +289,50 @@ class ImportLUSD:
         data_dir_path = self.configuration.lusd_data_save_path.joinpath(school_name)
         if not data_dir_path.exists():
             logger.warning(f"Path does not exist, creating {data_dir_path}")
-            data_dir_path.mkdir(parents=True)
+            data_dir_path.mkdir(parents=True, exist_ok=True)
         data_path = data_dir_path.joinpath(f"{role}.json")
         return data_path
 
-    def run_sisopi_import(self, school_name: str) -> None:
-        """Run a single SiSoPi import for school `school_name`"""
+    def load_import_state(self) -> Dict[str, Dict[str, str]]:
+        """Load the fingerprints of the last successful import of each school and role"""
+        try:
+            with open(self.configuration.import_state_path) as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except ValueError as exc:
+            logger.warning(
+                f"Ignoring invalid import state {self.configuration.import_state_path}: {exc}"
+            )
+            return {}
+
+    def store_import_state(self, import_state: Dict[str, Dict[str, str]]) -> None:
+        tmp_path = self.configuration.import_state_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as fp:
+            json.dump(import_state, fp, indent=2, sort_keys=True)
+        tmp_path.replace(self.configuration.import_state_path)
+
+    @staticmethod
+    def get_import_fingerprint(input_file_path: Path, import_config: Path) -> str:
+        """Hash of the LUSD data and the import configuration used to import it"""
+        digest = hashlib.sha256()
+        for path in (input_file_path, import_config):
+            with open(path, "rb") as fp:
+                for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def run_sisopi_import(
+        self, school_name: str, import_state: Optional[Dict[str, Dict[str, str]]] = None
+    ) -> None:
+        """
+        Run a single SiSoPi import for school `school_name`
+
+        Roles whose LUSD data and import configuration did not change since
+        their last successful import (according to `import_state`) are skipped,
+        unless `force_import` is set. The state is not used in a dry-run.
+        """
         for role in (ROLE_STUDENT, ROLE_TEACHER):
             if role == ROLE_STUDENT:
                 import_config = self.configuration.student_import_config_path
@@ -251,6 +340,18 @@ class ImportLUSD:
                 import_config = self.configuration.teacher_import_config_path
 
             input_file_path = self.get_lusd_data_save_path(school_name, role)
+            fingerprint = None
+            if import_state is not None and not self.configuration.dry_run:
+                fingerprint = self.get_import_fingerprint(input_file_path, import_config)
+                if (
+                    not self.configuration.force_import
+                    and import_state.get(school_name, {}).get(role) == fingerprint
+                ):
+                    logger.info(
+                        f"Skipping import for role {role}, in school {school_name}: "
+                        "LUSD data unchanged since last import"
+                    )
+                    continue
             # Add log path
             cmd = [
                 str(self.configuration.ucs_school_import_cli),
@@ -279,6 +380,9 @@ class ImportLUSD:
                 stderr=None if logger.isEnabledFor(logging.DEBUG) else subprocess.DEVNULL,
             )
             logger.info(f"Finished import for role {role}, in school {school_name}")
+            if fingerprint:
+                import_state.setdefault(school_name, {})[role] = fingerprint
+                self.store_import_state(import_state)
 
     def setup_logging(self) -> None:
         logger.addHandler(get_stream_handler(self.configuration.log_level))
@@ -311,6 +415,13 @@ def get_args() -> Namespace:
         action="store_true",
         help=("Skip the fetching of LUSD DATA and import the previous data set again."),
     )
+    parser.add_argument(
+        "--force-import",
+        dest="force_import",
+        default=False,
+        action="store_true",
+        help="Import the data of all schools, even if it did not change since the last import.",
+    )
     parser.add_argument(
         "--dry-run",
         dest="dry_run",
@@ -198,6 +198,11 @@ def backup_files() -> Generator[None, None, None]:
         CONFIG_PATH.replace(backup_config)
     except FileNotFoundError:
         pass
+    backup_import_state = Configuration.import_state_path.with_suffix(backup_suffix)
+    try:
+        Configuration.import_state_path.replace(backup_import_state)
+    except FileNotFoundError:
+        pass
     yield
     try:
         backup_auth_key.replace(Configuration.authentication_key_file_path)
@@ -215,6 +220,10 @@ def backup_files() -> Generator[None, None, None]:
         backup_config.replace(CONFIG_PATH)
     except FileNotFoundError:
         pass
+    try:
+        backup_import_state.replace(Configuration.import_state_path)
+    except FileNotFoundError:
+        Configuration.import_state_path.unlink(missing_ok=True)
 
 
 @pytest.fixture()
@@ -306,6 +315,17 @@ def test_dry_run(config: None, server: threading.Thread) -> None:
     assert not lo.searchDn(filter_format("(ucsschoolSourceUID=%s)", (TEST_SOURCE_UID,)))
 
 
+def test_unchanged_data_not_imported_again(config: None, existing_data: None) -> None:
+    test_env = {**os.environ, "LUSD_URL": "http://univention.de"}
+    cmd = ["/usr/share/ucs-school-import-lusd/scripts/lusd_import", "--skip-fetch"]
+    output = subprocess.check_output(cmd, env=test_env, text=True)  # nosec
+    assert "Skipping import" not in output
+    output = subprocess.check_output(cmd, env=test_env, text=True)  # nosec
+    assert output.count("Skipping import") == 4
+    output = subprocess.check_output(cmd + ["--force-import"], env=test_env, text=True)  # nosec
+    assert "Skipping import" not in output
+
+
 def test_skip_fetch_and_dry_run(config: None, existing_data: None) -> None:
     test_env = {**os.environ, "LUSD_URL": "http://univention.de"}
     subprocess.check_call(  # nosec
@@ -49,6 +49,23 @@ urlpatterns = [
     # url(r'^docs/', include_docs_urls(title='UCS@school import API'))
     url(r"^admin/", admin.site.urls),
     url(r"^api-auth/", include("rest_framework.urls", namespace="rest_framework")),
+    # streamed content of imports/users/<ID>/<log|pass|sum>/ (before those, their regexes
+    # would match)
+    url(
+        r"^(?P<version>(v1))/imports/users/(?P<pk>\d+)/logfile/raw/$",
+        views.LogFileViewSet.as_view({"get": "raw"}),
+        name="logfile-raw",
+    ),
+    url(
+        r"^(?P<version>(v1))/imports/users/(?P<pk>\d+)/passwords/raw/$",
+        views.PasswordsViewSet.as_view({"get": "raw"}),
+        name="passwordsfile-raw",
+    ),
+    url(
+        r"^(?P<version>(v1))/imports/users/(?P<pk>\d+)/summary/raw/$",
+        views.SummaryViewSet.as_view({"get": "raw"}),
+        name="summaryfile-raw",
+    ),
     # URLs for hyperlinked relationships from imports/users/<ID>/<log|pass|sum>/ back to
     # imports/users/<ID>/
     url(
@@ -349,6 +349,8 @@ class Client(object):
 
     LOG_REQUEST = 5
     LOG_RESPONSE = 4
+    POOL_CONNECTIONS = 1
+    POOL_MAXSIZE = 4
 
     def __init__(
         self,
@@ -380,6 +382,13 @@ class Client(object):
         self.base_url = "https://{}/api/v{}/".format(self.server, self.version)
         self.logger = self._setup_logging(log_level)
         self._resource_urls = None
+        # reuse connections (HTTP keep-alive) for all requests of this client
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS, pool_maxsize=self.POOL_MAXSIZE
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.logger.debug("Registering resources and methods:")
         for kls in get_resource_client_classes():
             cls_name = kls.__name__.lower().strip("_")
@@ -396,6 +405,10 @@ class Client(object):
                 ),
             )
 
+    def close(self):
+        """Close the connections of this client."""
+        self.session.close()
+
     @property
     def resource_urls(self):
         if not self._resource_urls:
@@ -466,7 +479,7 @@ class Client(object):
         self.logger.request(
             "%s(%s)", method, ", ".join("{}={!r}".format(k, v) for k, v in log_request_kwargs.items())
         )
-        meth = getattr(requests, method)
+        meth = getattr(self.session, method)
         try:
             response = meth(**request_kwargs)
         except requests.ConnectionError as exc:
@@ -510,7 +523,8 @@ class Client(object):
         def _to_python(self, resource):
             if resource is None:
                 return None
-            elif all(key in resource for key in ("count", "next", "previous", "results")):
+            elif all(key in resource for key in ("next", "previous", "results")):
+                # paginated list, with "count" (limit-offset) or without (keyset pagination)
                 return ResourceRepresentationIterator(self, resource)
             return ResourceRepresentation.get_repr(self, resource)
 
@@ -548,7 +562,8 @@ class Client(object):
             :return: Resource object
             :rtype: ResourceRepresentation
             """
-            list_kwargs = {"ordering": "-{}".format(self.pk_name), "limit": "1"}
+            # with keyset pagination ('cursor') the server does not count all resources
+            list_kwargs = {"ordering": "-{}".format(self.pk_name), "limit": "1", "cursor": ""}
             list_kwargs.update(params)
             for ioj in self.list(**list_kwargs):
                 return ioj
@@ -561,6 +576,9 @@ class Client(object):
             All arguments will be passed as parameters to the request. Example:
             list(status=['Aborted', 'Finished'], dryrun=False, ordering='id', limit=1)
 
+            Pass `cursor=''` to use keyset pagination, if the resource supports it
+            (import jobs). It is faster for long lists.
+
             :param params: arguments to pass as parameters to the request
             :return: list of Resource objects
             :rtype: ResourceRepresentationIterator
@@ -627,6 +645,60 @@ class Client(object):
                 self.client.call_api("post", self.resource_url, data=data, files=files)
             )
 
+        def resume(self, pk):
+            """
+            Resume an aborted UserImportJob, skipping the users it already created, modified or
+            deleted.
+
+            :param int pk: ID of the UserImportJob
+            :return: the UserImportJob resource
+            :rtype: _ResourceReprBase
+            """
+            assert isinstance(pk, string_types) or isinstance(pk, int)
+
+            url = urljoin(self.resource_url, "{}/resume/".format(url_quote(str(pk))))
+            return self._to_python(self.client.call_api("post", url))
+
+        def wait(self, pk, status=None, date_done=None, timeout=None):
+            """
+            Wait for a change of a UserImportJob.
+
+            Blocks until the jobs status or the `date_done` of its result (updated
+            with each progress notification) differ from the values passed, the
+            job has finished or `timeout` seconds have passed. Use this instead of
+            calling `get()` repeatedly to follow the progress of a job::
+
+                job = client.userimportjob.get(job_id)
+                while job.status not in ('Aborted', 'Finished'):
+                    job = client.userimportjob.wait(
+                        job.id, job.status, job.result and job.result.date_done
+                    )
+
+            :param int pk: ID of the UserImportJob
+            :param str status: last known status of the job, if `None` the job is
+                returned right away
+            :param date_done: last known `result.date_done` of the job, `None` if
+                it had no result
+            :type date_done: datetime.datetime or str or None
+            :param float timeout: maximum number of seconds to wait, omit to use
+                the servers default (which is also the servers maximum)
+            :return: the UserImportJob resource
+            :rtype: _ResourceReprBase
+            """
+            assert isinstance(pk, string_types) or isinstance(pk, int)
+
+            params = {}
+            if status is not None:
+                params["status"] = status
+                if date_done:
+                    params["date_done"] = (
+                        date_done if isinstance(date_done, string_types) else date_done.isoformat()
+                    )
+            if timeout is not None:
+                params["timeout"] = timeout
+            url = urljoin(self.resource_url, "{}/wait/".format(url_quote(str(pk))))
+            return self._to_python(self._resource_from_url(url, **params))
+
         @staticmethod
         def _get_mime_type(data):
             return MIME_TYPE.buffer(data)
@@ -47,6 +47,7 @@ from django.conf import settings
 from ucsschool.importer.exceptions import InitialisationError
 from ucsschool.importer.factory import load_class
 from ucsschool.importer.frontend.user_import_cmdline import UserImportCommandLine
+from ucsschool.importer.utils.progress import ThrottledProgressNotifier
 
 from .utils import get_wsgi_uid_gid
 
@@ -60,15 +61,19 @@ class HttpApiImportFrontend(UserImportCommandLine):
     http_api_specific_config = "user_import_http-api.json"
     import_initiator = "HTTP API"
     reader_class = "ucsschool.importer.reader.http_api_csv_reader.HttpApiCsvReader"
+    progress_interval = 1.0  # seconds between two job state updates with the same percentage
 
-    def __init__(self, import_job, task, logger):
+    def __init__(self, import_job, task, logger, resume=False):
         self.import_job = import_job
+        self.resume = resume
         self.task = task
         self.task_logger = logger
+        self.progress_notifier = ThrottledProgressNotifier(self.update_job_state, self.progress_interval)
         self.basedir = self.import_job.basedir
         self.hook_dir = os.path.join(self.basedir, "hooks")
         self.pyhook_dir = os.path.join(self.basedir, "pyhooks")
         self.logfile_path = os.path.join(self.basedir, "ucs-school-import.log")
+        self.journal_file = os.path.join(self.basedir, settings.UCSSCHOOL_IMPORT["journal_filename"])
         self.password_file = os.path.join(
             self.basedir, settings.UCSSCHOOL_IMPORT["new_user_passwords_filename"]
         )
@@ -83,10 +88,18 @@ class HttpApiImportFrontend(UserImportCommandLine):
         data_source_path = os.path.join(settings.MEDIA_ROOT, self.import_job.input_file.name)
 
         try:
-            os.makedirs(
-                self.basedir,
-                stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR | stat.S_IRGRP | stat.S_IWGRP | stat.S_IXOTH,
-            )  # 751: higher directories may be owned by root, but will be traversable
+            if self.resume and os.path.isdir(self.basedir):
+                self.task_logger.info("Resuming import job %r in %r.", self.import_job.pk, self.basedir)
+            else:
+                os.makedirs(
+                    self.basedir,
+                    stat.S_IRUSR
+                    | stat.S_IWUSR
+                    | stat.S_IXUSR
+                    | stat.S_IRGRP
+                    | stat.S_IWGRP
+                    | stat.S_IXOTH,
+                )  # 751: higher directories may be owned by root, but will be traversable
             os.chown(self.basedir, self.wsgi_uid, self.wsgi_gid)
             os.chmod(self.basedir, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)  # secure mode for our dir
         except os.error as exc:
@@ -100,14 +113,19 @@ class HttpApiImportFrontend(UserImportCommandLine):
         shutil.copy2(data_source_path, self.data_path)
         # copy hooks (to complete isolated and fully documented import job)
         # in the future support per-OU hook configurations?
-        shutil.copytree(
-            "/usr/share/ucs-school-import/pyhooks",
-            self.pyhook_dir,
-            ignore=shutil.ignore_patterns("*.py?"),
-        )
+        if not os.path.isdir(self.pyhook_dir):
+            shutil.copytree(
+                "/usr/share/ucs-school-import/pyhooks",
+                self.pyhook_dir,
+                ignore=shutil.ignore_patterns("*.py?"),
+            )
 
-        # set owner of password and summary files, so the WSGI user will be able to read them later
-        for path in (self.password_file, self.summary_file):
+        # set owner of password and summary files, so the WSGI user will be able to read them later,
+        # and of the journal, so the WSGI user can check if the job is running before resuming it
+        paths = [self.password_file, self.summary_file]
+        if not self.import_job.dryrun:
+            paths.append(self.journal_file)
+        for path in paths:
             with open(path, "ab") as fp:
                 os.fchown(fp.fileno(), self.wsgi_uid, self.wsgi_gid)
                 os.fchmod(fp.fileno(), stat.S_IRUSR | stat.S_IWUSR)
@@ -131,13 +149,19 @@ class HttpApiImportFrontend(UserImportCommandLine):
             "hooks_dir_legacy": self.hook_dir,
             "hooks_dir_pyhook": self.pyhook_dir,
             "input": {"filename": self.data_path},
+            "journal": {
+                "enabled": True,
+                "filename": self.journal_file,
+                "job": str(self.import_job.pk),
+                "resume": self.resume,
+            },
             "logfile": self.logfile_path,
             "output": {
                 "new_user_passwords": self.password_file,
                 "user_import_summary": self.summary_file,
             },
             "school": self.import_job.school.name,
-            "progress_notification_function": self.update_job_state,
+            "progress_notification_function": self.progress_notifier,
             "user_role": self.import_job.user_role,
         }
         if self.import_job.source_uid:
@@ -147,6 +171,18 @@ class HttpApiImportFrontend(UserImportCommandLine):
         )
         return self.args
 
+    def do_import(self):
+        try:
+            return super(HttpApiImportFrontend, self).do_import()
+        finally:
+            # always store the last progress notification
+            self.progress_notifier.flush()
+            self.logger.debug(
+                "Updated job state %d times, skipped %d progress notifications.",
+                self.progress_notifier.forwarded,
+                self.progress_notifier.suppressed,
+            )
+
     def setup_logging(self, stdout=False, filename=None, uid=None, gid=None, mode=None):
         return super(HttpApiImportFrontend, self).setup_logging(
             stdout=stdout,
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+
+"""
+Import permissions of users.
+
+A user may run imports for all combinations of schools and roles in the
+``ucsschoolImportGroup`` groups in LDAP the user is a member of. The groups of a
+user are cached for the number of seconds in the setting
+`permission_cache_timeout`, so that listing and retrieving resources does
+not search LDAP for each request (or each object). Creating import jobs
+always uses fresh data.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from ldap.filter import filter_format
+
+from ucsschool.importer.utils.ldap_connection import get_unprivileged_connection
+
+PERMISSION_CACHE_TIMEOUT = 60
+IMPORT_GROUP_FILTER = (
+    "(&"
+    "(objectClass=ucsschoolImportGroup)"
+    "(ucsschoolImportRole=*)"
+    "(ucsschoolImportSchool=*)"
+    "(memberUid=%s)"
+    ")"
+)
+# unicode_literals + python-ldap = TypeError:
+IMPORT_GROUP_ATTRS = (str("ucsschoolImportRole"), str("ucsschoolImportSchool"))
+
+
+def _cache_key(username):
+    return "ucsschool-import-groups-{}".format(
+        hashlib.sha256(username.lower().encode("UTF-8")).hexdigest()
+    )
+
+
+def get_import_groups(username, use_cache=True):
+    """
+    Get the schools and roles of the import groups of a user.
+
+    :param str username: name of the user
+    :param bool use_cache: whether a cached result may be returned, the result
+        is cached in any case
+    :return: 2-tuple (schools, roles) for each import group, any combination of
+        a school and a role of the same group is allowed
+    :rtype: tuple(tuple(frozenset(str), frozenset(str)))
+    """
+    timeout = settings.UCSSCHOOL_IMPORT.get("permission_cache_timeout", PERMISSION_CACHE_TIMEOUT)
+    key = _cache_key(username)
+    if use_cache and timeout:
+        groups = cache.get(key)
+        if groups is not None:
+            return groups
+    lo, po = get_unprivileged_connection()
+    ldap_result = lo.search(filter_format(IMPORT_GROUP_FILTER, (username,)), attr=IMPORT_GROUP_ATTRS)
+    groups = tuple(
+        (
+            frozenset(x.decode("UTF-8") for x in result_dict["ucsschoolImportSchool"]),
+            frozenset(x.decode("UTF-8") for x in result_dict["ucsschoolImportRole"]),
+        )
+        for _dn, result_dict in ldap_result
+    )
+    if timeout:
+        cache.set(key, groups, timeout)
+    return groups
+
+
+def is_allowed(username, school, role, use_cache=True):
+    """
+    Check if a user may run imports for a school and role. Like in LDAP, school
+    names are compared case-insensitively.
+
+    :param str username: name of the user
+    :param str school: name of the school or `*` for any school
+    :param str role: role or `*` for any role
+    :param bool use_cache: whether cached permissions may be used
+    :return: whether access is allowed
+    :rtype: bool
+    """
+    for schools, roles in get_import_groups(username, use_cache):
+        if _school_matches(school, schools) and (role == "*" or role in roles):
+            return True
+    return False
+
+
+def get_allowed_schools(username):
+    """
+    :param str username: name of the user
+    :return: names of the schools the user may run imports for (with any role)
+    :rtype: set(str)
+    """
+    return {school for schools, _roles in get_import_groups(username) for school in schools}
+
+
+def get_allowed_roles(username, school="*"):
+    """
+    :param str username: name of the user
+    :param str school: name of a school or `*` for any school
+    :return: roles the user may run imports for at `school`
+    :rtype: set(str)
+    """
+    return {
+        role
+        for schools, roles in get_import_groups(username)
+        if _school_matches(school, schools)
+        for role in roles
+    }
+
+
+def _school_matches(school, schools):
+    return school == "*" or school.lower() in {s.lower() for s in schools}
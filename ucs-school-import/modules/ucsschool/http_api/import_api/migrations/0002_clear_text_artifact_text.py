@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os.path
+
+from django.db import migrations
+
+
+def clear_text(apps, schema_editor):
+    """
+    Artifacts are read from their files now. Remove the copies of files that
+    still exist from the database.
+    """
+    TextArtifact = apps.get_model("import_api", "TextArtifact")
+    for pk, path in TextArtifact.objects.exclude(text="").values_list("pk", "path").iterator():
+        if os.path.isfile(path):
+            TextArtifact.objects.filter(pk=pk).update(text="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("import_api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_text, migrations.RunPython.noop),
+    ]
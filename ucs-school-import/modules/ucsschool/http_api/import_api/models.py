@@ -35,11 +35,12 @@
 from __future__ import unicode_literals
 
 import codecs
+import io
 import logging
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django_celery_results.models import TaskResult
 from ldap.filter import filter_format
 
@@ -245,18 +246,30 @@ class School(models.Model):
         :param str ou_str: name of School object to update, all will be updated if None
         :return: None
         """
-        names = []
         res = cls._get_ous_from_ldap(ou_str)
         if ou_str and not res:
             raise RuntimeError("Unknown school {!r}.".format(ou_str))
+        ldap_display_names = {}
         for _dn, ou in res:
             name = ou["ou"][0].decode("UTF-8")
-            display_name = ou.get("displayName", [ou["ou"][0]])[0].decode("UTF-8")
-            obj, created = cls.objects.get_or_create(name=name, defaults={"displayName": display_name})
-            if not created and obj.displayName != display_name:
-                obj.displayName = display_name
-                obj.save()
-            names.append(name)
+            ldap_display_names[name] = ou.get("displayName", [ou["ou"][0]])[0].decode("UTF-8")
+        names = list(ldap_display_names)
+        # one query for all existing schools, instead of one per school
+        display_names = dict(cls.objects.filter(name__in=names).values_list("name", "displayName"))
+        new_objs = []
+        for name, display_name in ldap_display_names.items():
+            if name not in display_names:
+                new_objs.append(cls(name=name, displayName=display_name))
+            elif display_names[name] != display_name:
+                cls.objects.filter(name=name).update(displayName=display_name)
+        if new_objs:
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create(new_objs)
+            except IntegrityError:
+                # created concurrently by another request
+                for obj in new_objs:
+                    cls.objects.get_or_create(name=obj.name, defaults={"displayName": obj.displayName})
         if not ou_str:
             # delete OUs not in LDAP (anymore)
             cls.objects.exclude(name__in=names).delete()
@@ -282,15 +295,37 @@ class TextArtifact(models.Model):
     __unicode__ = __str__
 
     def get_text(self):
-        if not self.text:
-            try:
-                with codecs.open(self.path, "rb", encoding="utf-8") as fp:
-                    self.text = fp.read()
-            except IOError as exc:
-                logger = logging.getLogger(__name__)
-                logger.error("Could not read %r: %s", self.path, exc)
-                return ""
-        return self.text
+        """
+        Read the whole artifact. The file is read on every call, its content is
+        not stored in the database. The `text` field is only set for artifacts
+        stored by older versions, which is returned then.
+
+        Use :py:meth:`open` to stream (parts of) large files.
+
+        :return: content of the artifact
+        :rtype: str
+        """
+        if self.text:
+            return self.text
+        try:
+            with codecs.open(self.path, "rb", encoding="utf-8") as fp:
+                return fp.read()
+        except IOError as exc:
+            logger = logging.getLogger(__name__)
+            logger.error("Could not read %r: %s", self.path, exc)
+            return ""
+
+    def open(self):
+        """
+        Open the artifact for reading bytes.
+
+        :return: file object
+        :rtype: file
+        :raises IOError: if the file cannot be read (and no `text` is stored)
+        """
+        if self.text:
+            return io.BytesIO(self.text.encode("utf-8"))
+        return open(self.path, "rb")
 
     def get_userimportjob(self):
         return self.userimportjob
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+Scheduling of import jobs.
+
+Real import jobs of the same school run one after the other, in the order
+they were created. Jobs of different schools may run concurrently (as many as
+the Celery ``import`` worker has processes). Dry-runs do not modify LDAP: they
+run in their own ``dryrun`` worker and are never delayed by import jobs.
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import errno
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+
+from celery.utils import uuid
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import JOB_ABORTED, JOB_SCHEDULED
+from .models import UserImportJob
+
+SCHOOL_LOCK_DIR = "/var/lib/ucs-school-import/locks"
+SCHOOL_LOCK_RETRY_INTERVAL = 10
+SCHOOL_QUEUE_MAX_AGE = 86400
+
+logger = logging.getLogger(__name__)
+
+
+class SchoolBusy(Exception):
+    """Another import job of the same school must run first."""
+
+    pass
+
+
+def get_setting(name, default):
+    return settings.UCSSCHOOL_IMPORT.get(name, default)
+
+
+def dispatch_job(importjob, task, **kwargs):
+    """
+    Mark `importjob` as scheduled and send its Celery task once the current
+    database transaction has committed. The worker can start the job right
+    away, as it finds the job in state `JOB_SCHEDULED` with its task ID.
+    If the task cannot be sent, the job is set to `JOB_ABORTED`, so it does
+    not delay the following jobs of its school.
+
+    :param UserImportJob importjob: the job to run
+    :param task: Celery task to run the job with, called with the jobs ID
+    :param kwargs: additional keyword arguments for the task
+    :return: None
+    """
+    importjob.task_id = uuid()
+    importjob.status = JOB_SCHEDULED
+    importjob.save(update_fields=("task_id", "status"))
+    task_id = importjob.task_id
+
+    def send_task():
+        try:
+            task.apply_async(args=(importjob.pk,), kwargs=kwargs, task_id=task_id)
+        except Exception as exc:
+            logger.exception(
+                "Could not send the task of import job %r, aborting it: %s", importjob.pk, exc
+            )
+            UserImportJob.objects.filter(pk=importjob.pk, task_id=task_id, status=JOB_SCHEDULED).update(
+                status=JOB_ABORTED
+            )
+
+    transaction.on_commit(send_task)
+
+
+def get_preceding_job(importjob):
+    """
+    Get the oldest real import job of the same school that was created before
+    `importjob` and has not started yet. Only jobs in state `JOB_SCHEDULED`
+    are considered: jobs in state `JOB_NEW` never had a task sent and jobs
+    whose task could not be sent are aborted by :py:func:`dispatch_job`.
+    Jobs that have been waiting longer than the setting
+    `school_queue_max_age` (seconds) are ignored, so a task lost otherwise
+    cannot block a school forever.
+
+    :param UserImportJob importjob: the job that wants to start
+    :return: the job to run first or None
+    :rtype: UserImportJob or None
+    """
+    min_date = timezone.now() - datetime.timedelta(
+        seconds=get_setting("school_queue_max_age", SCHOOL_QUEUE_MAX_AGE)
+    )
+    return (
+        UserImportJob.objects.filter(
+            school=importjob.school,
+            dryrun=False,
+            pk__lt=importjob.pk,
+            status=JOB_SCHEDULED,
+            date_created__gte=min_date,
+        )
+        .order_by("pk")
+        .first()
+    )
+
+
+@contextmanager
+def school_lock(school_name):
+    """
+    Context manager holding an exclusive lock for the import into a school.
+    The lock is a :py:func:`fcntl.flock` on a file in the directory in the
+    setting `school_lock_dir`, so it is released by the OS if the worker dies.
+
+    :param str school_name: name of the school (OU)
+    :raises SchoolBusy: if another job holds the lock
+    """
+    lock_dir = get_setting("school_lock_dir", SCHOOL_LOCK_DIR)
+    try:
+        os.makedirs(lock_dir, 0o700)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise
+    with open(os.path.join(lock_dir, "school-{}.lock".format(school_name)), "a") as fp:
+        try:
+            fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as exc:
+            if exc.errno in (errno.EACCES, errno.EAGAIN):
+                raise SchoolBusy("An import job of school {!r} is running.".format(school_name))
+            raise
+        try:
+            yield
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+@contextmanager
+def school_slot(importjob):
+    """
+    Context manager to run `importjob` exclusively for its school, after all
+    older jobs of the school.
+
+    :param UserImportJob importjob: the job to run
+    :raises SchoolBusy: if an older job of the school has not run yet or is running
+    """
+    preceding_job = get_preceding_job(importjob)
+    if preceding_job:
+        raise SchoolBusy(
+            "Import job {} of school {!r} has to run first.".format(
+                preceding_job.pk, importjob.school.name
+            )
+        )
+    with school_lock(importjob.school.name):
+        yield
+
+
+def get_retry_interval():
+    """
+    :return: number of seconds after which a delayed job tries again to start
+    :rtype: int
+    """
+    return get_setting("school_lock_retry_interval", SCHOOL_LOCK_RETRY_INTERVAL)
@@ -45,15 +45,15 @@ import lazy_object_proxy
 from django.conf import settings
 from django.contrib.auth.models import User
 from django_celery_results.models import TaskResult
-from ldap.filter import filter_format
 from rest_framework import serializers
 from rest_framework.exceptions import ParseError, PermissionDenied
 
-from ucsschool.importer.utils.ldap_connection import get_unprivileged_connection
 from ucsschool.lib.models.utils import ucr
 
-from .constants import JOB_NEW, JOB_SCHEDULED
+from .constants import JOB_NEW
+from .import_groups import is_allowed
 from .models import Logfile, PasswordsFile, Role, School, SummaryFile, TextArtifact, UserImportJob
+from .scheduling import dispatch_job
 from .tasks import dry_run, import_users
 
 
@@ -107,7 +107,10 @@ class UserImportJobCreationValidator(object):
                 "NotYetImplemented: Import jobs can currently only be run for one user role at a time."
             )
         if not self.is_user_school_role_combination_allowed(
-            username=self.request.user.username, school=data["school"].name, role=data["user_role"]
+            username=self.request.user.username,
+            school=data["school"].name,
+            role=data["user_role"],
+            use_cache=False,
         ):
             msg = (
                 "User {!r} is not allowed to start an import job for school {!r} and role "
@@ -117,29 +120,19 @@ class UserImportJobCreationValidator(object):
             raise PermissionDenied(msg)
 
     @classmethod
-    def is_user_school_role_combination_allowed(cls, username, school, role):
-        lo, po = get_unprivileged_connection()
-
-        # filter_format() will escape '*' as argument
-        filter_s = (
-            "(&"
-            "(objectClass=ucsschoolImportGroup)"
-            "(ucsschoolImportRole={role})"
-            "(ucsschoolImportSchool={school})"
-            "(memberUid=%s)"
-            ")".format(role="*" if role == "*" else "%s", school="*" if school == "*" else "%s")
-        )
-        args = []
-        if role != "*":
-            args.append(role)
-        if school != "*":
-            args.append(school)
-        args.append(username)
-        args = tuple(args)
-        res = lo.searchDn(filter_format(filter_s, args))
+    def is_user_school_role_combination_allowed(cls, username, school, role, use_cache=True):
+        """
+        :param str username: name of the user
+        :param str school: name of the school or `*` for any school
+        :param str role: role or `*` for any role
+        :param bool use_cache: whether the users cached permissions may be used
+        :return: whether access is allowed
+        :rtype: bool
+        """
+        res = is_allowed(username, school, role, use_cache)
         if not res:
             cls.logger.error("Not allowed: username: %r school: %r role: %r", username, school, role)
-        return bool(res)
+        return res
 
 
 class UserImportJobSerializer(serializers.HyperlinkedModelSerializer):
@@ -206,13 +199,10 @@ class UserImportJobSerializer(serializers.HyperlinkedModelSerializer):
         instance.save(update_fields=("basedir",))
         if instance.dryrun:
             self.logger.info("Scheduling dry-run for ImportJob with ID %r.", instance.pk)
-            result = dry_run.delay(instance.pk)
+            dispatch_job(instance, dry_run)
         else:
             self.logger.info("Scheduling real ImportJob with ID %r.", instance.pk)
-            result = import_users.delay(instance.pk)
-        instance.task_id = result.task_id
-        instance.status = JOB_SCHEDULED
-        instance.save(update_fields=("task_id", "status"))
+            dispatch_job(instance, import_users)
         return instance
 
 
@@ -41,7 +41,6 @@
 from __future__ import unicode_literals
 
 import logging
-import time
 
 from celery import shared_task
 from celery.utils.log import get_task_logger
@@ -57,6 +56,7 @@ from ucsschool.importer.exceptions import (
 from .constants import JOB_ABORTED, JOB_FINISHED, JOB_SCHEDULED, JOB_STARTED
 from .http_api_import_frontend import HttpApiImportFrontend
 from .models import Logfile, PasswordsFile, SummaryFile, UserImportJob
+from .scheduling import SchoolBusy, get_retry_interval, school_slot
 
 logger = get_task_logger(__name__)
 logger.level = logging.DEBUG
@@ -65,25 +65,21 @@ logging.root.setLevel(
 )  # someone sets this to DEBUG, and then we catch all of Djangos SQL queries!
 
 
-def run_import_job(task, importjob_id):
+def run_import_job(task, importjob_id, resume=False):
     try:
         importjob = UserImportJob.objects.get(pk=importjob_id)
     except ObjectDoesNotExist as exc:
         logger.exception(str(exc))
         raise
-    timeout = 10
-    while importjob.status != JOB_SCHEDULED:
-        # possible race condition: we write JOB_STARTED into DB before client
-        # (UserImportJobSerializer) writes JOB_SCHEDULED into DB
-        time.sleep(1)
-        importjob.refresh_from_db()
-        timeout -= 1
-        if timeout <= 0:
-            raise InitialisationError("{} did not reach JOB_SCHEDULED state in 60s.".format(importjob))
-    runner = HttpApiImportFrontend(importjob, task, logger)
-    importjob.log_file = Logfile.objects.create(path=runner.logfile_path)
-    importjob.password_file = PasswordsFile.objects.create(path=runner.password_file)
-    importjob.summary_file = SummaryFile.objects.create(path=runner.summary_file)
+    if importjob.status != JOB_SCHEDULED:
+        # the task is only sent after the job was committed in state JOB_SCHEDULED (see
+        # scheduling.dispatch_job()), so this is a duplicate or outdated task
+        raise InitialisationError("{} is not in JOB_SCHEDULED state.".format(importjob))
+    runner = HttpApiImportFrontend(importjob, task, logger, resume=resume)
+    # a resumed job reuses the files of the aborted run
+    importjob.log_file = Logfile.objects.get_or_create(path=runner.logfile_path)[0]
+    importjob.password_file = PasswordsFile.objects.get_or_create(path=runner.password_file)[0]
+    importjob.summary_file = SummaryFile.objects.get_or_create(path=runner.summary_file)[0]
     importjob.status = JOB_STARTED
     runner.update_job_state(description="Initializing: 0%.")
     try:
@@ -129,10 +125,22 @@ def run_import_job(task, importjob_id):
     return success, runner.user_import_summary_str
 
 
-@shared_task(bind=True)
-def import_users(self, importjob_id):
-    logger.info("Starting UserImportJob %d (%r).", importjob_id, self)
-    success, summary_str = run_import_job(self, importjob_id)
+@shared_task(bind=True, max_retries=None)
+def import_users(self, importjob_id, resume=False):
+    try:
+        importjob = UserImportJob.objects.select_related("school").get(pk=importjob_id)
+    except ObjectDoesNotExist as exc:
+        logger.exception(str(exc))
+        raise
+    try:
+        with school_slot(importjob):
+            logger.info(
+                "%s UserImportJob %d (%r).", "Resuming" if resume else "Starting", importjob_id, self
+            )
+            success, summary_str = run_import_job(self, importjob_id, resume)
+    except SchoolBusy as exc:
+        logger.info("Delaying UserImportJob %d: %s", importjob_id, exc)
+        raise self.retry(exc=exc, countdown=get_retry_interval())
     logger.info("Finished UserImportJob %d.", importjob_id)
     return HttpApiImportFrontend.make_job_state(
         description="UserImportJob #{} ended {}.\n\n{}".format(
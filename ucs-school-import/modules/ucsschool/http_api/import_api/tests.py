@@ -1,3 +1,389 @@
-# from django.test import TestCase
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
 
-# Create your tests here.
+"""
+Tests of the import HTTP API. Run with::
+
+    python3 -m ucsschool.http_api.manage test ucsschool.http_api.import_api
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+from rest_framework.test import APIClient
+
+from ucsschool.importer.utils.import_journal import ImportJournal
+
+from .constants import JOB_ABORTED, JOB_FINISHED, JOB_NEW, JOB_SCHEDULED, JOB_STARTED
+from .import_groups import _cache_key
+from .models import Logfile, School, UserImportJob
+from .scheduling import SchoolBusy, get_preceding_job, school_lock, school_slot
+from .utils import RangeNotSatisfiable, get_byte_range, iter_file
+
+
+class ImportJobTestMixin(object):
+    def setUp(self):
+        super(ImportJobTestMixin, self).setUp()
+        self.principal = User.objects.create(username="testadmin")
+        self.school = School.objects.create(name="testschool")
+        self.other_school = School.objects.create(name="otherschool")
+
+    def get_client(self):
+        """API client logged in as the principal, with permissions for all jobs of `self.school`."""
+        cache.set(
+            _cache_key(self.principal.username),
+            ((frozenset([self.school.name]), frozenset(["student"])),),
+        )
+        self.addCleanup(cache.clear)
+        client = APIClient()
+        client.force_authenticate(user=self.principal)
+        return client
+
+    def create_job(self, school=None, **kwargs):
+        values = {
+            "principal": self.principal,
+            "school": school or self.school,
+            "source_uid": "TestDB",
+            "user_role": "student",
+            "dryrun": False,
+            "status": JOB_SCHEDULED,
+            "basedir": "/tmp",
+            "input_file": "uploads/test.csv",
+        }
+        values.update(kwargs)
+        return UserImportJob.objects.create(**values)
+
+
+class SchedulingTest(ImportJobTestMixin, TestCase):
+    def setUp(self):
+        super(SchedulingTest, self).setUp()
+        self.lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.lock_dir)
+        ucsschool_import = dict(settings.UCSSCHOOL_IMPORT, school_lock_dir=self.lock_dir)
+        settings_override = self.settings(UCSSCHOOL_IMPORT=ucsschool_import)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_older_scheduled_job_of_school_runs_first(self):
+        first = self.create_job()
+        second = self.create_job()
+        third = self.create_job()
+        assert get_preceding_job(third) == first
+        assert get_preceding_job(second) == first
+        assert get_preceding_job(first) is None
+
+    def test_jobs_not_waiting_to_run_are_ignored(self):
+        self.create_job(school=self.other_school)
+        self.create_job(dryrun=True)
+        for status in (JOB_NEW, JOB_STARTED, JOB_ABORTED, JOB_FINISHED):
+            self.create_job(status=status)
+        job = self.create_job()
+        assert get_preceding_job(job) is None
+
+    def test_jobs_waiting_too_long_are_ignored(self):
+        old_job = self.create_job()
+        UserImportJob.objects.filter(pk=old_job.pk).update(
+            date_created=timezone.now() - datetime.timedelta(hours=2)
+        )
+        job = self.create_job()
+        with self.settings(UCSSCHOOL_IMPORT=dict(settings.UCSSCHOOL_IMPORT, school_queue_max_age=3600)):
+            assert get_preceding_job(job) is None
+        assert get_preceding_job(job) == old_job
+
+    def test_school_slot_waits_for_preceding_job(self):
+        self.create_job()
+        job = self.create_job()
+        with pytest.raises(SchoolBusy):
+            with school_slot(job):
+                pass
+
+    def test_school_lock_is_exclusive_per_school(self):
+        with school_lock(self.school.name):
+            with pytest.raises(SchoolBusy):
+                with school_lock(self.school.name):
+                    pass
+            with school_lock(self.other_school.name):
+                pass
+        with school_lock(self.school.name):
+            pass
+
+
+class WaitTest(ImportJobTestMixin, TestCase):
+    def setUp(self):
+        super(WaitTest, self).setUp()
+        self.client = self.get_client()
+        ucsschool_import = dict(settings.UCSSCHOOL_IMPORT, job_wait_poll_interval=0.05)
+        settings_override = self.settings(UCSSCHOOL_IMPORT=ucsschool_import)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def wait(self, job, **params):
+        start = time.time()
+        response = self.client.get("/v1/imports/users/{}/wait/".format(job.pk), params, secure=True)
+        return response, time.time() - start
+
+    def test_returns_when_timeout_is_reached(self):
+        job = self.create_job(status=JOB_STARTED)
+        response, duration = self.wait(job, status=JOB_STARTED, timeout=0.5)
+        assert response.status_code == 200
+        assert response.data["id"] == job.pk
+        assert response.data["status"] == JOB_STARTED
+        assert duration >= 0.5
+
+    def test_returns_at_once_if_status_differs(self):
+        job = self.create_job(status=JOB_STARTED)
+        response, duration = self.wait(job, status=JOB_SCHEDULED, timeout=5)
+        assert response.status_code == 200
+        assert response.data["status"] == JOB_STARTED
+        assert duration < 5
+
+    def test_returns_at_once_if_result_has_progressed(self):
+        result = TaskResult.objects.create(
+            task_id="progress-task", status="PROGRESS", result=json.dumps({"progress_state": {}})
+        )
+        job = self.create_job(status=JOB_STARTED, result=result)
+        date_done = result.date_done.isoformat()
+        response, duration = self.wait(job, status=JOB_STARTED, date_done=date_done, timeout=0.5)
+        assert response.status_code == 200
+        assert duration >= 0.5
+        # progress notification: the status stays the same, but date_done changes
+        TaskResult.objects.filter(pk=result.pk).update(
+            date_done=result.date_done + datetime.timedelta(seconds=1)
+        )
+        response, duration = self.wait(job, status=JOB_STARTED, date_done=date_done, timeout=5)
+        assert response.status_code == 200
+        assert response.data["status"] == JOB_STARTED
+        assert duration < 5
+
+    def test_returns_at_once_for_finished_job(self):
+        job = self.create_job(status=JOB_FINISHED)
+        response, duration = self.wait(job, status=JOB_FINISHED, timeout=5)
+        assert response.status_code == 200
+        assert response.data["status"] == JOB_FINISHED
+        assert duration < 5
+
+    def test_returns_at_once_without_known_status(self):
+        job = self.create_job(status=JOB_STARTED)
+        response, duration = self.wait(job, timeout=5)
+        assert response.status_code == 200
+        assert duration < 5
+
+    def test_invalid_timeout(self):
+        job = self.create_job(status=JOB_STARTED)
+        response, _duration = self.wait(job, status=JOB_STARTED, timeout="soon")
+        assert response.status_code == 400
+
+    def test_job_of_other_school_is_not_found(self):
+        job = self.create_job(school=self.other_school, status=JOB_STARTED)
+        response, _duration = self.wait(job, status=JOB_STARTED, timeout=5)
+        assert response.status_code == 404
+
+
+class ResumeTest(ImportJobTestMixin, TestCase):
+    def setUp(self):
+        super(ResumeTest, self).setUp()
+        self.client = self.get_client()
+        self.basedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.basedir)
+
+    def test_running_job_is_not_resumed(self):
+        job = self.create_job(status=JOB_STARTED, basedir=self.basedir, task_id="running-task")
+        filename = os.path.join(self.basedir, settings.UCSSCHOOL_IMPORT["journal_filename"])
+        journal = ImportJournal(filename)
+        journal.write([{"header": True}])
+        self.addCleanup(journal.close)
+        response = self.client.post("/v1/imports/users/{}/resume/".format(job.pk), secure=True)
+        assert response.status_code == 409
+        job.refresh_from_db()
+        assert job.status == JOB_STARTED
+        assert job.task_id == "running-task"
+
+    def test_dry_run_is_not_resumed(self):
+        job = self.create_job(status=JOB_ABORTED, basedir=self.basedir, dryrun=True)
+        response = self.client.post("/v1/imports/users/{}/resume/".format(job.pk), secure=True)
+        assert response.status_code == 400
+
+
+class ByteRangeTest(SimpleTestCase):
+    def test_whole_file(self):
+        assert get_byte_range(1000) == (0, 1000, False)
+
+    def test_range_header(self):
+        assert get_byte_range(1000, "bytes=0-99") == (0, 100, True)
+        assert get_byte_range(1000, "bytes=100-") == (100, 900, True)
+        assert get_byte_range(1000, "bytes=900-2000") == (900, 100, True)
+        # suffix range
+        assert get_byte_range(1000, "bytes=-100") == (900, 100, True)
+        assert get_byte_range(1000, "bytes=-2000") == (0, 1000, True)
+
+    def test_unsupported_range_header_is_ignored(self):
+        for range_header in ("bytes=5-2", "bytes=0-1,5-6", "items=0-1", "bytes=-"):
+            assert get_byte_range(1000, range_header) == (0, 1000, False)
+
+    def test_range_header_outside_of_file(self):
+        with pytest.raises(RangeNotSatisfiable):
+            get_byte_range(1000, "bytes=1000-")
+        with pytest.raises(RangeNotSatisfiable):
+            get_byte_range(0, "bytes=-5")
+
+    def test_offset(self):
+        assert get_byte_range(1000, offset=100) == (100, 900, False)
+        assert get_byte_range(1000, offset=1000) == (1000, 0, False)
+        assert get_byte_range(1000, offset=-100) == (900, 100, False)
+        assert get_byte_range(1000, offset=-2000) == (0, 1000, False)
+        with pytest.raises(RangeNotSatisfiable):
+            get_byte_range(1000, offset=1001)
+
+    def test_range_header_is_preferred_to_offset(self):
+        assert get_byte_range(1000, "bytes=10-19", 500) == (10, 10, True)
+
+    def test_iter_file(self):
+        fp = io.BytesIO(b"0123456789")
+        assert list(iter_file(fp, 3, 5, chunk_size=2)) == [b"34", b"56", b"7"]
+        assert fp.closed
+
+
+class RawArtifactTest(ImportJobTestMixin, TestCase):
+    content = b"".join(b"line %d\n" % num for num in range(1000))
+
+    def setUp(self):
+        super(RawArtifactTest, self).setUp()
+        self.client = self.get_client()
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(self.content)
+        self.job = self.create_job(status=JOB_STARTED, log_file=Logfile.objects.create(path=path))
+        self.url = "/v1/imports/users/{}/logfile/raw/".format(self.job.pk)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url, secure=True)
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == self.content
+        assert response["Accept-Ranges"] == "bytes"
+        assert response["X-Next-Offset"] == str(len(self.content))
+        assert response["X-Import-Job-Status"] == JOB_STARTED
+
+    def test_range(self):
+        response = self.client.get(self.url, secure=True, HTTP_RANGE="bytes=10-109")
+        assert response.status_code == 206
+        assert b"".join(response.streaming_content) == self.content[10:110]
+        assert response["Content-Length"] == "100"
+        assert response["Content-Range"] == "bytes 10-109/{}".format(len(self.content))
+
+    def test_offset(self):
+        response = self.client.get(self.url, {"offset": -100}, secure=True)
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == self.content[-100:]
+        response = self.client.get(self.url, {"offset": len(self.content)}, secure=True)
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == b""
+        assert response["X-Next-Offset"] == str(len(self.content))
+
+    def test_range_not_satisfiable(self):
+        response = self.client.get(
+            self.url, secure=True, HTTP_RANGE="bytes={}-".format(len(self.content))
+        )
+        assert response.status_code == 416
+        assert response["Content-Range"] == "bytes */{}".format(len(self.content))
+
+    def test_invalid_offset(self):
+        response = self.client.get(self.url, {"offset": "end"}, secure=True)
+        assert response.status_code == 400
+
+
+class ListImportJobsTest(ImportJobTestMixin, TestCase):
+    url = "/v1/imports/users/"
+
+    def setUp(self):
+        super(ListImportJobsTest, self).setUp()
+        self.client = self.get_client()
+        self.jobs = [self.create_job(status=JOB_FINISHED) for _ in range(5)]
+        # no permissions for this one
+        self.create_job(school=self.other_school, status=JOB_FINISHED)
+
+    def get_all_pages(self, params):
+        ids = []
+        response = self.client.get(self.url, params, secure=True)
+        while True:
+            assert response.status_code == 200
+            assert "count" not in response.data
+            ids.extend(job["id"] for job in response.data["results"])
+            if not response.data["next"]:
+                return ids
+            response = self.client.get(response.data["next"], secure=True)
+
+    def test_cursor_pagination(self):
+        assert self.get_all_pages({"cursor": "", "limit": 2}) == [job.pk for job in self.jobs]
+
+    def test_cursor_pagination_ordering(self):
+        assert self.get_all_pages({"cursor": "", "limit": 2, "ordering": "-id"}) == [
+            job.pk for job in reversed(self.jobs)
+        ]
+        assert self.get_all_pages({"cursor": "", "limit": 2, "ordering": "date_created"}) == [
+            job.pk for job in self.jobs
+        ]
+
+    def test_cursor_pagination_rejects_other_orderings(self):
+        for ordering in ("status", "-school", "id,status", "foo"):
+            response = self.client.get(self.url, {"cursor": "", "ordering": ordering}, secure=True)
+            assert response.status_code == 400, ordering
+
+    def test_limit_offset_pagination(self):
+        response = self.client.get(self.url, {"limit": 2, "offset": 2}, secure=True)
+        assert response.status_code == 200
+        assert response.data["count"] == len(self.jobs)
+        assert [job["id"] for job in response.data["results"]] == [job.pk for job in self.jobs[2:4]]
+
+    def test_number_of_queries_does_not_depend_on_number_of_jobs(self):
+        self.client.get(self.url, {"cursor": "", "limit": 1}, secure=True)
+        with CaptureQueriesContext(connection) as queries_few:
+            self.client.get(self.url, {"cursor": "", "limit": 2}, secure=True)
+        with CaptureQueriesContext(connection) as queries_many:
+            self.client.get(self.url, {"cursor": "", "limit": 5}, secure=True)
+        assert len(queries_few) == len(queries_many)
@@ -33,6 +33,15 @@
 
 import grp
 import pwd
+import re
+
+BYTE_RANGE_REGEX = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested byte range lies outside the file."""
+
+    pass
 
 
 def get_wsgi_user_group():
@@ -55,3 +64,75 @@ def get_wsgi_uid_gid():
     """
     user_name, group_name = get_wsgi_user_group()
     return pwd.getpwnam(user_name).pw_uid, grp.getgrnam(group_name).gr_gid
+
+
+def get_byte_range(size, range_header=None, offset=None):
+    """
+    Get the part of a file of `size` bytes to send, from either a HTTP `Range`
+    header or an offset. Only single byte ranges are supported, a header with
+    multiple ranges (or an invalid one) is ignored and the whole file is
+    returned, as allowed by RFC 7233.
+
+    The offset is meant to follow a growing file: the next request uses the
+    end of the previous response as offset. If it equals `size`, an empty range
+    is returned. A negative offset counts from the end of the file.
+
+    :param int size: size of the file
+    :param str range_header: value of the HTTP `Range` header
+    :param int offset: position to start at, used if `range_header` is not set
+    :return: tuple with the position of the first byte, the number of bytes
+        and whether it is a partial response to a `Range` request
+    :rtype: tuple(int, int, bool)
+    :raises RangeNotSatisfiable: if the range or offset lies outside the file
+    """
+    if range_header:
+        m = BYTE_RANGE_REGEX.match(range_header.strip())
+        if m and any(m.groups()):
+            first, last = m.groups()
+            if first and last and int(last) < int(first):
+                # invalid, like 'bytes=5-2'
+                return 0, size, False
+            if first:
+                start = int(first)
+                end = min(int(last) + 1, size) if last else size
+            else:
+                # suffix range: the last N bytes
+                start = max(0, size - int(last))
+                end = size
+            if start >= end:
+                raise RangeNotSatisfiable(
+                    "Range {!r} does not overlap file of {} bytes.".format(range_header, size)
+                )
+            return start, end - start, True
+        return 0, size, False
+    if offset is None:
+        return 0, size, False
+    if offset < 0:
+        offset = max(0, size + offset)
+    if offset > size:
+        raise RangeNotSatisfiable("Offset {} is after end of file.".format(offset))
+    return offset, size - offset, False
+
+
+def iter_file(fp, start, length, chunk_size=64 * 1024):
+    """
+    Read `length` bytes from `fp`, starting at position `start`, in chunks.
+    The file is closed when done.
+
+    :param file fp: file object opened in binary mode
+    :param int start: position to start reading at
+    :param int length: number of bytes to read
+    :param int chunk_size: maximum number of bytes per chunk
+    :return: iterator over chunks of bytes
+    :rtype: Iterator[bytes]
+    """
+    try:
+        fp.seek(start)
+        while length > 0:
+            chunk = fp.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fp.close()
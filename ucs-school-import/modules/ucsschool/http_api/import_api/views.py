@@ -35,25 +35,32 @@
 from __future__ import unicode_literals
 
 import logging
+import os
+import time
 
 import lazy_object_proxy
+from django.conf import settings
 from django.db.models import Q
-from django.http import Http404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 from django_filters import CharFilter, MultipleChoiceFilter
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
-from ldap.filter import filter_format
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import detail_route
 from rest_framework.exceptions import ParseError
 from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 from rest_framework.permissions import BasePermission, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from six.moves.urllib_parse import urljoin
 
-from ucsschool.importer.utils.ldap_connection import get_unprivileged_connection
+from ucsschool.importer.utils.import_journal import ImportJournal
 
+from .constants import JOB_ABORTED, JOB_FINISHED, JOB_STARTED
+from .import_groups import get_allowed_roles, get_allowed_schools, get_import_groups
 from .models import JOB_CHOICES, Role, School, TextArtifact, UserImportJob
+from .scheduling import dispatch_job
 from .serializers import (
     LogFileSerializer,
     PasswordFileSerializer,
@@ -63,6 +70,8 @@ from .serializers import (
     UserImportJobCreationValidator,
     UserImportJobSerializer,
 )
+from .tasks import import_users
+from .utils import RangeNotSatisfiable, get_byte_range, iter_file
 
 logger = lazy_object_proxy.Proxy(
     lambda: logging.Logger(__name__)  # noqa: LOG001
@@ -87,33 +96,74 @@ class UserImportJobFilter(FilterSet):
         return queryset.filter(principal__username=value)
 
 
+class UserImportJobCursorPagination(CursorPagination):
+    """
+    Keyset pagination: a page starts after the last object of the previous
+    page (``WHERE id > ..``) instead of skipping the preceding objects with
+    ``OFFSET`` and no ``COUNT`` query is executed. Only orderings by fields
+    that (nearly) never change and are (nearly) unique are accepted, the
+    cursor would skip or repeat objects otherwise.
+    """
+
+    ordering = "id"
+    page_size_query_param = "limit"
+    max_page_size = 1000
+    allowed_orderings = ("id", "-id", "date_created", "-date_created")
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(OrderingFilter.ordering_param)
+        if ordering and ordering.strip() not in self.allowed_orderings:
+            raise ParseError(
+                "Ordering {!r} is not supported with the 'cursor' parameter, use one of {}.".format(
+                    ordering, ", ".join(self.allowed_orderings)
+                )
+            )
+        return super(UserImportJobCursorPagination, self).get_ordering(request, queryset, view)
+
+    def decode_cursor(self, request):
+        # empty 'cursor' parameter: first page
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super(UserImportJobCursorPagination, self).decode_cursor(request)
+
+
+class UserImportJobPagination(LimitOffsetPagination):
+    """
+    Limit-offset pagination (the default) or keyset pagination
+    (:py:class:`UserImportJobCursorPagination`), if a `cursor` parameter is
+    passed. Keyset pagination stays fast for large job histories.
+    """
+
+    def __init__(self):
+        super(UserImportJobPagination, self).__init__()
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if UserImportJobCursorPagination.cursor_query_param in request.query_params:
+            self.cursor_paginator = UserImportJobCursorPagination()
+            page = self.cursor_paginator.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor_paginator.display_page_controls
+            return page
+        return super(UserImportJobPagination, self).paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super(UserImportJobPagination, self).get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator:
+            return self.cursor_paginator.to_html()
+        return super(UserImportJobPagination, self).to_html()
+
+
 class RoleFilterBackend(BaseFilterBackend):
     """Used to list only Roles the user has any permissions on."""
 
-    filter_s = (
-        "(&"
-        "(objectClass=ucsschoolImportGroup)"
-        "(ucsschoolImportRole=*)"
-        "(ucsschoolImportSchool={})"
-        "(memberUid=%s)"
-        ")"
-    )
-    # unicode_literals + python-ldap = TypeError:
-    filter_attrs = (str("ucsschoolImportRole"), str("ucsschoolImportSchool"))
-
     @classmethod
     def _build_query(cls, username, school):
-        lo, po = get_unprivileged_connection()
-        if school == "*":
-            # prevent filter_format() from escaping '*'
-            filter_s = filter_format(cls.filter_s.format("*"), (username,))
-        else:
-            filter_s = filter_format(cls.filter_s.format("%s"), (school, username))
-        ldap_result = lo.search(filter_s, attr=cls.filter_attrs)
-        role_names = []
-        for _dn, result_dict in ldap_result:
-            role_names.extend(x.decode("UTF-8") for x in result_dict["ucsschoolImportRole"])
-        return Q(name__in=role_names)
+        role_names = get_allowed_roles(username, school)
+        return Q(name__in=role_names) if role_names else None
 
     def filter_queryset(self, request, queryset, view):
         try:
@@ -130,25 +180,10 @@ class RoleFilterBackend(BaseFilterBackend):
 class SchoolFilterBackend(BaseFilterBackend):
     """Used to list only Schools the user has any permissions on."""
 
-    filter_s = (
-        "(&"
-        "(objectClass=ucsschoolImportGroup)"
-        "(ucsschoolImportRole=*)"
-        "(ucsschoolImportSchool=*)"
-        "(memberUid=%s)"
-        ")"
-    )
-    filter_attrs = (str("ucsschoolImportSchool"),)  # unicode_literals + python-ldap = TypeError
-
     @classmethod
     def _build_query(cls, username):
-        lo, po = get_unprivileged_connection()
-        filter_s = filter_format(cls.filter_s, (username,))
-        ldap_result = lo.search(filter_s, attr=cls.filter_attrs)
-        school_names = []
-        for _dn, result_dict in ldap_result:
-            school_names.extend(x.decode("UTF-8") for x in result_dict["ucsschoolImportSchool"])
-        return Q(name__in=school_names)
+        school_names = get_allowed_schools(username)
+        return Q(name__in=school_names) if school_names else None
 
     def filter_queryset(self, request, queryset, view):
         query = self._build_query(request.user.username)
@@ -161,28 +196,11 @@ class SchoolFilterBackend(BaseFilterBackend):
 class UserImportJobFilterBackend(BaseFilterBackend):
     """Used to list only ImportJobs the user has any permissions on."""
 
-    filter_s = (
-        "(&"
-        "(objectClass=ucsschoolImportGroup)"
-        "(ucsschoolImportRole=*)"
-        "(ucsschoolImportSchool=*)"
-        "(memberUid=%s)"
-        ")"
-    )
-    # unicode_literals + python-ldap = TypeError:
-    filter_attrs = (str("ucsschoolImportRole"), str("ucsschoolImportSchool"))
-
     @classmethod
     def _build_query(cls, username):
-        lo, po = get_unprivileged_connection()
-        filter_s = filter_format(cls.filter_s, (username,))
-        ldap_result = lo.search(filter_s, attr=cls.filter_attrs)
         query = None
-        for _dn, result_dict in ldap_result:
-            q = Q(
-                school__name__in=[x.decode("UTF-8") for x in result_dict["ucsschoolImportSchool"]],
-                user_role__in=[x.decode("UTF-8") for x in result_dict["ucsschoolImportRole"]],
-            )  # AND
+        for schools, roles in get_import_groups(username):
+            q = Q(school__name__in=schools, user_role__in=roles)  # AND
             try:
                 query |= q  # OR
             except TypeError:
@@ -293,10 +311,25 @@ class UserImportJobViewSet(
     * `input_file` has to be the key for a multipart-encoded file upload
     * `school` must be an absolute URI from `/{version}/schools/`
     * `user_role` must be one of `staff`, `student`, `teacher`, `teacher_and_staff`
+    * A POST request to `/{version}/imports/users/{pk}/resume/` resumes an aborted import job (not a
+      dry-run), skipping the users it already created, modified or deleted. It fails with status 409
+      while the job is still running.
+    * Lists are paginated with `limit` and `offset`. Pass `cursor` (empty for the first page) to use
+      keyset pagination instead. It returns no `count`, but its pages are fast, regardless of the
+      number of import jobs. Use it with the default ordering (by `id`) or by `date_created`, other
+      orderings are rejected.
+    * A GET request to `/{version}/imports/users/{pk}/wait/?status=..&date_done=..&timeout=..` blocks
+      until the job's `status` or the `date_done` of its `result` (updated with each progress
+      notification) differ from the passed values, the job has finished or `timeout` seconds have
+      passed. It then returns the job like a GET request to `/{version}/imports/users/{pk}/`.
     """
 
-    queryset = UserImportJob.objects.all()
+    # fetch all objects the serializer and permission checks use in the same query
+    queryset = UserImportJob.objects.select_related(
+        "principal", "result", "school", "log_file", "password_file", "summary_file"
+    )
     serializer_class = UserImportJobSerializer
+    pagination_class = UserImportJobPagination
     filter_backends = (
         UserImportJobFilterBackend,  # filter the queryset for allowed school-user_role-combinations
         DjangoFilterBackend,  # used to filter view by attribute
@@ -309,6 +342,7 @@ class UserImportJobViewSet(
         UserImportJobViewPermission,  # apply per view and per-object permission checks
     )
     ordering_fields = ("id", "school", "source_uid", "status", "principal", "dryrun", "date_created")
+    ordering = ("id",)
 
     def perform_create(self, serializer):
         # store user when saving object
@@ -357,6 +391,77 @@ class UserImportJobViewSet(
             del d["input_file"]
         return Response(data)
 
+    @detail_route(methods=["post"], url_path="resume")
+    def resume(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if instance.dryrun or instance.status not in (JOB_STARTED, JOB_ABORTED):
+            raise ParseError(
+                "Only import jobs (not dry-runs) in state {!r} or {!r} can be resumed.".format(
+                    JOB_STARTED, JOB_ABORTED
+                )
+            )
+        journal = ImportJournal(
+            os.path.join(instance.basedir, settings.UCSSCHOOL_IMPORT["journal_filename"])
+        )
+        if journal.is_locked():
+            return Response(
+                {"detail": "Import job {!r} is still running.".format(instance.pk)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        logger.info("Scheduling resumption of ImportJob with ID %r.", instance.pk)
+        dispatch_job(instance, import_users, resume=True)
+        serializer = self.get_serializer(instance)
+        data = serializer.data
+        data.update(self._get_subresource_urls(data["url"]))
+        del data["input_file"]
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+    @detail_route(methods=["get"], url_path="wait")
+    def wait(self, request, *args, **kwargs):
+        instance = self.get_object()
+        known_status = request.query_params.get("status")
+        if known_status is not None and instance.status not in (JOB_ABORTED, JOB_FINISHED):
+            known_date_done = request.query_params.get("date_done")
+            known_state = (known_status, parse_datetime(known_date_done) if known_date_done else None)
+            ucsschool_import = settings.UCSSCHOOL_IMPORT
+            timeout = self._get_wait_timeout(
+                request.query_params.get("timeout"),
+                ucsschool_import.get("job_wait_timeout", 25),
+                ucsschool_import.get("job_wait_max_timeout", 50),
+            )
+            poll_interval = ucsschool_import.get("job_wait_poll_interval", 0.25)
+            deadline = time.time() + timeout
+            while self._get_job_state(instance.pk) == known_state and time.time() < deadline:
+                time.sleep(poll_interval)
+            # reload, the job may have been deleted and its cached result is outdated
+            instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        data = serializer.data
+        data.update(self._get_subresource_urls(data["url"]))
+        del data["input_file"]
+        return Response(data)
+
+    @staticmethod
+    def _get_wait_timeout(value, default, maximum):
+        if value is None:
+            return min(default, maximum)
+        try:
+            timeout = float(value)
+        except ValueError:
+            raise ParseError("Value of 'timeout' must be a number, got {!r}.".format(value))
+        return max(0.0, min(timeout, maximum))
+
+    @staticmethod
+    def _get_job_state(pk):
+        """
+        Cheap lookup (a single query, no LDAP) of the values that change with
+        each job state change and progress notification.
+
+        :return: 2-tuple (status, result.date_done) or None if the job was deleted
+        :rtype: tuple or None
+        """
+        return UserImportJob.objects.filter(pk=pk).values_list("status", "result__date_done").first()
+
     @detail_route(methods=["get"], url_path="logfile")
     def logfile(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -364,6 +469,7 @@ class UserImportJobViewSet(
         # fix URL: /imports/users/{summary-pk}/logfile/ -> /imports/users/{import-pk}/logfile/
         data = serializer.data
         data["url"] = reverse("logfile-detail", kwargs=kwargs, request=request)
+        data["raw"] = reverse("logfile-raw", kwargs=kwargs, request=request)
         return Response(data)
 
     @detail_route(methods=["get"], url_path="passwords")
@@ -373,6 +479,7 @@ class UserImportJobViewSet(
         # fix URL: /imports/users/{summary-pk}/passwords/ -> /imports/users/{import-pk}/passwords/
         data = serializer.data
         data["url"] = reverse("passwordsfile-detail", kwargs=kwargs, request=request)
+        data["raw"] = reverse("passwordsfile-raw", kwargs=kwargs, request=request)
         return Response(data)
 
     @detail_route(methods=["get"], url_path="summary")
@@ -382,6 +489,7 @@ class UserImportJobViewSet(
         # fix URL: /imports/users/{summary-pk}/summary/ -> /imports/users/{import-pk}/summary/
         data = serializer.data
         data["url"] = reverse("summaryfile-detail", kwargs=kwargs, request=request)
+        data["raw"] = reverse("summaryfile-raw", kwargs=kwargs, request=request)
         return Response(data)
 
 
@@ -398,6 +506,7 @@ class SubResourceMixin(object):
         TextArtifactViewPermission,  # apply per view and per-object permission checks
     )
     serializer_class = TextArtifact
+    raw_content_type = "application/octet-stream"
 
     def _get_model(self):
         return self.get_serializer_class().Meta.model
@@ -409,15 +518,18 @@ class SubResourceMixin(object):
     def get_queryset(self):
         # must filter(), because all() would list all TextArtifact objects, not
         # just those of type LogFile/PasswordFile/SummaryFile
-        return self._get_model().objects.filter(
-            **{"{}__isnull".format(self.userimportjob_related_name): False}
+        # the permission check needs the import job and its school
+        return (
+            self._get_model()
+            .objects.filter(**{"{}__isnull".format(self.userimportjob_related_name): False})
+            .select_related("{}__school".format(self.userimportjob_related_name))
         )
 
-    def retrieve(self, request, *args, **kwargs):
+    def _get_instance(self, request, import_pk):
         model = self._get_model()
         try:
             instance = self.get_queryset().get(
-                **{"{}__pk".format(self.userimportjob_related_name): kwargs.get("pk", 0)}
+                **{"{}__pk".format(self.userimportjob_related_name): import_pk}
             )
         except model.DoesNotExist:
             raise Http404("No {} matches the given query.".format(model._meta.object_name))
@@ -425,12 +537,66 @@ class SubResourceMixin(object):
         # probably because used from urls.py directly as_view()
         if not TextArtifactViewPermission().has_object_permission(request, self, instance):
             self.permission_denied(request)
+        return instance
+
+    def retrieve(self, request, *args, **kwargs):
+        model = self._get_model()
+        instance = self._get_instance(request, kwargs.get("pk", 0))
         serializer = self.get_serializer(instance)
         # fix URL: /imports/users/{summary-pk}/summary -> /imports/users/{import-pk}/summary
         data = serializer.data
         data["url"] = reverse("{}-detail".format(model.__name__.lower()), kwargs=kwargs, request=request)
+        data["raw"] = reverse("{}-raw".format(model.__name__.lower()), kwargs=kwargs, request=request)
         return Response(data)
 
+    def raw(self, request, *args, **kwargs):
+        """
+        Stream the artifact as a file, without loading it into memory.
+
+        * Supports HTTP `Range` requests of a single byte range.
+        * To follow the log file of a running job, pass the value of the response header
+          `X-Next-Offset` as parameter `offset` in the next request. It returns what was
+          appended in the meantime. A negative `offset` counts from the end of the file.
+        * The response header `X-Import-Job-Status` contains the status of the job.
+        """
+        instance = self._get_instance(request, kwargs.get("pk", 0))
+        offset = request.query_params.get("offset")
+        try:
+            offset = None if offset is None else int(offset)
+        except ValueError:
+            raise ParseError("Value of 'offset' must be an integer, got {!r}.".format(offset))
+        try:
+            fp = instance.open()
+        except IOError as exc:
+            logger.error("Could not read %r: %s", instance.path, exc)
+            raise Http404("File of {} is not available.".format(instance))
+        # the file may grow while it is sent: send only what exists now
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell()
+        try:
+            start, length, partial = get_byte_range(size, request.META.get("HTTP_RANGE"), offset)
+        except RangeNotSatisfiable as exc:
+            fp.close()
+            response = HttpResponse(
+                str(exc),
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                content_type="text/plain",
+            )
+            response["Content-Range"] = "bytes */{}".format(size)
+            return response
+        response = StreamingHttpResponse(
+            iter_file(fp, start, length),
+            status=status.HTTP_206_PARTIAL_CONTENT if partial else status.HTTP_200_OK,
+            content_type=self.raw_content_type,
+        )
+        response["Content-Length"] = str(length)
+        response["Accept-Ranges"] = "bytes"
+        if partial:
+            response["Content-Range"] = "bytes {}-{}/{}".format(start, start + length - 1, size)
+        response["X-Next-Offset"] = str(start + length)
+        response["X-Import-Job-Status"] = getattr(instance, self.userimportjob_related_name).status
+        return response
+
 
 class LogFileViewSet(SubResourceMixin, viewsets.ReadOnlyModelViewSet):
     """
@@ -440,6 +606,7 @@ class LogFileViewSet(SubResourceMixin, viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = LogFileSerializer
+    raw_content_type = "text/plain; charset=utf-8"
 
 
 class PasswordsViewSet(SubResourceMixin, viewsets.ReadOnlyModelViewSet):
@@ -450,6 +617,7 @@ class PasswordsViewSet(SubResourceMixin, viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = PasswordFileSerializer
+    raw_content_type = "text/csv; charset=utf-8"
 
 
 class SummaryViewSet(SubResourceMixin, viewsets.ReadOnlyModelViewSet):
@@ -460,6 +628,7 @@ class SummaryViewSet(SubResourceMixin, viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = SummarySerializer
+    raw_content_type = "text/csv; charset=utf-8"
 
 
 class RoleViewSet(viewsets.ReadOnlyModelViewSet):
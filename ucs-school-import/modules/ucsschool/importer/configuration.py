@@ -42,17 +42,31 @@ from six import string_types
 from ucsschool.lib.models.utils import ucr, ucr_username_max_length
 
 from .exceptions import InitialisationError, ReadOnlyConfiguration
+from .utils.config_cache import ConfigurationCache
 from .utils.config_pyhook import ConfigPyHook
-from .utils.configuration_checks import run_configuration_checks
+from .utils.configuration_checks import CONFIG_CHECKS_CODE_DIR, run_configuration_checks
 from .utils.import_pyhook import run_import_pyhooks
 
 USER_IMPORT_SCHEMA_FILE = "/usr/share/ucs-school-import/schema/user_import_configuration_schema.json"
 CONFIGURATION_ERROR_LOG = "/var/log/univention/ucs-school-import/import-configuration-error.log"
+DEFAULT_HOOKS_DIR_PYHOOK = "/usr/share/ucs-school-import/pyhooks"
 
 
 def setup_configuration(conffiles, **kwargs):  # type: (List[str], **str) -> ReadOnlyDict
     logger = logging.getLogger(__name__)
-    config = Configuration(conffiles)
+    cache = ConfigurationCache.from_ucr()
+    plain_kwargs, volatile_kwargs = cache.split_kwargs(kwargs)
+    checked_key = cache.checked_key(cache.files_key(conffiles, USER_IMPORT_SCHEMA_FILE), plain_kwargs)
+    compiled = cache.load(checked_key)
+    if compiled is not None:
+        config = Configuration(conffiles, compiled=compiled)
+        config.update(volatile_kwargs)
+        config.close()
+        logger.info(
+            "Using cached configuration (cache key %r), skipping configuration checks.", checked_key
+        )
+        return config
+    config = Configuration(conffiles, cache=cache)
     ConfigurationFile("kwargs (cmdline args)").validate(kwargs)
     config.update(kwargs)
     _set_username_maxlength(config, logger)
@@ -61,6 +75,13 @@ def setup_configuration(conffiles, **kwargs):  # type: (List[str], **str) -> Rea
     config.close()
     logger.info("Finished reading configuration, starting checks...")
     run_configuration_checks(config)
+    cache.store(
+        checked_key,
+        {k: v for k, v in config.items() if k not in volatile_kwargs},
+        cache.dependencies(
+            config.get("hooks_dir_pyhook", DEFAULT_HOOKS_DIR_PYHOOK), CONFIG_CHECKS_CODE_DIR
+        ),
+    )
     return config
 
 
@@ -228,24 +249,52 @@ class Configuration(object):
     class __SingleConf:
         conffiles = []
 
-        def __init__(self, filenames):  # type: (List[str]) -> None
+        def __init__(self, filenames, compiled=None, cache=None):
+            # type: (List[str], Optional[Dict[str, Any]], Optional[ConfigurationCache]) -> None
             if not filenames:
                 raise InitialisationError("Configuration not yet loaded.")
-            self.config = None
+            if compiled is None:
+                cache = cache or ConfigurationCache.from_ucr()
+                files_key = cache.files_key(filenames, USER_IMPORT_SCHEMA_FILE)
+                compiled = cache.load(files_key)
+                if compiled is None:
+                    compiled = self.read_files(filenames)
+                    cache.store(files_key, compiled)
+                else:
+                    logging.getLogger(__name__).info(
+                        "Using cached configuration from files %r.", filenames
+                    )
+            self.config = ReadOnlyDict(compiled)
+            self.conffiles.extend(filenames)
+            self.config.conffiles = self.conffiles
+
+        @staticmethod
+        def read_files(filenames):  # type: (List[str]) -> ReadOnlyDict
+            config = None
             for filename in filenames:
                 cf = ConfigurationFile(filename)
                 cf_obj = cf.read()
                 cf.validate(cf_obj)
-                if self.config:
-                    self.config.update(cf_obj)
+                if config:
+                    config.update(cf_obj)
                 else:
-                    self.config = ReadOnlyDict(cf_obj)
-                self.conffiles.append(filename)
-            self.config.conffiles = self.conffiles
+                    config = ReadOnlyDict(cf_obj)
+            return config
 
     _instance = None
 
-    def __new__(cls, filenames=None):  # type: (Type[Configuration], Optional[List[str]]) -> ReadOnlyDict
+    def __new__(cls, filenames=None, compiled=None, cache=None):
+        # type: (Type[Configuration], Optional[List[str]], Optional[Dict[str, Any]], Optional[ConfigurationCache]) -> ReadOnlyDict  # noqa: E501
+        """
+        :param filenames: configuration files to read, required when first called
+        :type filenames: list(str) or None
+        :param compiled: use this already merged, validated configuration
+            instead of reading `filenames`
+        :type compiled: dict or None
+        :param cache: cache of merged configuration files, if `None` one
+            configured by UCR is used
+        :type cache: ucsschool.importer.utils.config_cache.ConfigurationCache or None
+        """
         if not cls._instance:
-            cls._instance = cls.__SingleConf(filenames)
+            cls._instance = cls.__SingleConf(filenames, compiled, cache)
         return cls._instance.config
@@ -43,6 +43,8 @@ if TYPE_CHECKING:
     import ucsschool.importer.mass_import.mass_import.MassImport
     import ucsschool.importer.mass_import.user_import.UserImport
     import ucsschool.importer.reader.csv_reader.CsvReader
+    import ucsschool.importer.utils.fingerprint_store.FingerprintStore
+    import ucsschool.importer.utils.import_journal.ImportJournal
     import ucsschool.importer.utils.username_handler.EmailHandler
     import ucsschool.importer.utils.username_handler.UsernameHandler
     import ucsschool.importer.writer.csv_writer.CsvWriter
@@ -99,6 +101,8 @@ class DefaultUserImportFactory(object):
         """
         classes = {
             "reader": "ucsschool.importer.reader.base_reader.BaseReader",
+            "fingerprint_store": "ucsschool.importer.utils.fingerprint_store.FingerprintStore",
+            "import_journal": "ucsschool.importer.utils.import_journal.ImportJournal",
             "mass_importer": "ucsschool.importer.mass_import.mass_import.MassImport",
             "password_exporter": "ucsschool.importer.writer.result_exporter.ResultExporter",
             "result_exporter": "ucsschool.importer.writer.result_exporter.ResultExporter",
@@ -273,6 +277,33 @@ class DefaultUserImportFactory(object):
 
         return UserImport(dry_run=dry_run)
 
+    def make_fingerprint_store(self, filename):
+        # type: (str) -> ucsschool.importer.utils.fingerprint_store.FingerprintStore
+        """
+        Get a FingerprintStore instance, used by the delta import mode.
+
+        :param str filename: path to the database file
+        :return: a :py:class:`FingerprintStore` object
+        :rtype: FingerprintStore
+        """
+        from .utils.fingerprint_store import FingerprintStore
+
+        return FingerprintStore(filename)
+
+    def make_import_journal(self, filename, fsync_interval=100):
+        # type: (str, Optional[int]) -> ucsschool.importer.utils.import_journal.ImportJournal
+        """
+        Get an ImportJournal instance, used to resume aborted import jobs.
+
+        :param str filename: path to the journal file
+        :param int fsync_interval: number of records after which to sync the file to disk
+        :return: a :py:class:`ImportJournal` object
+        :rtype: ImportJournal
+        """
+        from .utils.import_journal import ImportJournal
+
+        return ImportJournal(filename, fsync_interval)
+
     def make_ucr(self):  # type: () -> univention.config_registry.ConfigRegistry
         """
         Get a initialized UCR instance.
@@ -120,6 +120,10 @@ class InvalidSchools(UcsSchoolImportError):
     pass
 
 
+class JournalLockedError(InitialisationError):
+    pass
+
+
 class LDAPWriteAccessDenied(UcsSchoolImportFatalError):
     def __init__(self, msg=None, *args, **kwargs):
         msg = msg or "Tried to write using a read only connection (during a dry-run?)."
@@ -148,6 +152,12 @@ class ModificationError(UcsSchoolImportError):
     pass
 
 
+class GroupMembershipError(ModificationError):
+    """Batched membership changes of a group could not be written."""
+
+    pass
+
+
 class MoveError(UcsSchoolImportError):
     pass
 
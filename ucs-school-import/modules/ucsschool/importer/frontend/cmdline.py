@@ -29,29 +29,28 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <http://www.gnu.org/licenses/>.
 
-"""Base class for UCS@school import tool cmdline frontends."""
+"""
+Base class for UCS@school import tool cmdline frontends.
+
+Modules that pull in ``ucsschool.lib.models`` and the UDM handlers are imported
+in the methods using them, so that the command line is parsed (and
+``--profile-startup`` can start measuring) before they are loaded.
+"""
 import grp
 import logging
 import os
 import pprint
 import pwd
 import sys
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List  # noqa: F401
+from typing import Iterator, List  # noqa: F401
 
 import six
 
-from ucsschool.lib.models.utils import (
-    UniFileHandler,
-    UniStreamHandler,
-    get_file_handler,
-    get_stream_handler,
-)
-
-from ..configuration import Configuration, setup_configuration
 from ..exceptions import InitialisationError
 from ..factory import setup_factory
-from ..reader.csv_reader import CsvReader
+from ..utils.timing import StartupProfiler
 from .parse_user_import_cmdline import ParseUserImportCmdline
 
 CENTRAL_LOG_DIR = "/var/log/univention/ucs-school-import"
@@ -71,16 +70,36 @@ class CommandLine(object):
         self.errors = []
         self.user_import_summary_str = ""
         self._error_log_handler = None
+        self.startup_profiler = None  # type: StartupProfiler
 
     def parse_cmdline(self):
         parser = ParseUserImportCmdline()
         self.args = parser.parse_cmdline()
+        if getattr(self.args, "profile_startup", False):
+            self.startup_profiler = StartupProfiler()
+            self.startup_profiler.install()
         return self.args
 
+    @contextmanager
+    def startup_phase(self, name):  # type: (str) -> Iterator[None]
+        """Measure the duration of a start-up phase, if ``--profile-startup`` was used."""
+        if self.startup_profiler is None:
+            yield
+        else:
+            with self.startup_profiler.phase(name):
+                yield
+
     def setup_logging(self, stdout=False, filename=None, uid=None, gid=None, mode=None):
         # we're called twice:
         # once after parsing the cmdline, if no `-v` was given, INFO is used,
         # then again after reading the configuration files, the loglevel may be different now
+        from ucsschool.lib.models.utils import (
+            UniFileHandler,
+            UniStreamHandler,
+            get_file_handler,
+            get_stream_handler,
+        )
+
         self.logger = logging.getLogger("ucsschool")
         self.logger.setLevel(logging.DEBUG)
         # update existing stdout loggers, add one if none exist
@@ -110,6 +129,8 @@ class CommandLine(object):
         return self.logger
 
     def setup_config(self):
+        from ..configuration import Configuration, setup_configuration
+
         configs = self.configuration_files
         if self.args.conffile and self.args.conffile not in configs:
             configs.append(self.args.conffile)
@@ -190,9 +211,11 @@ class CommandLine(object):
     def prepare_import(self):
         self.parse_cmdline()
         # early logging configured by cmdline
-        self.setup_logging(self.args.verbose, self.args.logfile)
+        with self.startup_phase("setup_logging"):
+            self.setup_logging(self.args.verbose, self.args.logfile)
         self.logger.info("Loading UCS@school import configuration...")
-        self.setup_config()
+        with self.startup_phase("setup_config"):
+            self.setup_config()
         # logging configured by config file
         self.setup_logging(self.config["verbose"], self.config["logfile"])
         self.logger.info("------ UCS@school import tool starting ------")
@@ -201,7 +224,10 @@ class CommandLine(object):
         )
 
         filename = self.config["input"]["filename"]
-        encoding = CsvReader.get_encoding(filename)
+        with self.startup_phase("detect_encoding"):
+            from ..reader.csv_reader import CsvReader
+
+            encoding = CsvReader.get_encoding(filename)
         try:
             with open(filename, encoding=encoding) as fin:
                 line = fin.readline()
@@ -221,7 +247,14 @@ class CommandLine(object):
         self.logger.info("Configuration is:\n%s", pprint.pformat(self.config))
         self._error_log_handler.setLevel("ERROR")
 
-        self.factory = setup_factory(self.config["factory"])
+        with self.startup_phase("setup_factory"):
+            self.factory = setup_factory(self.config["factory"])
+        if self.startup_profiler:
+            self.startup_profiler.uninstall()
+            self.logger.info(
+                "------ Start-up profile ------\n%s",
+                "\n".join(self.startup_profiler.get_report_lines()),
+            )
 
     def create_symlink(self, source, link_name):  # type: (str, str) -> None
         """
@@ -96,6 +96,20 @@ class ParseUserImportCmdline(object):
             help="Dry-run: don't actually commit changes to LDAP (shortcut for --set dry_run=...) "
             "[default: %(default)s].",
         )
+        self.parser.add_argument(
+            "--force-full-resync",
+            dest="force_full_resync",
+            action="store_true",
+            help="Delta import mode: do not skip users with unchanged input data (shortcut for --set "
+            "delta:force_full_resync=...).",
+        )
+        self.parser.add_argument(
+            "--resume",
+            metavar="JOB",
+            help="Resume the aborted import job JOB, skipping the users it already created, modified "
+            "or deleted. Use the same input data and configuration as for the aborted job (shortcut "
+            "for --set journal:enabled=true journal:resume=true journal:job=JOB).",
+        )
         self.parser.add_argument(
             "--source_uid",
             help="The ID of the source database (shortcut for --set source_uid=...) [mandatory either "
@@ -115,6 +129,13 @@ class ParseUserImportCmdline(object):
             "<student|staff|teacher|teacher_and_staff> (shortcut for --set user_role=...) "
             "[default: %(default)s].",
         )
+        self.parser.add_argument(
+            "--profile-startup",
+            dest="profile_startup",
+            action="store_true",
+            help="Log the durations of the start-up phases and of the slowest Python module imports "
+            "[default: %(default)s].",
+        )
         self.parser.add_argument(
             "-v",
             "--verbose",
@@ -180,6 +201,14 @@ class ParseUserImportCmdline(object):
                     else:
                         settings[k][nk] = nv
 
+        if getattr(self.args, "force_full_resync", False):
+            settings.setdefault("delta", {})["force_full_resync"] = True
+
+        if getattr(self.args, "resume", None):
+            settings.setdefault("journal", {}).update(
+                {"enabled": True, "job": self.args.resume, "resume": True}
+            )
+
         self.args.settings = self.apply_quirks(settings)
 
         # only set shortcuts if they were set by the user
@@ -33,6 +33,7 @@
 
 import datetime
 import logging
+import os.path
 from typing import TYPE_CHECKING, Optional, TypeVar  # noqa: F401
 
 from ucsschool.lib.models.utils import stopped_notifier
@@ -43,6 +44,7 @@ from ..factory import Factory
 from ..utils.import_pyhook import run_import_pyhooks
 from ..utils.pre_read_pyhook import PreReadPyHook
 from ..utils.result_pyhook import ResultPyHook
+from ..utils.timing import get_import_timer
 from ..utils.utils import nullcontext
 
 if TYPE_CHECKING:
@@ -106,16 +108,38 @@ class MassImport(object):
 
     def import_users(self):  # type: () -> None
         self.logger.info("------ Importing users... ------")
+        timer = get_import_timer()
+        timer.clear()
         user_import = self.factory.make_user_importer(self.dry_run)
+        nup = uis = None
+        if self.config["output"]["new_user_passwords"]:
+            nup = datetime.datetime.now().strftime(self.config["output"]["new_user_passwords"])
+        if self.config["output"]["user_import_summary"]:
+            uis = datetime.datetime.now().strftime(self.config["output"]["user_import_summary"])
+        stream_results = self.config["output"].get("stream_results", False)
         exception = None
         try:
+            if stream_results:
+                # write the users as soon as they are committed, instead of keeping them in memory
+                for exporter, filename in ((self.password_exporter, nup), (self.result_exporter, uis)):
+                    if filename:
+                        self.logger.info("------ Streaming results to %s... ------", filename)
+                        exporter.open_stream(filename)
+                        user_import.result_streams.append(exporter)
+            user_import.open_journal()
             user_import.progress_report(description="Running pre-read hooks: 0%.", percentage=0)
             run_import_pyhooks(PreReadPyHook, "pre_read")
             user_import.progress_report(description="Analyzing data: 1%.", percentage=1)
-            imported_users = user_import.read_input()
-            users_to_delete = user_import.detect_users_to_delete()
-            user_import.delete_users(users_to_delete)  # 0% - 10%
-            user_import.create_and_modify_users(imported_users)  # 90% - 100%
+            if user_import.streaming_batch_size:
+                # users can only be deleted after all input data has been read
+                user_import.create_and_modify_users_streaming()  # 10%
+                users_to_delete = user_import.detect_users_to_delete()
+                user_import.delete_users(users_to_delete, progress_range=(90, 100))
+            else:
+                imported_users = user_import.read_input()
+                users_to_delete = user_import.detect_users_to_delete()
+                user_import.delete_users(users_to_delete)  # 0% - 10%
+                user_import.create_and_modify_users(imported_users)  # 90% - 100%
         except UcsSchoolImportError as exc:
             exception = exc
             user_import.errors.append(exc)
@@ -128,14 +152,24 @@ class MassImport(object):
             self.logger.exception(exc)
         self.errors.extend(user_import.errors)
         self.user_import_stats_str = user_import.log_stats()
-        if self.config["output"]["new_user_passwords"]:
-            nup = datetime.datetime.now().strftime(self.config["output"]["new_user_passwords"])
+        if nup:
             self.logger.info("------ Writing new users passwords to %s... ------", nup)
-            self.password_exporter.dump(user_import, nup)
-        if self.config["output"]["user_import_summary"]:
-            uis = datetime.datetime.now().strftime(self.config["output"]["user_import_summary"])
+            with timer.measure("result_export"):
+                if stream_results:
+                    self.password_exporter.close_stream(user_import)
+                else:
+                    self.password_exporter.dump(user_import, nup)
+        if uis:
             self.logger.info("------ Writing user import summary to %s... ------", uis)
-            self.result_exporter.dump(user_import, uis)
+            with timer.measure("result_export"):
+                if stream_results:
+                    self.result_exporter.close_stream(user_import)
+                else:
+                    self.result_exporter.dump(user_import, uis)
+            timing_file = "{}.timing.json".format(os.path.splitext(uis)[0])
+            self.logger.info("------ Writing import phase durations to %s... ------", timing_file)
+            timer.dump(timing_file)
+        user_import.close_journal(remove=exception is None)
         result_data = user_import.get_result_data()
         run_import_pyhooks(ResultPyHook, "user_result", result_data)
         self.logger.info("------ Importing users done. ------")
@@ -114,7 +114,6 @@ class SingleSourcePartialUserImport(UserImport):
             )
 
         if old_user:
-            imported_user.old_user = copy.deepcopy(old_user)
             if old_user.school == self.limbo_ou:
                 self.logger.info(
                     "User %r is in limbo school %r, moving to %r.",
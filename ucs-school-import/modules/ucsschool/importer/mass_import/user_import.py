@@ -34,37 +34,100 @@
 
 import copy
 import datetime
+import itertools
 import logging
+import os
+import pickle
 import sys
-from collections import defaultdict
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type, Union  # noqa: F401
+import threading
+from collections import Counter, defaultdict, deque
+from typing import (  # noqa: F401
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import six
 from ldap.filter import filter_format
 
 from ucsschool.lib.models.attributes import ValidationError
 from ucsschool.lib.models.base import NoObject, WrongObjectType
+from univention.admin.uexceptions import noObject
 
 from ..configuration import Configuration
 from ..exceptions import (
     CreationError,
     DeletionError,
+    GroupMembershipError,
+    InitialisationError,
     ModificationError,
     MoveError,
     TooManyErrors,
     UcsSchoolImportError,
+    UcsSchoolImportFatalError,
     UnknownAction,
     UserValidationError,
     WrongUserType,
 )
 from ..factory import Factory
-from ..utils.import_pyhook import run_import_pyhooks
-from ..utils.ldap_connection import get_admin_connection, get_readonly_connection
+from ..utils.group_membership_batch import GroupMembershipBatch
+from ..utils.import_pyhook import get_import_pyhooks, run_import_pyhooks
+from ..utils.ldap_connection import (
+    create_connection,
+    get_admin_connection,
+    get_readonly_connection,
+    paged_search,
+    reset_connections,
+)
 from ..utils.post_read_pyhook import PostReadPyHook
+from ..utils.timing import get_import_timer, timed
 
 if TYPE_CHECKING:
+    from concurrent.futures import Future  # noqa: F401
+
     from ..configuration import ReadOnlyDict  # noqa: F401
     from ..models.import_user import ImportUser  # noqa: F401
+    from ..utils.fingerprint_store import FingerprintStore  # noqa: F401
+    from ..utils.import_journal import ImportJournal  # noqa: F401
+    from ..utils.ldap_connection import UdmObjectType  # noqa: F401
+    from ..utils.username_handler import UsernameHandler  # noqa: F401
+    from ..writer.result_exporter import ResultExporter  # noqa: F401
+
+    UserChunk = List[Tuple[int, ImportUser]]
+    ChunkResult = Tuple[
+        List[Any],
+        Dict[str, List[Dict[str, Any]]],
+        Dict[str, List[Dict[str, Any]]],
+        Dict[str, List[float]],
+    ]
+
+PARALLEL_CHUNKS_PER_WORKER = 4
+# number of users to delete to fetch from LDAP with one search
+DELETION_SEARCH_BATCH_SIZE = 500
+
+# State shared with the workers of UserImport.create_and_modify_users_parallel(). Set before the
+# worker processes are forked, so it does not have to be pickled.
+_parallel_state = {}  # type: Dict[str, Any]
+_worker_thread_data = threading.local()
+
+
+def _init_worker_process():  # type: () -> None
+    _parallel_state["user_import"].init_worker_process(_parallel_state["chunks"])
+
+
+def _create_and_modify_chunk(chunk_num):  # type: (int) -> ChunkResult
+    user_import = _parallel_state["user_import"]
+    return user_import.create_and_modify_chunk(
+        _parallel_state["chunks"][chunk_num], _parallel_state["mode"]
+    )
 
 
 class UserImport(object):
@@ -77,6 +140,12 @@ class UserImport(object):
     4. create_and_modify_users()
     5. log_stats()
     6. get_result_data()
+
+    In streaming mode (see :py:attr:`streaming_batch_size`) steps 1-4 are replaced by:
+
+    1. create_and_modify_users_streaming()
+    2. detect_users_to_delete()
+    3. delete_users()
     """
 
     def __init__(self, dry_run=True):
@@ -87,6 +156,9 @@ class UserImport(object):
         self.added_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
         self.modified_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
         self.deleted_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
+        # action -> class name -> number of users, also when streaming the results:
+        self.result_counts = {"A": Counter(), "M": Counter(), "D": Counter()}  # type: Dict[str, Counter]
+        self.result_streams = []  # type: List[ResultExporter]
         self.config = Configuration()  # type: ReadOnlyDict
         self.logger = logging.getLogger(__name__)
         self.connection, self.position = get_readonly_connection() if dry_run else get_admin_connection()
@@ -94,6 +166,21 @@ class UserImport(object):
         self.reader = self.factory.make_reader(filename=self.config["input"]["filename"])
         self.ucr = self.factory.make_ucr()
         self.imported_users_len = 0
+        self._existing_users_index = None  # type: Optional[Dict[Tuple[str, str], str]]
+        # only set in streaming mode, where self.imported_users stays empty:
+        self._streamed_user_ids = None  # type: Optional[Set[Tuple[str, str]]]
+        self._streamed_deletions = None  # type: Optional[List[Tuple[str, str, List[str]]]]
+        # delta import mode:
+        self.unchanged_users_count = 0
+        self._fingerprint_store = None  # type: Optional[FingerprintStore]
+        self._fingerprints = None  # type: Optional[Dict[Tuple[str, str], str]]
+        self._new_fingerprints = {}  # type: Dict[Tuple[str, str], str]
+        self._config_fingerprint = None  # type: Optional[str]
+        self._group_membership_batch = None  # type: Optional[GroupMembershipBatch]
+        # resumable import jobs:
+        self.journal = None  # type: Optional[ImportJournal]
+        self.resumed_users_count = 0
+        self._journal_records = {}  # type: Dict[Tuple[str, str], Dict[str, Any]]
 
     def read_input(self):  # type: () -> List[ImportUser]
         """
@@ -105,22 +192,105 @@ class UserImport(object):
         :return: ImportUsers found in input
         :rtype: list(ImportUser)
         """
-        num = 1
         self.logger.info("------ Starting to read users from input data... ------")
+        self.imported_users.extend(self.iter_input())
+        run_import_pyhooks(PostReadPyHook, "all_entries_read", self.imported_users, self.errors)
+        self.logger.info("------ Read %d users from input data. ------", len(self.imported_users))
+        return self.imported_users
+
+    def iter_input(self):  # type: () -> Iterator[ImportUser]
+        """
+        Generator over the users read from input data.
+
+        * :py:class:`UcsSchoolImportErrors` are stored in in `self.errors` (with input entry number in
+            `error.entry_count`).
+
+        :return: iterator over ImportUsers found in input
+        :rtype: Iterator(ImportUser)
+        """
+        num = 1
+        timer = get_import_timer()
         while True:
             try:
-                import_user = next(self.reader)
-                self.logger.info("Done reading %d. user: %s", num, import_user)
-                self.imported_users.append(import_user)
+                with timer.measure("read"):
+                    import_user = next(self.reader)
             except StopIteration:
-                run_import_pyhooks(PostReadPyHook, "all_entries_read", self.imported_users, self.errors)
-                break
+                return
             except UcsSchoolImportError as exc:
                 self.logger.exception("Error reading %d. user: %s", num, exc)
                 self._add_error(exc)
+            else:
+                self.logger.info("Done reading %d. user: %s", num, import_user)
+                yield import_user
             num += 1
-        self.logger.info("------ Read %d users from input data. ------", len(self.imported_users))
-        return self.imported_users
+
+    @property
+    def streaming_batch_size(self):  # type: () -> int
+        """
+        Number of users to read, create and modify at a time in streaming mode (configuration key
+        `streaming`), 0 if streaming mode is disabled.
+
+        Streaming mode cannot be used with a :py:class:`PostReadPyHook` that implements
+        `all_entries_read()`, as that requires all users to be read first.
+        """
+        if not self.config.get("streaming", {}).get("enabled", False):
+            return 0
+        hooks = get_import_pyhooks(PostReadPyHook).get("all_entries_read")
+        if hooks:
+            self.logger.warning(
+                "Streaming mode disabled, because of PostReadPyHook(s) implementing "
+                "'all_entries_read': %s",
+                ", ".join(hook.__self__.__class__.__name__ for hook in hooks),
+            )
+            return 0
+        return max(1, int(self.config["streaming"].get("batch_size", 1000)))
+
+    def create_and_modify_users_streaming(self):
+        # type: () -> Tuple[List[UcsSchoolImportError], Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]  # noqa: E501
+        """
+        Read, create and modify users in batches of :py:attr:`streaming_batch_size` users. Replaces
+        :py:meth:`read_input()` and :py:meth:`create_and_modify_users()` in streaming mode.
+
+        * ImportUser objects are released after each batch. Only the IDs of the users (and the input
+            data of users with action `D`) are kept for :py:meth:`detect_users_to_delete()`, which must
+            run *after* this.
+        * `self.added_users` and `self.modified_users` will hold created / modified
+            :py:class:`ImportUser` objects.
+        * :py:class:`UcsSchoolImportErrors` are stored in `self.errors`.
+
+        :return: (self.errors, self.added_users, self.modified_users)
+        :rtype: tuple(list[UcsSchoolImportError], list[dict], list[dict])
+        """
+        batch_size = self.streaming_batch_size
+        self.logger.info(
+            "------ Reading, creating and modifying users in batches of %d... ------", batch_size
+        )
+        self._streamed_user_ids = set()
+        self._streamed_deletions = []
+        users = self.iter_input()
+        while True:
+            batch = list(itertools.islice(users, batch_size))
+            if not batch:
+                break
+            for user in batch:
+                self._streamed_user_ids.add((user.source_uid, user.record_uid))
+                if user.action == "D":
+                    self._streamed_deletions.append((user.source_uid, user.record_uid, user.input_data))
+            first_usernum = self.imported_users_len + 1
+            self.imported_users_len += len(batch)
+            self.logger.info(
+                "------ Creating / modifying users %d - %d... ------",
+                first_usernum,
+                self.imported_users_len,
+            )
+            self._create_and_modify_users(batch, first_usernum, 0)
+        self.logger.info(
+            "------ Read %d users from input data, created %d users, modified %d users. ------",
+            self.imported_users_len,
+            sum(self.result_counts["A"].values()),
+            sum(self.result_counts["M"].values()),
+        )
+        return self.errors, self.added_users, self.modified_users
 
     def create_and_modify_users(self, imported_users):
         # type: (List[ImportUser]) -> Tuple[List[UcsSchoolImportError], Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]  # noqa: E501
@@ -138,153 +308,1007 @@ class UserImport(object):
         :rtype: tuple(list[UcsSchoolImportError], list[dict], list[dict])
         """
         self.logger.info("------ Creating / modifying users... ------")
-        usernum = 0
         self.imported_users_len = len(imported_users)
-        while imported_users:
-            imported_user = imported_users.pop(0)
-            usernum += 1
-            percentage = 10 + 90 * usernum // self.imported_users_len  # 10% - 100%
-            self.progress_report(
-                description="Creating and modifying users: {}%.".format(percentage),
-                percentage=int(percentage),
-                done=usernum,
-                total=self.imported_users_len,
-                errors=len(self.errors),
-            )
-            if imported_user.action == "D":
-                continue
-            try:
-                self.logger.debug(
-                    "Creating / modifying user %d/%d %s...",
-                    usernum,
-                    self.imported_users_len,
-                    imported_user,
-                )
-                user = self.determine_add_modify_action(imported_user)
-                cls_name = user.__class__.__name__
+        self._create_and_modify_users(imported_users, 1, self.imported_users_len)
+        num_added_users = sum(self.result_counts["A"].values())
+        num_modified_users = sum(self.result_counts["M"].values())
+        self.logger.info(
+            "------ Created %d users, modified %d users. ------",
+            num_added_users,
+            num_modified_users,
+        )
+        return self.errors, self.added_users, self.modified_users
 
+    def _create_and_modify_users(self, imported_users, first_usernum, total):
+        # type: (List[ImportUser], int, int) -> None
+        """
+        Create and modify users, releasing them from `imported_users` on the way.
+
+        :param imported_users: ImportUser objects, the list will be empty afterwards
+        :type imported_users: :func:`list`
+        :param int first_usernum: position of the first user in the input data
+        :param int total: number of users in the input data, 0 if unknown (streaming mode)
+        :return: None
+        """
+        if self.parallel_workers > 1:
+            try:
+                self.create_and_modify_users_parallel(imported_users, first_usernum, total)
+            finally:
+                # group memberships were written by the workers
+                self.release_counters()
+            del imported_users[:]
+            self.store_fingerprints()
+            return
+        self.prewarm_counters(imported_users)
+        timer = get_import_timer()
+        queue = deque(imported_users)
+        del imported_users[:]
+        usernum = first_usernum - 1
+        try:
+            while queue:
+                imported_user = queue.popleft()
+                usernum += 1
+                self._create_and_modify_progress(usernum, total)
+                if (
+                    imported_user.action == "D"
+                    or self.is_unchanged_user(imported_user)
+                    or self.is_committed_user(imported_user)
+                ):
+                    continue
                 try:
-                    action_str = {"A": "Adding", "D": "Deleting", "M": "Modifying"}[user.action]
-                except KeyError:
-                    raise UnknownAction(
-                        "{}  (source_uid:{} record_uid: {}) has unknown action '{}'.".format(
-                            user, user.source_uid, user.record_uid, user.action
-                        ),
-                        entry_count=user.entry_count,
-                        import_user=user,
-                    )
+                    with timer.user():
+                        self.create_and_modify_user(imported_user, usernum)
+                except (CreationError, ModificationError) as exc:
+                    self.logger.error("Entry #%d: %s", exc.entry_count, exc)  # traceback useless
+                    self._add_error(exc)
+                except UcsSchoolImportError as exc:
+                    self.logger.exception("Entry #%d: %s", exc.entry_count, exc)
+                    self._add_error(exc)
+        finally:
+            self.release_counters()
+            flush_errors = self.flush_group_memberships()
+            if flush_errors:
+                # memberships of any user may be incomplete, do not skip them in the next run
+                self._new_fingerprints.clear()
+            for exc in flush_errors:
+                self._add_error(exc)
+        self.store_fingerprints()
 
-                if user.action in ["A", "M"]:
-                    _user = user.to_dict()  # sorted output
-                    self.logger.info(
-                        "%s %s (source_uid:%s record_uid:%s) attributes: {%s}...",
-                        action_str,
-                        user,
-                        user.source_uid,
-                        user.record_uid,
-                        ", ".join("{!r}: {!r}".format(k, _user[k]) for k in sorted(_user.keys())),
+    def _create_and_modify_progress(self, done, total, num_errors=None):
+        # type: (int, int, Optional[int]) -> None
+        if total:
+            percentage = 10 + 90 * done // total  # 10% - 100%
+            description = "Creating and modifying users: {}%.".format(percentage)
+        else:
+            # streaming mode: total unknown, deletion follows with 90% - 100%
+            percentage = 10
+            description = "Creating and modifying users: {} done.".format(done)
+        self.progress_report(
+            description=description,
+            percentage=int(percentage),
+            done=done,
+            total=total,
+            errors=len(self.errors) if num_errors is None else num_errors,
+        )
+
+    def create_and_modify_user(self, imported_user, usernum):  # type: (ImportUser, int) -> None
+        """
+        Create or modify a single user.
+
+        * The created / modified user will be stored by :py:meth:`store_results()`.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :param int usernum: position of `imported_user` in input data, used for logging
+        :return: None
+        :raises UcsSchoolImportError: if the user could not be created or modified
+        """
+        self.logger.debug(
+            "Creating / modifying user %d/%d %s...",
+            usernum,
+            self.imported_users_len,
+            imported_user,
+        )
+        user = self.determine_add_modify_action(imported_user)
+        cls_name = user.__class__.__name__
+
+        try:
+            action_str = {"A": "Adding", "D": "Deleting", "M": "Modifying"}[user.action]
+        except KeyError:
+            raise UnknownAction(
+                "{}  (source_uid:{} record_uid: {}) has unknown action '{}'.".format(
+                    user, user.source_uid, user.record_uid, user.action
+                ),
+                entry_count=user.entry_count,
+                import_user=user,
+            )
+
+        if user.action in ["A", "M"]:
+            _user = user.to_dict()  # sorted output
+            self.logger.info(
+                "%s %s (source_uid:%s record_uid:%s) attributes: {%s}...",
+                action_str,
+                user,
+                user.source_uid,
+                user.record_uid,
+                ", ".join("{!r}: {!r}".format(k, _user[k]) for k in sorted(_user.keys())),
+            )
+        # save password of new user for later export (NewUserPasswordCsvExporter):
+        password = user.password
+        try:
+            if user.action == "A":
+                err = CreationError  # type: Union[Type[CreationError], Type[ModificationError]]
+                if self.dry_run:
+                    user.validate(
+                        self.connection,
+                        validate_unlikely_changes=True,
+                        check_username=True,
                     )
-                # save password of new user for later export (NewUserPasswordCsvExporter):
-                password = user.password
-                try:
-                    if user.action == "A":
-                        err = CreationError  # type: Union[Type[CreationError], Type[ModificationError]]
-                        store = self.added_users[cls_name]  # type: List[Dict[str, Any]]
-                        if self.dry_run:
-                            user.validate(
-                                self.connection,
-                                validate_unlikely_changes=True,
-                                check_username=True,
-                            )
-                            if user.errors:
-                                raise ValidationError(user.errors.copy())
-                            user.call_hooks("pre", "create", self.connection)
-                            self.logger.info("Dry-run: skipping user.create() for %s.", user)
-                            success = True
-                            user.call_hooks("post", "create", self.connection)
-                        else:
-                            success = user.create(lo=self.connection)
-                    elif user.action == "M":
-                        err = ModificationError
-                        store = self.modified_users[cls_name]
-                        if self.dry_run:
-                            user.validate(
-                                self.connection,
-                                validate_unlikely_changes=True,
-                                check_username=False,
-                                check_name=False,
-                            )
-                            if user.errors:
-                                raise ValidationError(user.errors.copy())
-                            user.call_hooks("pre", "modify", self.connection)
-                            self.logger.info("Dry-run: skipping user.modify() for %s.", user)
-                            success = True
-                            user.call_hooks("post", "modify", self.connection)
-                        else:
-                            success = user.modify(lo=self.connection)
-                    else:
-                        # delete
-                        continue
-                except ValidationError as exc:
-                    six.reraise(
-                        UserValidationError,
-                        UserValidationError(
-                            "ValidationError when {} {} "
-                            "(source_uid:{} record_uid: {}): {}".format(
-                                action_str.lower(),
-                                user,
-                                user.source_uid,
-                                user.record_uid,
-                                exc,
-                            ),
-                            validation_error=exc,
-                            import_user=user,
-                        ),
-                        sys.exc_info()[2],
+                    if user.errors:
+                        raise ValidationError(user.errors.copy())
+                    user.call_hooks("pre", "create", self.connection)
+                    self.logger.info("Dry-run: skipping user.create() for %s.", user)
+                    success = True
+                    user.call_hooks("post", "create", self.connection)
+                else:
+                    user.defer_group_memberships = self.group_membership_batch is not None
+                    success = user.create(lo=self.connection)
+            elif user.action == "M":
+                err = ModificationError
+                if self.dry_run:
+                    user.validate(
+                        self.connection,
+                        validate_unlikely_changes=True,
+                        check_username=False,
+                        check_name=False,
                     )
-
-                if success:
-                    self.logger.info(
-                        "Success %s %d/%d %s (source_uid:%s record_uid: %s).",
+                    if user.errors:
+                        raise ValidationError(user.errors.copy())
+                    user.call_hooks("pre", "modify", self.connection)
+                    self.logger.info("Dry-run: skipping user.modify() for %s.", user)
+                    success = True
+                    user.call_hooks("post", "modify", self.connection)
+                else:
+                    user.defer_group_memberships = self.group_membership_batch is not None
+                    success = user.modify(lo=self.connection)
+            else:
+                # delete
+                return
+        except ValidationError as exc:
+            six.reraise(
+                UserValidationError,
+                UserValidationError(
+                    "ValidationError when {} {} "
+                    "(source_uid:{} record_uid: {}): {}".format(
                         action_str.lower(),
-                        usernum,
-                        self.imported_users_len,
                         user,
                         user.source_uid,
                         user.record_uid,
-                    )
-                    user.password = password
-                    store.append(user.to_dict())
+                        exc,
+                    ),
+                    validation_error=exc,
+                    import_user=user,
+                ),
+                sys.exc_info()[2],
+            )
+
+        if success:
+            self._update_existing_users_index(user)
+            if user.defer_group_memberships:
+                self.group_membership_batch.add(user.dn, user.name, *user.deferred_group_changes)
+            self.logger.info(
+                "Success %s %d/%d %s (source_uid:%s record_uid: %s).",
+                action_str.lower(),
+                usernum,
+                self.imported_users_len,
+                user,
+                user.source_uid,
+                user.record_uid,
+            )
+            user.password = password
+            users_dicts = [user.to_dict()]
+            self.store_results(user.action, cls_name, users_dicts)
+            self.write_journal(cls_name, users_dicts)
+        else:
+            raise err(
+                "Error {} {}/{} {} (source_uid:{} record_uid: {}), does probably "
+                "{}exist.".format(
+                    action_str.lower(),
+                    usernum,
+                    self.imported_users_len,
+                    user,
+                    user.source_uid,
+                    user.record_uid,
+                    "not " if user.action == "M" else "already ",
+                ),
+                entry_count=user.entry_count,
+                import_user=user,
+            )
+
+    @property
+    def group_membership_batch(self):  # type: () -> Optional[GroupMembershipBatch]
+        """
+        Membership changes of school classes and workgroups, collected to be written per group
+        by :py:meth:`flush_group_memberships()`. `None` if configuration key
+        `batch_group_memberships` is not set (or in a dry-run).
+        """
+        if (
+            self._group_membership_batch is None
+            and not self.dry_run
+            and self.config.get("batch_group_memberships", False)
+        ):
+            self._group_membership_batch = GroupMembershipBatch()
+        return self._group_membership_batch
+
+    def flush_group_memberships(self):  # type: () -> List[GroupMembershipError]
+        """
+        Write the membership changes of school classes and workgroups collected in
+        :py:attr:`group_membership_batch`.
+
+        :return: errors of groups that could not be modified
+        :rtype: list(GroupMembershipError)
+        """
+        if self._group_membership_batch is None:
+            return []
+        return self._group_membership_batch.flush(self.connection, self.position)
+
+    @property
+    def parallel_workers(self):  # type: () -> int
+        """Number of workers to create and modify users with, from configuration key `parallel`."""
+        return max(1, int(self.config.get("parallel", {}).get("workers", 1)))
+
+    def create_and_modify_users_parallel(self, imported_users, first_usernum=1, total=None):
+        # type: (List[ImportUser], Optional[int], Optional[int]) -> None
+        """
+        Create and modify users using a pool of worker processes or threads (configuration key
+        `parallel:mode`), each with its own LDAP connection.
+
+        * Users are split into chunks by :py:meth:`get_parallel_chunks()`, so that users that may
+            conflict with each other are handled by the same worker in the order of the input data.
+        * Results are stored when a chunk has been finished and sorted by input line afterwards, so
+            the result does not depend on the order in which the workers finish (except for streamed
+            result files). Errors are merged in chunk order.
+        * Progress is reported when a chunk has been finished.
+        * When the number of errors exceeds `tolerate_errors`, chunks that have not been started are
+            cancelled. The results of the chunks that were running are stored, before
+            :py:exc:`TooManyErrors` is raised.
+
+        :param imported_users: ImportUser objects
+        :type imported_users: :func:`list`
+        :param int first_usernum: position of the first user in the input data
+        :param int total: number of users in the input data, 0 if unknown (streaming mode), `None`
+            for `len(imported_users)`
+        :return: None
+        :raises TooManyErrors: if the number of countable errors exceeds `tolerate_errors`
+        """
+        mode = self.config.get("parallel", {}).get("mode", "process")
+        if mode not in ("process", "thread"):
+            raise UcsSchoolImportFatalError(
+                "Unknown value {!r} for configuration key 'parallel:mode'.".format(mode)
+            )
+        users = [
+            (usernum, user)
+            for usernum, user in enumerate(imported_users, start=first_usernum)
+            if user.action != "D"
+            and not self.is_unchanged_user(user)
+            and not self.is_committed_user(user)
+        ]
+        chunks = self.get_parallel_chunks(users, self.parallel_workers * PARALLEL_CHUNKS_PER_WORKER)
+        self.logger.info(
+            "Creating / modifying %d users in %d chunks with %d worker %ss...",
+            len(users),
+            len(chunks),
+            self.parallel_workers,
+            mode,
+        )
+        if self.config.get("prefetch_existing_users", False) and self._existing_users_index is None:
+            # build the index once, before it is copied to the workers
+            self._existing_users_index = self.prefetch_existing_users()
+
+        if mode == "thread":
+            self.prewarm_counters(user for _usernum, user in users)
+
+        # not available in Python 2, only needed with parallel workers
+        import multiprocessing
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+        _parallel_state.update({"user_import": self, "chunks": chunks, "mode": mode})
+        if mode == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=self.parallel_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker_process,
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.parallel_workers)
+        chunk_errors = {}  # type: Dict[int, List[UcsSchoolImportError]]
+        futures = {}  # type: Dict[Future, int]
+        try:
+            for chunk_num in range(len(chunks)):
+                futures[executor.submit(_create_and_modify_chunk, chunk_num)] = chunk_num
+            pending = set(futures)
+            # users with action "D" and unchanged users are skipped
+            done_users = first_usernum - 1 + len(imported_users) - len(users)
+            num_errors = len([x for x in self.errors if x.is_countable])
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_num = futures.pop(future)
+                    errors = self._store_chunk_results(future.result(), mode)
+                    chunk_errors[chunk_num] = errors
+                    done_users += len(chunks[chunk_num])
+                    num_errors += len([x for x in errors if x.is_countable])
+                self._create_and_modify_progress(
+                    done_users,
+                    len(imported_users) if total is None else total,
+                    len(self.errors) + sum(len(errors) for errors in chunk_errors.values()),
+                )
+                if -1 < self.config["tolerate_errors"] < num_errors:
+                    # stop here, _add_error() will raise TooManyErrors when merging the results
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            _parallel_state.clear()
+
+        # chunks that were already running when the error limit was exceeded have been finished
+        for future, chunk_num in futures.items():
+            if not future.cancelled():
+                chunk_errors[chunk_num] = self._store_chunk_results(future.result(), mode)
+        for chunk_num, errors in chunk_errors.items():
+            if any(isinstance(error, GroupMembershipError) for error in errors):
+                # memberships of any user of the chunk may be incomplete, do not skip them next time
+                for _usernum, user in chunks[chunk_num]:
+                    self._new_fingerprints.pop((user.source_uid, user.record_uid), None)
+        for chunk_num in sorted(chunk_errors):
+            for error in chunk_errors[chunk_num]:
+                self._add_error(error)
+        for store in (self.added_users, self.modified_users):
+            for users_dicts in store.values():
+                users_dicts.sort(key=lambda x: int(x["entry_count"]))
+
+    def _store_chunk_results(self, chunk_result, mode):
+        # type: (ChunkResult, str) -> List[UcsSchoolImportError]
+        """
+        Store the users created and modified by a worker with :py:meth:`store_results()`.
+
+        :param chunk_result: return value of :py:meth:`create_and_modify_chunk()`
+        :type chunk_result: tuple(list, dict, dict, dict)
+        :param str mode: `process` or `thread`
+        :return: errors of the chunk
+        :rtype: list(UcsSchoolImportError)
+        """
+        errors, added_users, modified_users, timings = chunk_result
+        if mode == "process":
+            errors = [self._unpickle_error(error) for error in errors]
+            get_import_timer().merge(timings)
+        for action, store in (("A", added_users), ("M", modified_users)):
+            for cls_name, users_dicts in store.items():
+                self.store_results(action, cls_name, users_dicts)
+        return errors
+
+    def get_parallel_chunks(self, users, num_chunks):
+        # type: (UserChunk, int) -> List[UserChunk]
+        """
+        Split users into chunks that can be handled concurrently.
+
+        Users sharing any key returned by :py:meth:`get_parallel_conflict_keys()` are put into the
+        same chunk. Inside a chunk the order of the input data is kept.
+
+        :param users: list of tuples (position in input data, ImportUser)
+        :type users: list(tuple(int, ImportUser))
+        :param int num_chunks: number of chunks to create (at most)
+        :return: list of chunks, each a list of tuples (position in input data, ImportUser)
+        :rtype: list(list(tuple(int, ImportUser)))
+        """
+        # union-find over the users positions, connected by their conflict keys
+        parents = list(range(len(users)))
+
+        def find(pos):  # type: (int) -> int
+            while parents[pos] != pos:
+                parents[pos] = parents[parents[pos]]
+                pos = parents[pos]
+            return pos
+
+        owner_of_key = {}  # type: Dict[str, int]
+        for pos, (_usernum, user) in enumerate(users):
+            for key in self.get_parallel_conflict_keys(user):
+                if key in owner_of_key:
+                    parents[find(pos)] = find(owner_of_key[key])
                 else:
-                    raise err(
-                        "Error {} {}/{} {} (source_uid:{} record_uid: {}), does probably "
-                        "{}exist.".format(
-                            action_str.lower(),
-                            usernum,
-                            len(imported_users),
-                            user,
-                            user.source_uid,
-                            user.record_uid,
-                            "not " if user.action == "M" else "already ",
+                    owner_of_key[key] = pos
+        groups = defaultdict(list)  # type: Dict[int, List[int]]
+        for pos in range(len(users)):
+            groups[find(pos)].append(pos)
+
+        chunk_size = max(1, -(-len(users) // max(1, num_chunks)))
+        chunks = []  # type: List[List[int]]
+        current = []  # type: List[int]
+        for positions in sorted(groups.values()):
+            current.extend(positions)
+            if len(current) >= chunk_size:
+                chunks.append(current)
+                current = []
+        if current:
+            chunks.append(current)
+        return [[users[pos] for pos in sorted(chunk)] for chunk in chunks]
+
+    def get_parallel_conflict_keys(self, imported_user):  # type: (ImportUser) -> List[str]
+        """
+        Keys of resources that the creation / modification of `imported_user` may compete with
+        other users for. Users with a common key are never handled concurrently.
+
+        IMPLEMENTME if a subclass or hook adds other shared resources.
+
+        * record_uid
+        * base of the username and email address, when using the counter variables of
+            :py:class:`UsernameHandler` (approximated from the input data and scheme, without
+            running format hooks)
+        * school classes
+
+        :param ImportUser imported_user: ImportUser object from input
+        :return: list of keys
+        :rtype: list(str)
+        """
+        keys = ["record_uid:{}".format(imported_user.record_uid)]
+        unique_names = self.get_unique_names(imported_user)
+        username, base = unique_names.get("username", (None, None))
+        if username:
+            keys.append("name:{}".format((base if base is not None else username).lower()))
+        email, base = unique_names.get("email", (None, None))
+        if email:
+            keys.append("email:{}".format((base if base is not None else email).lower()))
+
+        school_classes = imported_user.school_classes
+        if isinstance(school_classes, dict):
+            school_classes = ",".join(
+                cls_name for classes in school_classes.values() for cls_name in classes
+            )
+        for a_class in (school_classes or "").split(","):
+            school, sep, cls_name = (x.strip() for x in a_class.strip().partition("-"))
+            if not school:
+                continue
+            if not sep:
+                # no school prefix
+                cls_name = school
+                school = imported_user.school or self.config.get("school") or ""
+            klass_name = imported_user.school_classes_invalid_character_replacement(
+                "{}-{}".format(imported_user.normalize(school), imported_user.normalize(cls_name)),
+                self.config["school_classes_invalid_character_replacement"],
+            )
+            keys.append("class:{}".format(klass_name.lower()))
+        return keys
+
+    def get_unique_names(self, imported_user):
+        # type: (ImportUser) -> Dict[str, Tuple[str, Optional[str]]]
+        """
+        Username and email address `imported_user` will (probably) get, approximated from the input
+        data and scheme, without running format hooks.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :return: dict with keys `username` and `email` (if set or in the scheme) and tuples (name
+            without counter variables, base of the counter or `None` if no counter is used) as values
+        :rtype: dict(str, tuple(str, str or None))
+        """
+        res = {}  # type: Dict[str, Tuple[str, Optional[str]]]
+        fields = self.reader.get_data_mapping(imported_user.input_data)
+        fields.update(imported_user.to_dict())
+        fields.update(imported_user.udm_properties)
+
+        username = imported_user.name or imported_user.udm_properties.get("username")
+        if username:
+            res["username"] = (username, None)
+        elif "username" in self.config["scheme"]:
+            username = imported_user.get_format_scheme(imported_user.username_scheme)(fields)
+            base = imported_user.username_handler.get_name_base(username)
+            # remove counter variables, so the email address is based on the username base
+            username = imported_user.username_handler.replacement_variable_pattern.sub("", username)
+            res["username"] = (username, base)
+        fields["username"] = username or ""
+
+        email = imported_user.email or imported_user.udm_properties.get("mailPrimaryAddress")
+        if email:
+            res["email"] = (email, None)
+        elif "email" in self.config["scheme"]:
+            fields["maildomain"] = (
+                self.config.get("maildomain")
+                or (self.ucr.get("mail/hosteddomains") or "").partition(" ")[0]
+            )
+            email = imported_user.get_format_scheme(self.config["scheme"]["email"])(fields).lower()
+            res["email"] = (email, imported_user.unique_email_handler.get_name_base(email))
+        return res
+
+    def prewarm_counters(self, imported_users):  # type: (Iterable[ImportUser]) -> None
+        """
+        Let the storage backends of the username and email counters load the counters that will
+        probably be needed for new users of `imported_users` in bulk (see configuration key
+        `counter_lease_size`).
+
+        :param imported_users: ImportUser objects
+        :type imported_users: Iterable(ImportUser)
+        :return: None
+        """
+        if self.dry_run or int(self.config.get("counter_lease_size", 1)) <= 1:
+            return
+        # without the index, existing users cannot be told apart from new ones without LDAP searches
+        existing_users = (
+            self.existing_users_index if self.config.get("prefetch_existing_users", False) else {}
+        )
+        names = defaultdict(set)  # type: Dict[UsernameHandler, Set[str]]
+        for imported_user in imported_users:
+            if (
+                imported_user.action == "D"
+                or self.get_existing_users_index_key(imported_user.source_uid, imported_user.record_uid)
+                in existing_users
+            ):
+                continue
+            try:
+                unique_names = self.get_unique_names(imported_user)
+            except Exception as exc:
+                # errors are handled when the user is created
+                self.logger.debug("Ignoring %s when prewarming counters for %r.", exc, imported_user)
+                continue
+            for key, handler in (
+                ("username", imported_user.username_handler),
+                ("email", imported_user.unique_email_handler),
+            ):
+                _name, base = unique_names.get(key, (None, None))
+                if base:
+                    names[handler].add(base)
+        for handler, bases in names.items():
+            handler.storage_backend.prewarm(bases)
+
+    def release_counters(self):  # type: () -> None
+        """
+        Return values of username and email counters that were reserved, but not used (see
+        configuration key `counter_lease_size`).
+
+        :return: None
+        """
+        from ..models.import_user import ImportUser
+
+        for handler in list(ImportUser._username_handler_cache.values()) + list(
+            ImportUser._unique_email_handler_cache.values()
+        ):
+            handler.storage_backend.release()
+
+    def init_worker_process(self, chunks):  # type: (List[UserChunk]) -> None
+        """
+        Prepare a forked worker process: open own LDAP connections and drop all objects holding LDAP
+        connections of the parent process.
+
+        :param chunks: the chunks that will be handled by the worker processes
+        :type chunks: list(list(tuple(int, ImportUser)))
+        :return: None
+        """
+        from ucsschool.lib.models.base import UCSSchoolHelperAbstractClass, _pyhook_loader
+
+        from ..models.import_user import ImportUser
+        from ..utils.import_pyhook import ImportPyHookLoader
+
+        reset_connections()
+        UCSSchoolHelperAbstractClass._machine_connection = None
+        _pyhook_loader.drop_cache()
+        ImportPyHookLoader._pyhook_obj_cache.clear()
+        ImportUser._username_handler_cache.clear()
+        ImportUser._unique_email_handler_cache.clear()
+        get_import_timer().clear()
+        # self.journal is kept: the workers record the users they commit in the inherited journal
+        for chunk in chunks:
+            for _usernum, user in chunk:
+                user._lo = None
+        self.connection, self.position = (
+            get_readonly_connection() if self.dry_run else get_admin_connection()
+        )
+
+    def create_and_modify_chunk(self, chunk, mode):  # type: (UserChunk, str) -> ChunkResult
+        """
+        Create and modify the users of one chunk, in the worker process or thread.
+
+        :param chunk: list of tuples (position in input data, ImportUser)
+        :type chunk: list(tuple(int, ImportUser))
+        :param str mode: `process` or `thread`
+        :return: tuple (errors, added users, modified users, timings), in `process` mode the errors
+            are serialized by :py:meth:`_pickle_error()`, the users `old_user` is removed and the
+            timings contain the samples of the workers :py:class:`ImportTimer` (empty in `thread`
+            mode, as the timer is shared)
+        :rtype: tuple(list, dict, dict, dict)
+        """
+        worker = copy.copy(self)
+        worker.errors = []
+        worker.added_users = defaultdict(list)
+        worker.modified_users = defaultdict(list)
+        # the results are stored (and streamed) by the parent
+        worker.result_counts = {"A": Counter(), "M": Counter(), "D": Counter()}
+        worker.result_streams = []
+        worker._group_membership_batch = None
+        timer = get_import_timer()
+        if mode == "thread":
+            if not hasattr(_worker_thread_data, "connection"):
+                _worker_thread_data.connection = create_connection(read_only=self.dry_run)
+            worker.connection, worker.position = _worker_thread_data.connection
+        else:
+            # counters must not be shared between processes
+            worker.prewarm_counters(user for _usernum, user in chunk)
+        try:
+            for usernum, imported_user in chunk:
+                try:
+                    with timer.user():
+                        worker.create_and_modify_user(imported_user, usernum)
+                except (CreationError, ModificationError) as exc:
+                    self.logger.error("Entry #%d: %s", exc.entry_count, exc)  # traceback useless
+                    worker.errors.append(exc)
+                except UcsSchoolImportError as exc:
+                    self.logger.exception("Entry #%d: %s", exc.entry_count, exc)
+                    worker.errors.append(exc)
+                if (
+                    -1
+                    < self.config["tolerate_errors"]
+                    < len([x for x in worker.errors if x.is_countable])
+                ):
+                    break
+        finally:
+            if mode == "process":
+                worker.release_counters()
+            worker.errors.extend(worker.flush_group_memberships())
+        if mode == "thread":
+            return worker.errors, worker.added_users, worker.modified_users, {}
+        for store in (worker.added_users, worker.modified_users):
+            for users_dicts in store.values():
+                for user_dict in users_dicts:
+                    user_dict["old_user"] = None  # cannot be pickled
+        return (
+            [self._pickle_error(exc) for exc in worker.errors],
+            dict(worker.added_users),
+            dict(worker.modified_users),
+            timer.pop_samples(),
+        )
+
+    @staticmethod
+    def _pickle_error(exc):
+        # type: (UcsSchoolImportError) -> Tuple[Type[Any], Tuple[Any], Dict[str, Any]]
+        """
+        Serialize `exc` for the transfer from a worker process. The :py:class:`ImportUser` object
+        is replaced by its dict representation, other not picklable attributes by their `repr()`.
+        """
+        state = dict(exc.__dict__)
+        if exc.import_user:
+            user_dict = exc.import_user.to_dict()
+            user_dict["old_user"] = None
+            state["import_user"] = user_dict
+        for key, value in state.items():
+            try:
+                pickle.dumps(value)
+            except Exception:
+                state[key] = repr(value)
+        return exc.__class__, exc.args, state
+
+    def _unpickle_error(self, pickled_exc):
+        # type: (Tuple[Type[Any], Tuple[Any], Dict[str, Any]]) -> UcsSchoolImportError
+        """Recreate an exception serialized by :py:meth:`_pickle_error()`."""
+        cls, args, state = pickled_exc
+        exc = cls.__new__(cls)
+        exc.args = args
+        exc.__dict__.update(state)
+        if isinstance(exc.import_user, dict):
+            exc.import_user = self.factory.make_import_user([]).from_dict(exc.import_user)
+        return exc
+
+    @property
+    def delta_enabled(self):  # type: () -> bool
+        """Whether the delta import mode (configuration key `delta`) is enabled."""
+        return bool(self.config.get("delta", {}).get("enabled", False))
+
+    @property
+    def fingerprint_store(self):  # type: () -> FingerprintStore
+        if self._fingerprint_store is None:
+            filename = self.config["delta"]["database"].format(
+                source_uid=self.config["source_uid"].replace(os.sep, "_")
+            )
+            self._fingerprint_store = self.factory.make_fingerprint_store(filename)
+        return self._fingerprint_store
+
+    @property
+    def fingerprints(self):  # type: () -> Dict[Tuple[str, str], str]
+        """
+        Fingerprints of the previously imported records of the configured `source_uid`, loaded on
+        first access.
+
+        :return: mapping (source_uid, record_uid) -> fingerprint
+        :rtype: dict
+        """
+        if self._fingerprints is None:
+            self._fingerprints = self.fingerprint_store.load(self.config["source_uid"])
+            self.logger.info(
+                "Loaded %d fingerprints from %r.",
+                len(self._fingerprints),
+                self.fingerprint_store.filename,
+            )
+        return self._fingerprints
+
+    def get_fingerprint_config(self):  # type: () -> Dict[str, Any]
+        """
+        Part of the configuration that influences how users are created and modified. Included in the
+        fingerprints, so a configuration change invalidates all of them.
+
+        IMPLEMENTME if a subclass uses configuration keys that should not be part of it.
+
+        :return: configuration subset
+        :rtype: dict
+        """
+        # keys that only control this run, differ between runs (e.g. the per job directories of the
+        # HTTP-API) or only affect performance, without changing the users
+        ignored_keys = (
+            "batch_group_memberships",
+            "counter_lease_size",
+            "delta",
+            "dry_run",
+            "hooks_dir_legacy",
+            "hooks_dir_pyhook",
+            "input",
+            "journal",
+            "logfile",
+            "no_delete",
+            "output",
+            "parallel",
+            "prefetch_existing_users",
+            "progress_notification_function",
+            "streaming",
+            "tolerate_errors",
+            "verbose",
+        )
+        return {key: value for key, value in self.config.items() if key not in ignored_keys}
+
+    def get_fingerprint(self, imported_user):  # type: (ImportUser) -> str
+        """
+        Calculate the fingerprint of an input record: the data of the :py:class:`ImportUser` object
+        as created by the reader (including the raw input data) and the relevant configuration.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :return: fingerprint
+        :rtype: str
+        """
+        if self._config_fingerprint is None:
+            self._config_fingerprint = self.fingerprint_store.make_fingerprint(
+                self.get_fingerprint_config()
+            )
+        user_data = imported_user.to_dict()
+        for key in ("entry_count", "in_hook", "old_user"):
+            user_data.pop(key, None)
+        return self.fingerprint_store.make_fingerprint(
+            {"config": self._config_fingerprint, "user": user_data}
+        )
+
+    def is_unchanged_user(self, imported_user):  # type: (ImportUser) -> bool
+        """
+        Delta import mode: check if the input record of `imported_user` has already been imported
+        unchanged by a previous run, so it can be skipped.
+
+        The fingerprints of changed records are kept for :py:meth:`store_fingerprints()`.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :return: whether the user can be skipped, always False if the delta mode is disabled
+        :rtype: bool
+        """
+        if not self.delta_enabled:
+            return False
+        key = (imported_user.source_uid, imported_user.record_uid)
+        fingerprint = self.get_fingerprint(imported_user)
+        if (
+            not self.config["delta"].get("force_full_resync", False)
+            and self.fingerprints.get(key) == fingerprint
+            and (
+                not self.config.get("prefetch_existing_users", False)
+                or self.get_existing_users_index_key(*key) in self.existing_users_index
+            )
+        ):
+            self.logger.info(
+                "Skipping unchanged user %s (source_uid:%s record_uid:%s).",
+                imported_user,
+                imported_user.source_uid,
+                imported_user.record_uid,
+            )
+            self.unchanged_users_count += 1
+            return True
+        self._new_fingerprints[key] = fingerprint
+        return False
+
+    def store_fingerprints(self):  # type: () -> None
+        """
+        Delta import mode: store the fingerprints collected by :py:meth:`is_unchanged_user()` of
+        users that were created or modified without errors. Fingerprints of users whose group
+        memberships were written in a batch that failed (:py:exc:`GroupMembershipError`) have
+        already been dropped.
+        """
+        if not self._new_fingerprints:
+            return
+        failed = {
+            (exc.import_user.source_uid, exc.import_user.record_uid)
+            for exc in self.errors
+            if exc.import_user
+        }
+        fingerprints = [
+            (source_uid, record_uid, fingerprint)
+            for (source_uid, record_uid), fingerprint in self._new_fingerprints.items()
+            if (source_uid, record_uid) not in failed
+        ]
+        self._new_fingerprints = {}
+        if self.dry_run:
+            self.logger.info("Dry-run: not storing %d fingerprints.", len(fingerprints))
+        else:
+            self.logger.debug("Storing %d fingerprints...", len(fingerprints))
+            self.fingerprint_store.store(fingerprints)
+
+    @property
+    def journal_enabled(self):  # type: () -> bool
+        """Whether committed users are recorded in a journal (configuration key `journal`)."""
+        return not self.dry_run and bool(self.config.get("journal", {}).get("enabled", False))
+
+    def open_journal(self):  # type: () -> None
+        """
+        Open the journal of the import job (configuration key `journal`). When resuming a job, load
+        the users committed by the aborted run with :py:meth:`store_results()` first.
+
+        :return: None
+        :raises InitialisationError: if the job ID is invalid or the journal of a job to resume does
+            not exist or belongs to another source database
+        :raises JournalLockedError: if the job is running in another process
+        """
+        if not self.journal_enabled:
+            return
+        conf = self.config["journal"]
+        resume = conf.get("resume", False)
+        job = conf.get("job") or "{:%Y%m%d-%H%M%S}-{}".format(datetime.datetime.now(), os.getpid())
+        if os.path.basename(job) != job:
+            raise InitialisationError("Invalid import job ID {!r}.".format(job))
+        filename = conf.get("filename", "/var/lib/ucs-school-import/journal/{job}.jsonl").format(
+            job=job, source_uid=self.config["source_uid"]
+        )
+        self.journal = self.factory.make_import_journal(filename, int(conf.get("fsync_interval", 100)))
+        if resume and not self.journal.exists():
+            raise InitialisationError(
+                "Cannot resume import job {!r}: journal {!r} does not exist.".format(job, filename),
+                log_traceback=False,
+            )
+        # locks the journal, before it is read
+        self.journal.write(
+            [
+                {
+                    "job": job,
+                    "input": self.config["input"]["filename"],
+                    "resume": resume,
+                    "source_uid": self.config["source_uid"],
+                    "started": datetime.datetime.now().isoformat(),
+                }
+            ]
+        )
+        if resume:
+            self.load_journal()
+        self.logger.info(
+            "------ %s import job %r, writing journal %r (resume with '--resume %s'). ------",
+            "Resuming" if resume else "Starting",
+            job,
+            filename,
+            job,
+        )
+
+    def load_journal(self):  # type: () -> None
+        """
+        Resume a job: load the users that were committed by the aborted run from the journal, so
+        they are skipped by :py:meth:`is_committed_user()` and :py:meth:`delete_users()`.
+
+        :return: None
+        :raises InitialisationError: if the journal belongs to another source database
+        """
+        for record in self.journal.load():
+            if "action" not in record:
+                # header
+                if record.get("source_uid") != self.config["source_uid"]:
+                    raise InitialisationError(
+                        "Journal {!r} belongs to source_uid {!r}, not {!r}.".format(
+                            self.journal.filename, record.get("source_uid"), self.config["source_uid"]
                         ),
-                        entry_count=user.entry_count,
-                        import_user=user,
+                        log_traceback=False,
                     )
+                continue
+            self._journal_records[(record["source_uid"], record["record_uid"])] = record
+            self.store_results(record["action"], record["class"], [record["user"]])
+        self.logger.info(
+            "Loaded %d users committed by the aborted run from journal %r.",
+            len(self._journal_records),
+            self.journal.filename,
+        )
 
-            except (CreationError, ModificationError) as exc:
-                self.logger.error("Entry #%d: %s", exc.entry_count, exc)  # traceback useless
-                self._add_error(exc)
-            except UcsSchoolImportError as exc:
-                self.logger.exception("Entry #%d: %s", exc.entry_count, exc)
-                self._add_error(exc)
-        num_added_users = sum(map(len, self.added_users.values()))
-        num_modified_users = sum(map(len, self.modified_users.values()))
+    def is_committed_user(self, imported_user):  # type: (ImportUser) -> bool
+        """
+        Resumed job: check if `imported_user` has already been created or modified by the aborted
+        run of the job, so it can be skipped.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :return: whether the user can be skipped, always False if no job is resumed
+        :rtype: bool
+        """
+        record = self._journal_records.get((imported_user.source_uid, imported_user.record_uid))
+        if not record or record["action"] not in ("A", "M"):
+            return False
         self.logger.info(
-            "------ Created %d users, modified %d users. ------",
-            num_added_users,
-            num_modified_users,
+            "Skipping user %s (source_uid:%s record_uid:%s), already %s by the aborted run.",
+            imported_user,
+            imported_user.source_uid,
+            imported_user.record_uid,
+            "created" if record["action"] == "A" else "modified",
         )
-        return self.errors, self.added_users, self.modified_users
+        self.resumed_users_count += 1
+        return True
+
+    def store_results(self, action, cls_name, users_dicts):
+        # type: (str, str, List[Dict[str, Any]]) -> None
+        """
+        Store committed users in `self.added_users`, `self.modified_users` or `self.deleted_users`
+        and count them in `self.result_counts`.
+
+        If results are streamed (configuration key `output:stream_results`), the users are
+        written to the exporters in `self.result_streams` instead of being kept in memory.
+
+        :param str action: `A`, `M` or `D`
+        :param str cls_name: name of the :py:class:`ImportUser` class of the users
+        :param users_dicts: results of :py:meth:`ImportUser.to_dict()` of the created, modified or
+            deleted users
+        :type users_dicts: list(dict)
+        :return: None
+        """
+        if not users_dicts:
+            return
+        self.result_counts[action][cls_name] += len(users_dicts)
+        if self.result_streams:
+            for exporter in self.result_streams:
+                exporter.write_results(users_dicts)
+        else:
+            store = {"A": self.added_users, "M": self.modified_users, "D": self.deleted_users}[action]
+            store[cls_name].extend(users_dicts)
+
+    def write_journal(self, cls_name, users_dicts):  # type: (str, List[Dict[str, Any]]) -> None
+        """
+        Record committed users in the journal, if it is enabled.
+
+        :param str cls_name: name of the :py:class:`ImportUser` class of the users
+        :param users_dicts: results of :py:meth:`ImportUser.to_dict()` of the created, modified or
+            deleted users
+        :type users_dicts: list(dict)
+        :return: None
+        """
+        if self.journal is None or not users_dicts:
+            return
+        records = []
+        for user_dict in users_dicts:
+            user_dict = dict(user_dict, old_user=None)
+            records.append(
+                {
+                    "action": user_dict["action"],
+                    "class": cls_name,
+                    "dn": user_dict.get("$dn$"),
+                    "record_uid": user_dict["record_uid"],
+                    "source_uid": user_dict["source_uid"],
+                    "user": user_dict,
+                }
+            )
+        self.journal.write(records)
+
+    def close_journal(self, remove=False):  # type: (Optional[bool]) -> None
+        """
+        Close the journal.
+
+        :param bool remove: whether to delete the journal, because the job does not have to be
+            resumed
+        :return: None
+        """
+        if self.journal is None:
+            return
+        if remove:
+            self.logger.info("Removing journal %r.", self.journal.filename)
+            self.journal.remove()
+        else:
+            self.journal.close()
 
     def find_importuser_in_ldap(self, import_user):  # type: (ImportUser) -> ImportUser
         """
@@ -297,6 +1321,8 @@ class UserImport(object):
         :raises WrongUserType: if the user in LDAP is not of the same type as the `import_user` object
         """
         try:
+            if self.config.get("prefetch_existing_users", False):
+                return self._find_importuser_in_index(import_user)
             return import_user.get_by_import_id(
                 self.connection, import_user.source_uid, import_user.record_uid
             )
@@ -311,11 +1337,119 @@ class UserImport(object):
                 sys.exc_info()[2],
             )
 
+    def _find_importuser_in_index(self, import_user):  # type: (ImportUser) -> ImportUser
+        """
+        Fetch fresh :py:class:`ImportUser` object from LDAP, using the index built by
+        :py:meth:`prefetch_existing_users()` to skip LDAP searches for users that do not exist.
+
+        :param ImportUser import_user: ImportUser object to use as reference for search
+        :return: fresh ImportUser object
+        :rtype: ImportUser
+        :raises NoObject: if ImportUser cannot be found
+        :raises WrongObjectType: if the user in LDAP is not of the same type as the `import_user`
+            object
+        """
+        key = self.get_existing_users_index_key(import_user.source_uid, import_user.record_uid)
+        dn = self.existing_users_index.get(key)
+        if not dn:
+            raise NoObject(
+                "No user with source_uid={!r} and record_uid={!r} found in prefetched index.".format(
+                    *key
+                )
+            )
+        try:
+            return import_user.get_by_import_id(
+                self.connection, import_user.source_uid, import_user.record_uid, base=dn
+            )
+        except WrongObjectType:
+            raise
+        except noObject:
+            # object was moved or removed since the index was built
+            self.logger.debug("User %r not found at prefetched DN %r, searching whole LDAP.", key, dn)
+            user = import_user.get_by_import_id(
+                self.connection, import_user.source_uid, import_user.record_uid
+            )
+            self.existing_users_index[key] = user.dn
+            return user
+
+    @property
+    def existing_users_index(self):  # type: () -> Dict[Tuple[str, str], str]
+        """
+        Mapping from ``(source_uid, record_uid)`` to DN of all users of the configured `source_uid`.
+        Built on first access by :py:meth:`prefetch_existing_users()`. Use
+        :py:meth:`get_existing_users_index_key()` to create the keys.
+
+        :return: mapping (source_uid, record_uid) -> DN
+        :rtype: dict
+        """
+        if self._existing_users_index is None:
+            self._existing_users_index = self.prefetch_existing_users()
+        return self._existing_users_index
+
+    @staticmethod
+    def get_existing_users_index_key(source_uid, record_uid):  # type: (str, str) -> Tuple[str, str]
+        """
+        Key of a user in :py:attr:`existing_users_index`. LDAP compares `ucsschoolSourceUID` and
+        `ucsschoolRecordUID` case-insensitively, so both are lowercased.
+
+        :param str source_uid: source_uid of the user
+        :param str record_uid: record_uid of the user
+        :return: tuple (source_uid, record_uid) in lowercase
+        :rtype: tuple(str, str)
+        """
+        return source_uid.lower(), record_uid.lower()
+
+    def get_prefetch_search_filter(self):  # type: () -> str
+        """
+        Create LDAP filter with which to find all users that may be referenced by the input data.
+
+        The filter must not be restricted to a user role or school, as the index is also used to
+        detect users of the wrong type and users in other schools.
+
+        :return: LDAP filter
+        :rtype: str
+        """
+        return filter_format(
+            "(&(ucsschoolSourceUID=%s)(ucsschoolRecordUID=*))",
+            (self.config["source_uid"],),
+        )
+
+    def prefetch_existing_users(self):  # type: () -> Dict[Tuple[str, str], str]
+        """
+        Fetch IDs and DNs of all existing users of the configured `source_uid` with a single paged
+        LDAP search.
+
+        :return: mapping (source_uid, record_uid) -> DN
+        :rtype: dict
+        """
+        self.logger.info("------ Prefetching existing users... ------")
+        filter_s = self.get_prefetch_search_filter()
+        self.logger.debug("Searching with filter=%r", filter_s)
+        index = {}  # type: Dict[Tuple[str, str], str]
+        for dn, attrs in paged_search(
+            self.connection, filter_s, attr=["ucsschoolSourceUID", "ucsschoolRecordUID"]
+        ):
+            key = self.get_existing_users_index_key(
+                attrs["ucsschoolSourceUID"][0].decode("utf-8"),
+                attrs["ucsschoolRecordUID"][0].decode("utf-8"),
+            )
+            index[key] = dn
+        self.logger.info("------ Prefetched %d existing users. ------", len(index))
+        return index
+
+    def _update_existing_users_index(self, user):  # type: (ImportUser) -> None
+        """Store the current DN of a created, modified or moved `user` in the prefetched index."""
+        if self._existing_users_index is not None and user.source_uid and user.record_uid:
+            key = self.get_existing_users_index_key(user.source_uid, user.record_uid)
+            self._existing_users_index[key] = user.dn
+
+    @timed("prepare")
     def prepare_imported_user(self, imported_user, old_user):
         # type: (ImportUser, Optional[ImportUser]) -> ImportUser
         """
-        Prepare attributes of ``imported_user`` object. Optionally save existing
-        user (``old_user``) object reference in ``imported_user.old_user``.
+        Prepare attributes of ``imported_user`` object. Optionally save a snapshot
+        (:py:class:`ImportUserSnapshot`) of the existing user (``old_user``) in
+        ``imported_user.old_user``.
         Sets ``imported_user.action`` according to ``is_new_user``.
 
         :param ImportUser imported_user: object to prepare attributes of
@@ -324,8 +1458,10 @@ class UserImport(object):
         :return: ImportUser object with attributes prepared
         :rtype: ImportUser
         """
+        from ..models.import_user import ImportUserSnapshot
+
         if old_user:
-            imported_user.old_user = copy.deepcopy(old_user)
+            imported_user.old_user = ImportUserSnapshot(old_user)
         imported_user.prepare_all(new_user=not old_user)
         imported_user.action = "M" if old_user else "A"
         return imported_user
@@ -344,7 +1480,8 @@ class UserImport(object):
         :raises WrongUserType: if the user in LDAP is not of the same type as the `import_user` object
         """
         try:
-            user = self.find_importuser_in_ldap(imported_user)
+            with get_import_timer().measure("ldap_lookup"):
+                user = self.find_importuser_in_ldap(imported_user)
         except NoObject:
             # no user found -> create
             return self.prepare_imported_user(imported_user, None)
@@ -431,6 +1568,8 @@ class UserImport(object):
                 "------ Looking only for users with action='D' (no_delete=%r) ------",
                 self.config["no_delete"],
             )
+            if self._streamed_deletions is not None:
+                return list(self._streamed_deletions)
             return [
                 (user.source_uid, user.record_uid, user.input_data)
                 for user in self.imported_users
@@ -438,90 +1577,138 @@ class UserImport(object):
             ]
 
         ucs_user_ids = set(self.get_ids_of_existing_users())
-        imported_user_ids = {(iu.source_uid, iu.record_uid) for iu in self.imported_users}
+        if self._streamed_user_ids is not None:
+            imported_user_ids = self._streamed_user_ids
+        else:
+            imported_user_ids = {(iu.source_uid, iu.record_uid) for iu in self.imported_users}
         users_to_delete = ucs_user_ids - imported_user_ids
         users_to_delete = [(u[0], u[1], []) for u in users_to_delete]
         self.logger.debug("users_to_delete=%r", users_to_delete)
         return users_to_delete
 
-    def delete_users(self, users=None):
-        # type: (Optional[List[Tuple[str, str, List[str]]]]) -> Tuple[List[UcsSchoolImportError], Dict[str, List[Dict[str, Any]]]]  # noqa: E501
+    def delete_users(self, users=None, progress_range=(0, 10)):
+        # type: (Optional[List[Tuple[str, str, List[str]]]], Optional[Tuple[int, int]]) -> Tuple[List[UcsSchoolImportError], Dict[str, List[Dict[str, Any]]]]  # noqa: E501
         """
         Delete users.
 
         * :py:meth:`detect_users_to_delete()` should have run before this.
-        * `self.deleted_users` will hold objects of deleted :py:class:`ImportUser`.
+        * Deleted :py:class:`ImportUser` objects will be stored by :py:meth:`store_results()`.
         * :py:class:`UcsSchoolImportErrors` are stored in `self.errors` (with failed
             :py:class:`ImportUser` object in `error.import_user`).
         * To add or change a deletion strategy overwrite :py:meth:`do_delete()`.
 
         :param users: :func:`list` of tuples: [(source_uid, record_uid, input_data), ..]
         :type users: :func:`list`
+        :param progress_range: tuple (start, end) of the percentages to report progress with
+        :type progress_range: tuple(int, int)
         :return: (self.errors, self.deleted_users)
         :rtype: tuple
         """
+        if self._journal_records:
+            num_users = len(users)
+            users = [
+                ids
+                for ids in users
+                if self._journal_records.get((ids[0], ids[1]), {}).get("action") != "D"
+            ]
+            self.resumed_users_count += num_users - len(users)
+            self.logger.info(
+                "Skipping %d users already deleted by the aborted run.", num_users - len(users)
+            )
         self.logger.info("------ Deleting %d users... ------", len(users))
         a_user = self.factory.make_import_user([])
-        for num, (source_uid, record_uid, input_data) in enumerate(users, start=1):
-            percentage = 10 * num // len(users)  # 0% - 10%
-            self.progress_report(
-                description="Deleting users: {}.".format(percentage),
-                percentage=int(percentage),
-                done=num,
-                total=len(users),
-                errors=len(self.errors),
-            )
-            try:
-                # additional_udm_properties are loaded from ldap, so that remove hooks can
-                # work with them the same way as other hooks. For "A" and "M" operations,
-                # udm_properties are set by the reader class.
-                additional_udm_properties = self.reader.get_imported_udm_property_names(a_user)
-                user = a_user.get_by_import_id(
-                    self.connection,
-                    source_uid,
-                    record_uid,
-                    udm_properties=additional_udm_properties,
-                )
-                user.action = "D"  # mark for logging/csv-output purposes
-                user.input_data = input_data  # most likely empty list
-            except NoObject as exc:
-                self.logger.error(
-                    "Cannot delete non existing user with source_uid=%r, record_uid=%r input_data=%r: "
-                    "%s",
-                    source_uid,
-                    record_uid,
-                    input_data,
-                    exc,
+        # additional_udm_properties are loaded from ldap, so that remove hooks can
+        # work with them the same way as other hooks. For "A" and "M" operations,
+        # udm_properties are set by the reader class.
+        additional_udm_properties = self.reader.get_imported_udm_property_names(a_user)
+        udm_objs = {}  # type: Dict[Tuple[str, str], UdmObjectType]
+        removed_fingerprints = []  # type: List[Tuple[str, str]]
+        timer = get_import_timer()
+        try:
+            for num, (source_uid, record_uid, input_data) in enumerate(users, start=1):
+                if (num - 1) % DELETION_SEARCH_BATCH_SIZE == 0:
+                    # fetch the next batch of users with one search (per source_uid)
+                    with timer.measure("ldap_lookup"):
+                        udm_objs = a_user.get_udm_objs_by_import_ids(
+                            self.connection,
+                            [ids[:2] for ids in users[num - 1 : num - 1 + DELETION_SEARCH_BATCH_SIZE]],
+                        )
+                    self._flush_removed_fingerprints(removed_fingerprints)
+                start, end = progress_range
+                percentage = start + (end - start) * num // len(users)  # 0% - 10% by default
+                self.progress_report(
+                    description="Deleting users: {}.".format(percentage),
+                    percentage=int(percentage),
+                    done=num,
+                    total=len(users),
+                    errors=len(self.errors),
                 )
-                continue
-            try:
-                success = self.do_delete(user)
-                if success:
-                    self.logger.info(
-                        "Success deleting %d/%d %r (source_uid:%s record_uid: %s).",
-                        num,
-                        len(users),
-                        user.name,
-                        user.source_uid,
-                        user.record_uid,
-                    )
-                else:
-                    raise DeletionError(
-                        "Error deleting user '{}' (source_uid:{} record_uid: {}), has probably already "
-                        "been deleted.".format(user.name, user.source_uid, user.record_uid),
-                        entry_count=user.entry_count,
-                        import_user=user,
+                try:
+                    udm_obj = udm_objs.pop((source_uid, record_uid), None)
+                    if udm_obj:
+                        user = a_user.from_udm_obj(udm_obj, None, self.connection)
+                        for udm_property in additional_udm_properties:
+                            user.udm_properties[udm_property] = udm_obj[udm_property]
+                    else:
+                        # not found (or not unique): let get_by_import_id() find out why
+                        user = a_user.get_by_import_id(
+                            self.connection,
+                            source_uid,
+                            record_uid,
+                            udm_properties=additional_udm_properties,
+                        )
+                    user.action = "D"  # mark for logging/csv-output purposes
+                    user.input_data = input_data  # most likely empty list
+                except NoObject as exc:
+                    self.logger.error(
+                        "Cannot delete non existing user with source_uid=%r, record_uid=%r "
+                        "input_data=%r: %s",
+                        source_uid,
+                        record_uid,
+                        input_data,
+                        exc,
                     )
-                self.deleted_users[user.__class__.__name__].append(user.to_dict())
-            except UcsSchoolImportError as exc:
-                self.logger.exception("Error in entry #%d: %s", exc.entry_count, exc)
-                self._add_error(exc)
+                    continue
+                try:
+                    with timer.user(), timer.measure("delete"):
+                        success = self.do_delete(user)
+                    if success:
+                        self.logger.info(
+                            "Success deleting %d/%d %r (source_uid:%s record_uid: %s).",
+                            num,
+                            len(users),
+                            user.name,
+                            user.source_uid,
+                            user.record_uid,
+                        )
+                    else:
+                        raise DeletionError(
+                            "Error deleting user '{}' (source_uid:{} record_uid: {}), has probably "
+                            "already been deleted.".format(user.name, user.source_uid, user.record_uid),
+                            entry_count=user.entry_count,
+                            import_user=user,
+                        )
+                    users_dicts = [user.to_dict()]
+                    self.store_results("D", user.__class__.__name__, users_dicts)
+                    self.write_journal(user.__class__.__name__, users_dicts)
+                    removed_fingerprints.append((user.source_uid, user.record_uid))
+                except UcsSchoolImportError as exc:
+                    self.logger.exception("Error in entry #%d: %s", exc.entry_count, exc)
+                    self._add_error(exc)
+        finally:
+            self._flush_removed_fingerprints(removed_fingerprints)
         self.logger.info(
             "------ Deleted %d users. ------",
-            sum(map(len, self.deleted_users.values())),
+            sum(self.result_counts["D"].values()),
         )
         return self.errors, self.deleted_users
 
+    def _flush_removed_fingerprints(self, ids):  # type: (List[Tuple[str, str]]) -> None
+        """Delta import mode: remove the fingerprints of deleted users and empty `ids`."""
+        if ids and self.delta_enabled and not self.dry_run:
+            self.fingerprint_store.remove(ids)
+        del ids[:]
+
     def school_move(self, imported_user, user):  # type: (ImportUser, ImportUser) -> ImportUser
         """
         Change users primary school.
@@ -579,6 +1766,7 @@ class UserImport(object):
         user = imported_user.get_by_import_id(
             self.connection, imported_user.source_uid, imported_user.record_uid
         )
+        self._update_existing_users_index(user)
         return user
 
     def do_delete(self, user):  # type: (ImportUser) -> bool
@@ -731,10 +1919,13 @@ class UserImport(object):
         """Log statistics about read, created, modified and deleted users."""
         self.logger.info("------ User import statistics ------")
         lines = ["Read users from input data: {}".format(self.imported_users_len)]
-        cls_names = list(self.added_users)
-        cls_names.extend(self.modified_users)
-        cls_names.extend(self.deleted_users)
-        cls_names = set(cls_names)
+        if self.delta_enabled:
+            lines.append("Skipped unchanged users: {}".format(self.unchanged_users_count))
+        if self._journal_records:
+            lines.append("Skipped users committed before resuming: {}".format(self.resumed_users_count))
+        cls_names = {
+            cls_name for counts in self.result_counts.values() for cls_name, num in counts.items() if num
+        }
         columns_default = 4
         columns = self.ucr.get_int("ucsschool/import/log_stats/columns", columns_default)
         if columns < 1:  # validate the `pint` type of `ucsschool/import/log_stats/columns`
@@ -745,31 +1936,22 @@ class UserImport(object):
             lines_allowed = lines_allowed_default
         allowed_user_print_cnt = columns * lines_allowed
         for cls_name in sorted(cls_names):
-            lines.append("Created {}: {}".format(cls_name, len(self.added_users.get(cls_name, []))))
-            added_users_len = len(self.added_users[cls_name])
-            if added_users_len <= allowed_user_print_cnt:
-                for i in range(0, added_users_len, columns):
-                    lines.append(
-                        "  {}".format([iu["name"] for iu in self.added_users[cls_name][i : i + columns]])
-                    )
-            lines.append("Modified {}: {}".format(cls_name, len(self.modified_users.get(cls_name, []))))
-            modified_users_len = len(self.modified_users[cls_name])
-            if modified_users_len <= allowed_user_print_cnt:
-                for i in range(0, modified_users_len, columns):
-                    lines.append(
-                        "  {}".format(
-                            [iu["name"] for iu in self.modified_users[cls_name][i : i + columns]]
-                        )
-                    )
-            lines.append("Deleted {}: {}".format(cls_name, len(self.deleted_users.get(cls_name, []))))
-            deleted_users_len = len(self.deleted_users[cls_name])
-            if deleted_users_len <= allowed_user_print_cnt:
-                for i in range(0, deleted_users_len, columns):
-                    lines.append(
-                        "  {}".format(
-                            [iu["name"] for iu in self.deleted_users[cls_name][i : i + columns]]
-                        )
-                    )
+            for action, label, store in (
+                ("A", "Created", self.added_users),
+                ("M", "Modified", self.modified_users),
+                ("D", "Deleted", self.deleted_users),
+            ):
+                users_len = self.result_counts[action][cls_name]
+                lines.append("{} {}: {}".format(label, cls_name, users_len))
+                users_dicts = store.get(cls_name, [])
+                # the users are not kept when the results are streamed
+                if users_len <= allowed_user_print_cnt and len(users_dicts) == users_len:
+                    for i in range(0, users_len, columns):
+                        lines.append("  {}".format([iu["name"] for iu in users_dicts[i : i + columns]]))
+        timing_lines = get_import_timer().get_summary_lines()
+        if timing_lines:
+            lines.append("Durations of import phases (per user, where applicable):")
+            lines.extend("  {}".format(line) for line in timing_lines)
         lines.append("Errors: {}".format(len(self.errors)))
         if self.errors:
             username_width = max(
@@ -829,3 +2011,4 @@ class UserImportData(object):
         self.added_users = user_import.added_users  # type: Dict[str, List[Dict[str, Any]]]
         self.modified_users = user_import.modified_users  # type: Dict[str, List[Dict[str, Any]]]
         self.deleted_users = user_import.deleted_users  # type: Dict[str, List[Dict[str, Any]]]
+        self.result_counts = user_import.result_counts  # type: Dict[str, Counter]
@@ -31,19 +31,34 @@
 
 """Representation of a user read from a file."""
 
+import copy
 import datetime
 import re
 import string
 import warnings
-from collections import defaultdict, namedtuple
-from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Type, Union  # noqa: F401
+from collections import OrderedDict, defaultdict, namedtuple
+from typing import (  # noqa: F401
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import lazy_object_proxy
 from ldap.filter import filter_format
 from six import iteritems, string_types
 
+import univention.admin.modules as udm_modules
 from ucsschool.lib.models.attributes import RecordUID, SourceUID, ValidationError
-from ucsschool.lib.models.base import NoObject, WrongObjectType
+from ucsschool.lib.models.base import NoObject, WrongObjectType, _pyhook_loader
 from ucsschool.lib.models.group import Group
 from ucsschool.lib.models.school import School
 from ucsschool.lib.models.user import Staff, Student, Teacher, TeachersAndStaff, User
@@ -90,6 +105,8 @@ from ..factory import Factory
 from ..utils.format_pyhook import FormatPyHook
 from ..utils.import_pyhook import get_import_pyhooks
 from ..utils.ldap_connection import get_admin_connection, get_readonly_connection
+from ..utils.timing import get_import_timer, hook_phase, timed
+from ..utils.username_index import UsernameIndex, UsernameUniquenessTuple
 from ..utils.utils import get_ldap_mapping_for_udm_property
 
 if TYPE_CHECKING:
@@ -103,11 +120,144 @@ if TYPE_CHECKING:
 
 
 FunctionSignature = namedtuple("FunctionSignature", ["name", "args", "kwargs"])
-UsernameUniquenessTuple = namedtuple("UsernameUniquenessTuple", ["record_uid", "source_uid", "dn"])
 ALLOWED_CHARS_IN_SCHOOL_CLASS_NAME = set(string.digits + string.ascii_letters + " -._")
 UNIQUENESS = "uniqueness"
 
 
+class FormatScheme(object):
+    """
+    A scheme from the configuration (e.g. `scheme:email`). The <properties> it
+    uses and the methods creating their values are determined once. The
+    substitution itself is not precompiled: each call runs the template
+    replacement of UDM on the scheme string.
+
+    Use :py:meth:`ImportUser.get_format_scheme()` to get a cached instance.
+    """
+
+    def __init__(self, scheme, prop_regex, prop_providers, replace):
+        # type: (str, Pattern, Dict[str, str], Callable[[str, Dict[str, Any]], str]) -> None
+        """
+        :param str scheme: scheme to parse
+        :param prop_regex: regular expression to find the <properties> used in `scheme`
+        :param dict prop_providers: mapping of property names to the names of make_*() methods
+        :param callable replace: function to fill a scheme with values (UDMs template replacement)
+        """
+        self.scheme = scheme
+        self._replace = replace
+        self.has_variables = "<" in scheme
+        props = []  # type: List[str]
+        for match in prop_regex.findall(scheme):
+            if match[0] and match[0] not in props:
+                props.append(match[0])
+        # (property name, method creating its value), in the order of appearance in the scheme
+        self.dependencies = tuple(
+            (
+                prop,
+                FunctionSignature(prop_providers[prop], (), {})
+                if prop in prop_providers
+                else FunctionSignature("make_udm_property", (prop,), {}),
+            )
+            for prop in props
+        )  # type: Tuple[Tuple[str, FunctionSignature], ...]
+
+    def __repr__(self):  # type: () -> str
+        return "{}({!r})".format(self.__class__.__name__, self.scheme)
+
+    def __call__(self, fields):  # type: (Dict[str, Any]) -> str
+        """
+        Fill the scheme with values.
+
+        :param dict fields: values for the <properties> in the scheme
+        :return: formatted string
+        :rtype: str
+        """
+        if not self.has_variables:
+            return self.scheme
+        return self._replace(self.scheme, fields)
+
+
+def _copy_containers(value):  # type: (Any) -> Any
+    """Copy (nested) lists and dicts, share all other values."""
+    if isinstance(value, list):
+        return [_copy_containers(v) for v in value]
+    if isinstance(value, dict):
+        return value.__class__((k, _copy_containers(v)) for k, v in value.items())
+    return value
+
+
+class ImportUserSnapshot(object):
+    """
+    Read-only copy of the attributes of an :py:class:`ImportUser`, used as `old_user` of a user that
+    is modified.
+
+    Attributes returned by :py:meth:`ImportUser.to_dict()` (and `dn`) are read from a copy of that
+    dict. For anything else (e.g. calling a method) and when an attribute is set, an
+    :py:class:`ImportUser` object is created from the dict once (the same way as with
+    :py:func:`copy.deepcopy()`), and used from then on.
+
+    `isinstance(snapshot, ImportUser)` is true.
+    """
+
+    __slots__ = ("_cls", "_values", "_user")
+
+    def __init__(self, user):  # type: (ImportUser) -> None
+        """:param ImportUser user: user to copy the attributes of"""
+        values = user.to_dict()
+        values["old_user"] = None
+        object.__setattr__(self, "_cls", user.__class__)
+        object.__setattr__(self, "_values", _copy_containers(values))
+        object.__setattr__(self, "_user", None)
+
+    @property
+    def __class__(self):  # type: () -> Type[ImportUser]
+        return self._cls
+
+    def materialize(self):  # type: () -> ImportUser
+        """
+        Get the :py:class:`ImportUser` object, create it, if it does not exist yet.
+
+        :return: ImportUser object with the attributes of the snapshot
+        :rtype: ImportUser
+        """
+        if self._user is None:
+            object.__setattr__(self, "_user", self._cls(**self._values))
+        return self._user
+
+    def __getattr__(self, name):  # type: (str) -> Any
+        if name.startswith("__") or name in ImportUserSnapshot.__slots__:
+            raise AttributeError(name)
+        if self._user is None:
+            if name in self._values:
+                return self._values[name]
+            if name == "dn":
+                return self._values["$dn$"]
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):  # type: (str, Any) -> None
+        setattr(self.materialize(), name, value)
+
+    def __delattr__(self, name):  # type: (str) -> None
+        delattr(self.materialize(), name)
+
+    def __copy__(self):  # type: () -> ImportUserSnapshot
+        return self
+
+    def __deepcopy__(self, memo):  # type: (Dict[int, Any]) -> ImportUser
+        return copy.deepcopy(self.materialize(), memo)
+
+    def __reduce_ex__(self, protocol):  # type: (int) -> Any
+        return self.materialize().__reduce_ex__(protocol)
+
+    def __repr__(self):  # type: () -> str
+        return repr(self.materialize())
+
+    def __str__(self):  # type: () -> str
+        return str(self.materialize())
+
+    def __lt__(self, other):  # type: (Any) -> bool
+        return self.name < other.name
+
+
 class ImportUser(User):
     """
     Representation of a user read from a file. Abstract class, please use one
@@ -151,9 +301,10 @@ class ImportUser(User):
     )
     prop = uadmin_property("_replace")
     _all_school_names = None  # type: Iterable[str]
-    _all_usernames = {}  # type: Dict[str, UsernameUniquenessTuple]
+    _all_usernames = UsernameIndex()  # type: UsernameIndex
     _attribute_udm_names = None  # type: Dict[str, str]
     _prop_regex = re.compile(r"<(.*?)(:.*?)*>")
+    _format_schemes = {}  # type: Dict[Tuple[Type[ImportUser], str], FormatScheme]
     _prop_providers = {
         "birthday": "make_birthday",
         "expiration_date": "make_expiration_date",
@@ -195,6 +346,10 @@ class ImportUser(User):
                 pass
 
         self._purge_ts = None  # type: str
+        # set by UserImport: write memberships of school classes and workgroups in batches
+        self.defer_group_memberships = False
+        # (added, removed) DNs of groups, written by UserImport, if defer_group_memberships is set
+        self.deferred_group_changes = ([], [])  # type: Tuple[List[str], List[str]]
         # recursion prevention:
         self._used_methods = defaultdict(list)  # type: Dict[str, List[FunctionSignature]]
         self.lo = kwargs.pop("lo", None)  # type: LoType
@@ -224,7 +379,8 @@ class ImportUser(User):
 
     def call_hooks(self, hook_time, func_name, lo):  # type: (str, str, LoType) -> None
         """
-        Runs PyHooks, then ucs-school-libs fork hooks.
+        Runs PyHooks, then ucs-school-libs fork hooks. If there are no hooks for the event, `self`
+        is not updated from LDAP.
 
         :param str hook_time: `pre` or `post`
         :param str func_name: `create`, `modify`, `move` or `remove`
@@ -233,6 +389,22 @@ class ImportUser(User):
         """
         if lo != self.lo:
             self.logger.warning('Received "lo" (%r) is not the same as self.lo (%r).', lo, self.lo)
+        event = "{}_{}".format(hook_time, func_name)
+        all_hooks = get_import_pyhooks(
+            "ucsschool.importer.utils.user_pyhook.UserPyHook",
+            self._pyhook_supports_dry_run if self.config["dry_run"] else None,
+            lo=lo,
+            dry_run=self.config["dry_run"],
+        )  # result is cached on the lib side
+        hooks = all_hooks.get(event)
+        # the hooks of ucs-school-lib are not run in a dry-run
+        lib_hooks = not self.config["dry_run"] and _pyhook_loader.get_hook_methods(
+            self.__class__, event, lo
+        )
+        if not hooks and not lib_hooks:
+            # nothing to run, don't update self from LDAP
+            return True if self.config["dry_run"] else None
+
         if hook_time == "post" and self.action in ["A", "M"] and not self.config["dry_run"]:
             # Update self from LDAP if object exists (after A and M), except after a dry-run.
             # Copy only those UDM properties from LDAP that are already set in self.udm_properties.
@@ -241,31 +413,30 @@ class ImportUser(User):
             )
             self.update(user)
 
-        self.in_hook = True
-        hooks = get_import_pyhooks(
-            "ucsschool.importer.utils.user_pyhook.UserPyHook",
-            self._pyhook_supports_dry_run if self.config["dry_run"] else None,
-            lo=lo,
-            dry_run=self.config["dry_run"],
-        )  # result is cached on the lib side
-        meth_name = "{}_{}".format(hook_time, func_name)
-        try:
-            for func in hooks.get(meth_name, []):
-                self.logger.debug(
-                    "Running %s hook %s.%s for %s...",
-                    meth_name,
-                    func.__self__.__class__.__name__,
-                    func.__func__.__name__,
-                    self,
-                )
-                func(self)
-        finally:
-            self.in_hook = False
+        with get_import_timer().measure("{}_hooks".format(hook_time)):
+            if hooks:
+                self.in_hook = True
+                try:
+                    for func in hooks:
+                        self._run_pyhook(func)
+                finally:
+                    self.in_hook = False
 
-        if self.config["dry_run"]:
-            return True
-        else:
-            super(ImportUser, self).call_hooks(hook_time, func_name, lo)
+            if self.config["dry_run"]:
+                return True
+            else:
+                super(ImportUser, self).call_hooks(hook_time, func_name, lo)
+
+    def _run_pyhook(self, func):  # type: (Callable[[ImportUser], Any]) -> None
+        """
+        Run a single hook method (UserPyHook or ucs-school-lib hook) and
+        record its duration with the import timer.
+
+        :param func: bound hook method
+        :return: None
+        """
+        with get_import_timer().measure(hook_phase(func)):
+            func(self)
 
     def call_format_hook(self, prop_name, fields):  # type: (str, Dict[str, Any]) -> Dict[str, Any]
         """
@@ -277,6 +448,7 @@ class ImportUser(User):
         :rtype: dict
         """
         hooks = get_import_pyhooks(FormatPyHook)  # result is cached on the lib side
+        timer = get_import_timer()
         res = fields
         for func in hooks.get("patch_fields_{}".format(self.role_sting), []):
             if prop_name not in func.__self__.__class__.properties:
@@ -289,7 +461,8 @@ class ImportUser(User):
                 prop_name,
                 self,
             )
-            res = func(prop_name, res)
+            with timer.measure(hook_phase(func)):
+                res = func(prop_name, res)
         return res
 
     def change_school(self, school, lo):  # type: (str, LoType) -> bool
@@ -385,6 +558,10 @@ class ImportUser(User):
             )
         return res
 
+    @timed("udm_write")
+    def do_create(self, udm_obj, lo):  # type: (UdmObjectType, LoType) -> None
+        return super(ImportUser, self).do_create(udm_obj, lo)
+
     def create_without_hooks_roles(self, lo):  # type: (LoType) -> None
         if self.config["dry_run"]:
             self.logger.info("Dry-run: skipping user.create() for %s.", self)
@@ -408,9 +585,9 @@ class ImportUser(User):
 
     @classmethod
     def get_by_import_id(
-        cls, connection, source_uid, record_uid, superordinate=None, udm_properties=None
+        cls, connection, source_uid, record_uid, superordinate=None, udm_properties=None, base=None
     ):
-        # type: (LoType, str, str, Optional[str], Optional[Iterable]) -> ImportUser
+        # type: (LoType, str, str, Optional[str], Optional[Iterable], Optional[str]) -> ImportUser
         """
         Retrieve an ImportUser.
 
@@ -419,6 +596,8 @@ class ImportUser(User):
         :param str record_uid: source record identifier
         :param str superordinate: superordinate
         :param iterable udm_properties: list of udm attributes to load into self.udm_properties
+        :param str base: LDAP search base (for example the already known DN of the user), `None` for
+            the whole LDAP tree
         :return: object of :py:class:`ImportUser` subclass loaded from LDAP or raises NoObject
         :rtype: ImportUser
         :raises ucsschool.lib.models.base.NoObject: if no user was found
@@ -435,7 +614,7 @@ class ImportUser(User):
             "(&{}(ucsschoolSourceUID=%s)(ucsschoolRecordUID=%s))".format(oc_filter),
             (source_uid, record_uid),
         )
-        obj = cls.get_only_udm_obj(connection, filter_s, superordinate=superordinate)
+        obj = cls.get_only_udm_obj(connection, filter_s, superordinate=superordinate, base=base)
         if obj:
             import_obj = cls.from_udm_obj(obj, None, connection)
             if udm_properties:
@@ -446,7 +625,8 @@ class ImportUser(User):
             dns = connection.searchDn(
                 filter_format(
                     "(&(ucsschoolSourceUID=%s)(ucsschoolRecordUID=%s))", (source_uid, record_uid)
-                )
+                ),
+                base=base or "",
             )
             if dns:
                 raise WrongObjectType(dns[0], cls)
@@ -457,6 +637,57 @@ class ImportUser(User):
                     )
                 )
 
+    @classmethod
+    def get_udm_objs_by_import_ids(cls, connection, import_ids):
+        # type: (LoType, Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], UdmObjectType]
+        """
+        Retrieve the UDM objects of many users with a single LDAP search per `source_uid`.
+
+        The objects are not opened yet, use :py:meth:`from_udm_obj()` to create
+        :py:class:`ImportUser` objects from them. Users that were not found or whose IDs are not
+        unique are missing in the result, use :py:meth:`get_by_import_id()` for them.
+
+        :param univention.admin.uldap.access connection: uldap object
+        :param import_ids: tuples (source_uid, record_uid)
+        :type import_ids: Iterable(tuple(str, str))
+        :return: mapping (source_uid, record_uid) -> UDM object
+        :rtype: dict
+        """
+        record_uids = defaultdict(set)  # type: Dict[str, Set[str]]
+        for source_uid, record_uid in import_ids:
+            if source_uid and record_uid:
+                record_uids[source_uid].add(record_uid)
+        cls.init_udm_module(connection)
+        oc_filter = cls.get_ldap_filter_for_user_role()
+        res = {}  # type: Dict[Tuple[str, str], UdmObjectType]
+        duplicates = set()  # type: Set[Tuple[str, str]]
+        for source_uid, uids in record_uids.items():
+            filter_s = "(&{}{}(|{}))".format(
+                oc_filter,
+                filter_format("(ucsschoolSourceUID=%s)", (source_uid,)),
+                "".join(filter_format("(ucsschoolRecordUID=%s)", (uid,)) for uid in sorted(uids)),
+            )
+            if cls._meta.udm_filter:
+                filter_s = "(&({}){})".format(cls._meta.udm_filter, filter_s)
+            for obj in udm_modules.lookup(
+                cls._meta.udm_module,
+                None,
+                connection,
+                scope="sub",
+                base=ucr.get("ldap/base"),
+                filter=filter_s,
+            ):
+                key = (
+                    obj.oldattr["ucsschoolSourceUID"][0].decode("UTF-8"),
+                    obj.oldattr["ucsschoolRecordUID"][0].decode("UTF-8"),
+                )
+                if key in res:
+                    duplicates.add(key)
+                res[key] = obj
+        for key in duplicates:
+            del res[key]
+        return res
+
     def deactivate(self):  # type: () -> None
         """Deactivate user account. Caller must run modify()."""
         self.disabled = "1"
@@ -538,6 +769,37 @@ class ImportUser(User):
                     entry_count=self.entry_count,
                     import_user=self,
                 )
+        if self.defer_group_memberships:
+            self._defer_group_membership_changes(udm_obj)
+
+    def _defer_group_membership_changes(self, udm_obj):  # type: (UdmObjectType) -> None
+        """
+        Remove membership changes of school classes and workgroups from `udm_obj` and store them in
+        `self.deferred_group_changes` instead, to be written by
+        :py:class:`ucsschool.importer.utils.group_membership_batch.GroupMembershipBatch`.
+
+        :param udm_obj: UDM object of the user, about to be created or modified
+        :return: None
+        """
+        old_groups = OrderedDict(
+            (dn.lower(), dn) for dn in (udm_obj.oldinfo.get("groups", []) if udm_obj.exists() else [])
+        )
+        new_groups = OrderedDict((dn.lower(), dn) for dn in udm_obj["groups"])
+        added = [dn for key, dn in new_groups.items() if key not in old_groups]
+        removed = [dn for key, dn in old_groups.items() if key not in new_groups]
+        added = [dn for dn in added if self._is_school_class_or_workgroup(dn)]
+        removed = [dn for dn in removed if self._is_school_class_or_workgroup(dn)]
+        self.deferred_group_changes = (added, removed)
+        if added or removed:
+            # keep the memberships of these groups as they are in LDAP, UDM won't touch them
+            udm_obj["groups"] = [dn for dn in new_groups.values() if dn not in added] + removed
+
+    @staticmethod
+    def _is_school_class_or_workgroup(group_dn):  # type: (str) -> bool
+        school = Group.get_school_from_dn(group_dn)
+        return bool(school) and (
+            Group.is_school_class(school, group_dn) or Group.is_school_workgroup(school, group_dn)
+        )
 
     @classmethod
     def get_all_school_names(cls, lo):  # type: (LoType) -> Iterable[str]
@@ -1070,7 +1332,7 @@ class ImportUser(User):
             and self.old_user.name != self.name
             and UNIQUENESS not in self.config.get("skip_tests", [])
         ):
-            del self._all_usernames[self.old_user.name]
+            self._all_usernames.pop(self.old_user.name, None)
             self._all_usernames[self.name] = UsernameUniquenessTuple(
                 self.record_uid, self.source_uid, self.dn
             )
@@ -1106,6 +1368,10 @@ class ImportUser(User):
         else:
             return super(ImportUser, self).modify_without_hooks(lo, validate, move_if_necessary)
 
+    @timed("udm_write")
+    def do_modify(self, udm_obj, lo):  # type: (UdmObjectType, LoType) -> None
+        return super(ImportUser, self).do_modify(udm_obj, lo)
+
     def move(self, lo, udm_obj=None, force=False):
         # type: (LoType, Optional[UdmObjectType], Optional[bool]) -> bool
         self.lo = lo
@@ -1163,7 +1429,10 @@ class ImportUser(User):
 
     def remove(self, lo):  # type: (LoType) -> bool
         self.lo = lo
-        return super(ImportUser, self).remove(lo)
+        res = super(ImportUser, self).remove(lo)
+        if res and UNIQUENESS not in self.config.get("skip_tests", []):
+            self._all_usernames.pop(self.name, None)
+        return res
 
     def remove_without_hooks(self, lo):  # type: (LoType) -> bool
         if self.config["dry_run"]:
@@ -1172,6 +1441,7 @@ class ImportUser(User):
         else:
             return super(ImportUser, self).remove_without_hooks(lo)
 
+    @timed("validate")
     def validate(self, lo, validate_unlikely_changes=False, check_username=False, check_name=True):
         # type: (LoType, Optional[bool], Optional[bool]) -> None
         """
@@ -1344,22 +1614,8 @@ class ImportUser(User):
         self.check_schools(lo)
 
         if UNIQUENESS not in skip_tests:
-            if not self._all_usernames:
-                # fetch usernames of all users only once per import job
-                # its faster to filter out computer names in Python than in LDAP
-                # (and we have to loop over the query result anyway)
-                self.__class__._all_usernames = {
-                    attr["uid"][0].decode("UTF-8"): UsernameUniquenessTuple(
-                        attr.get("ucsschoolRecordUID", [b""])[0].decode("UTF-8") or None,
-                        attr.get("ucsschoolSourceUID", [b""])[0].decode("UTF-8") or None,
-                        dn,
-                    )
-                    for dn, attr in lo.search(
-                        "objectClass=posixAccount",
-                        attr=["uid", "ucsschoolRecordUID", "ucsschoolSourceUID"],
-                    )
-                    if not attr["uid"][0].endswith(b"$")
-                }
+            # fetch usernames of all users only once per import job
+            self._all_usernames.load(lo)
             self._check_username_uniqueness()
 
     def _check_username_uniqueness(self):  # type: () -> None
@@ -1471,9 +1727,7 @@ class ImportUser(User):
         :param dict kwargs: additional data to use for formatting
         :return: None
         """
-        no_brackets = scheme
-        props_used_in_scheme = [x[0] for x in self._prop_regex.findall(no_brackets) if x[0]]
-        for prop_used_in_scheme in props_used_in_scheme:
+        for prop_used_in_scheme, method_sig in self.get_format_scheme(scheme).dependencies:
             if (
                 hasattr(self, prop_used_in_scheme)
                 and getattr(self, prop_used_in_scheme)
@@ -1496,11 +1750,6 @@ class ImportUser(User):
                     entry_count=self.entry_count,
                     import_user=self,
                 )
-
-            try:
-                method_sig = FunctionSignature(self._prop_providers[prop_used_in_scheme], (), {})
-            except KeyError:
-                method_sig = FunctionSignature("make_udm_property", (prop_used_in_scheme,), {})
             if method_sig in self._used_methods[prop_to_format]:
                 # already ran make_<method_name>() for his formatting job
                 self.logger.error(
@@ -1521,6 +1770,24 @@ class ImportUser(User):
             getattr(self, method_sig.name)(*method_sig.args, **method_sig.kwargs)
         self._used_methods.pop(prop_to_format, None)
 
+    @classmethod
+    def get_format_scheme(cls, scheme):  # type: (str) -> FormatScheme
+        """
+        Get the parsed form of `scheme`. It is parsed only once per class and scheme, so the
+        <properties> used in it and the make_*() methods providing them are known without looking at
+        the scheme again for every user.
+
+        :param str scheme: scheme from the configuration
+        :return: FormatScheme object
+        :rtype: FormatScheme
+        """
+        try:
+            return cls._format_schemes[(cls, scheme)]
+        except KeyError:
+            res = FormatScheme(scheme, cls._prop_regex, cls._prop_providers, cls.prop._replace)
+            cls._format_schemes[(cls, scheme)] = res
+            return res
+
     def format_from_scheme(self, prop_name, scheme, **kwargs):  # type: (str, str, **str) -> str
         """
         Format property with scheme for current import_user.
@@ -1539,6 +1806,10 @@ class ImportUser(User):
         :return: formatted string
         :rtype: str
         """
+        format_scheme = self.get_format_scheme(scheme)
+        if scheme and not format_scheme.has_variables:
+            # constant, no need to collect data
+            return scheme
         self.solve_format_dependencies(prop_name, scheme, **kwargs)
         if self.input_data:
             all_fields = self.reader.get_data_mapping(self.input_data)
@@ -1551,7 +1822,7 @@ class ImportUser(User):
         all_fields.update(kwargs)
         all_fields = self.call_format_hook(prop_name, all_fields)
 
-        res = self.prop._replace(scheme, all_fields)
+        res = format_scheme(all_fields)
         if not res:
             self.logger.warning(
                 "Created empty '{prop_name}' from scheme '{scheme}' and input data {data}. ".format(
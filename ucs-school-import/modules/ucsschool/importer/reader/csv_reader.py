@@ -32,6 +32,10 @@
 """CSV reader for CSV files using the new import format."""
 
 import codecs
+import hashlib
+import json
+import logging
+import os
 import sys
 from csv import Error as CsvError, Sniffer, reader as csv_reader
 from io import IOBase
@@ -58,6 +62,7 @@ import univention.admin.modules
 from ucsschool.lib.models.user import Staff
 from ucsschool.lib.roles import role_pupil, role_staff, role_teacher
 
+from ..configuration import Configuration
 from ..contrib.csv import DictReader
 from ..exceptions import ConfigurationError, InitialisationError, NoRole, UnknownProperty, UnknownRole
 from .base_reader import BaseReader
@@ -68,11 +73,201 @@ if TYPE_CHECKING:
     from ..models.import_user import ImportUser  # noqa: F401
 
 
+# number of bytes to detect the encoding of large input files from
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+# number of entries in the encoding cache file
+ENCODING_CACHE_ENTRIES = 100
+_CACHE_KEY_SAMPLE_SIZE = 64 * 1024
+_VALIDATION_CHUNK_SIZE = 1024 * 1024
+# bytes libmagic accepts in ISO-8859-1 text: BEL - CR, ESC, printable ASCII and 0xA0 - 0xFF
+_LATIN1_TEXT_BYTES = bytes(
+    bytearray([7, 8, 9, 10, 11, 12, 13, 27] + list(range(32, 127)) + list(range(160, 256)))
+)
+_ASCII_BYTES = bytes(bytearray(range(128)))
+_encoding_cache = {}  # type: Dict[str, str]
+
+
 class UnsupportedEncodingError(Exception):
     def __init__(self, message):
         super().__init__(message)
 
 
+def _magic_encoding(txt, logger=None):  # type: (bytes, Optional[logging.Logger]) -> str
+    """Detect the encoding of `txt` with libmagic."""
+    if hasattr(magic, "from_file"):
+        encoding = magic.Magic(mime_encoding=True).from_buffer(txt)
+    elif hasattr(magic, "detect_from_filename"):
+        encoding = magic.detect_from_content(txt).encoding
+    else:
+        raise RuntimeError('Unknown version or type of "magic" library.')
+
+    if not any(
+        encoding.startswith(enc)
+        for enc in ["binary", "utf-8", "utf-16", "iso-8859-1", "latin-1", "ascii", "us-ascii"]
+    ):
+        raise UnsupportedEncodingError(
+            "Unsupported encoding '{}' detected, "
+            "please check the manual for supported encodings.".format(encoding)
+        )
+
+    if logger:
+        logger.debug(
+            (
+                "magic.Magic detected {}\n"
+                "BOM characters present in content:\n"
+                "\tBOM_UTF8:{}\n"
+                "\tBOM_UTF16_LE:{}\n"
+                "\tBOM_UTF16_BE:{}"
+            ).format(
+                encoding,
+                txt.startswith(codecs.BOM_UTF8),
+                txt.startswith(codecs.BOM_UTF16_LE),
+                txt.startswith(codecs.BOM_UTF16_BE),
+            )
+        )
+    # auto detect utf-8 with BOM
+    if encoding == "utf-8" and txt.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+
+    # Bug #56746
+    elif encoding.startswith("utf-16"):
+        encoding = "utf-16"
+
+    elif encoding == "us-ascii":
+        encoding = "ascii"
+
+    return encoding
+
+
+def _validate_rest(fp, head, encoding):  # type: (BinaryIO, bytes, str) -> Optional[str]
+    """
+    Check that `head` and the rest of the file can be read with `encoding`,
+    using a strict incremental decoder, one chunk at a time.
+
+    :return: `encoding` (`ascii` instead of `utf-8`, if all data is ASCII) or
+        None if the data cannot be read with `encoding`
+    """
+    decoder = codecs.getincrementaldecoder("utf-8" if encoding == "ascii" else encoding)("strict")
+    is_ascii = encoding == "ascii"
+    chunk = head
+    try:
+        while True:
+            if encoding == "iso-8859-1":
+                # like libmagic: no C1 control characters (that's "unknown-8bit")
+                if chunk.translate(None, _LATIN1_TEXT_BYTES):
+                    return None
+            elif b"\x00" in chunk and not encoding.startswith("utf-16"):
+                return None  # binary
+            else:
+                decoder.decode(chunk)
+                is_ascii = is_ascii and not chunk.translate(None, _ASCII_BYTES)
+            chunk = fp.read(_VALIDATION_CHUNK_SIZE)
+            if not chunk:
+                break
+        decoder.decode(b"", True)
+    except UnicodeDecodeError:
+        return None
+    if encoding == "ascii" and not is_ascii:
+        return "utf-8"
+    return encoding
+
+
+def _detect_encoding(fp, logger, sample_size, cache_file):
+    # type: (BinaryIO, Optional[logging.Logger], int, str) -> str
+    """Detect the encoding of the data in `fp`, starting at the current position."""
+    start = fp.tell()
+    sample = fp.read(sample_size) if sample_size > 0 else fp.read()
+    cache_key = None
+    try:
+        st = os.fstat(fp.fileno())
+    except (AttributeError, IOError, OSError, ValueError):
+        pass
+    else:
+        # Python 2: no st_mtime_ns
+        mtime_ns = getattr(st, "st_mtime_ns", None) or int(st.st_mtime * 1000000000)
+        cache_key = "{}:{}:{}:{}:{}".format(
+            st.st_size,
+            mtime_ns,
+            start,
+            sample_size,
+            hashlib.sha256(sample[:_CACHE_KEY_SAMPLE_SIZE]).hexdigest(),
+        )
+        encoding = _encoding_cache.get(cache_key) or _load_cached_encoding(cache_file, cache_key)
+        if encoding:
+            if logger:
+                logger.debug("Using cached encoding %r of input file.", encoding)
+            _encoding_cache[cache_key] = encoding
+            return encoding
+
+    encoding = None
+    if sample_size <= 0 or len(sample) < sample_size:
+        # whole file read
+        encoding = _magic_encoding(sample, logger)
+    else:
+        if sample.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+            pass  # let libmagic decide
+        elif sample.startswith(codecs.BOM_UTF8):
+            encoding = _validate_rest(fp, sample, "utf-8-sig")
+        elif sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            encoding = _validate_rest(fp, sample, "utf-16")
+        else:
+            # don't split a multi-byte character at the end of the sample
+            head = sample[: sample.rfind(b"\n") + 1] or sample
+            try:
+                sample_encoding = _magic_encoding(head)
+            except UnsupportedEncodingError:
+                sample_encoding = None
+            if sample_encoding in ("ascii", "utf-8", "iso-8859-1"):
+                encoding = _validate_rest(fp, sample[len(head) :], sample_encoding)
+        if encoding:
+            if logger:
+                logger.debug(
+                    "Detected encoding %r from the first %d bytes, validated the rest.",
+                    encoding,
+                    len(sample),
+                )
+        else:
+            if logger:
+                logger.debug("Cannot detect encoding from a sample, reading the whole file.")
+            fp.seek(start)
+            encoding = _magic_encoding(fp.read(), logger)
+
+    if cache_key:
+        _encoding_cache[cache_key] = encoding
+        _store_cached_encoding(cache_file, cache_key, encoding)
+    return encoding
+
+
+def _load_cached_encoding(cache_file, cache_key):  # type: (str, str) -> Optional[str]
+    if not cache_file:
+        return None
+    try:
+        with open(cache_file) as fp:
+            return json.load(fp).get(cache_key)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _store_cached_encoding(cache_file, cache_key, encoding):  # type: (str, str, str) -> None
+    if not cache_file:
+        return
+    try:
+        with open(cache_file) as fp:
+            cache = json.load(fp)
+    except (IOError, OSError, ValueError):
+        cache = {}
+    cache[cache_key] = encoding
+    # keep the most recent entries
+    cache = dict(list(cache.items())[-ENCODING_CACHE_ENTRIES:])
+    tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    try:
+        with open(tmp_file, "w") as fp:
+            json.dump(cache, fp)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+        logging.getLogger(__name__).warning("Could not write encoding cache %r.", cache_file)
+
+
 def py3_decode(data, encoding):  # type: (Union[str, bytes], str) -> str
     return data.decode(encoding) if PY3 and isinstance(data, bytes) else data
 
@@ -106,14 +301,32 @@ class CsvReader(BaseReader):
         univention.admin.modules.init(self.lo, self.position, usersmod)
 
     @staticmethod
-    def get_encoding(filename_or_file, logger=None):  # type: (Union[str, BinaryIO]) -> str
+    def get_encoding(filename_or_file, logger=None, sample_size=None, cache_file=None):
+        # type: (Union[str, BinaryIO], Optional[logging.Logger], Optional[int], Optional[str]) -> str
         """
         Get encoding of file ``filename_or_file``.
 
         Handles both magic libraries.
 
+        If the file is larger than `sample_size` bytes, only a sample is passed
+        to libmagic. Files starting with a UTF-8 or UTF-16 BOM and samples
+        detected as ASCII, UTF-8 or ISO-8859-1 are accepted, if the rest of the
+        file can be decoded by a strict incremental decoder (which does not keep
+        the file in memory). Otherwise the whole file is passed to libmagic.
+
+        Results are cached per input file in memory and optionally in
+        `cache_file`.
+
         :param filename_or_file: filename or open file
         :type filename_or_file: str or file
+        :param logging.Logger logger: optional logger for debug messages
+        :param int sample_size: number of bytes to detect the encoding from, `0`
+            to read the whole file, `None` for the value of the configuration key
+            `csv:encoding_detection:sample_size` (or
+            :py:data:`ENCODING_SAMPLE_SIZE`, if there is no configuration)
+        :param str cache_file: path to a JSON file to store detected encodings
+            in, `""` to disable it, `None` for the value of the configuration key
+            `csv:encoding_detection:cache_file`
         :return: encoding of filename_or_file
         :rtype: str
         """
@@ -122,62 +335,30 @@ class CsvReader(BaseReader):
         except NameError:
             FileType = IOBase
 
+        if sample_size is None or cache_file is None:
+            try:
+                conf = Configuration().get("csv", {}).get("encoding_detection", {})
+            except InitialisationError:
+                conf = {}
+            if sample_size is None:
+                sample_size = conf.get("sample_size", ENCODING_SAMPLE_SIZE)
+            if cache_file is None:
+                cache_file = conf.get("cache_file", "")
+
         if isinstance(filename_or_file, string_types):
             with open(filename_or_file, "rb") as fp:
-                txt = fp.read()
+                return _detect_encoding(fp, logger, sample_size, cache_file)
         elif isinstance(filename_or_file, FileType):
             old_pos = filename_or_file.tell()
-            txt = filename_or_file.read()
-            filename_or_file.seek(old_pos)
+            try:
+                return _detect_encoding(filename_or_file, logger, sample_size, cache_file)
+            finally:
+                filename_or_file.seek(old_pos)
         else:
             raise ValueError(
                 'Argument "filename_or_file" has unknown type {!r}.'.format(type(filename_or_file))
             )
 
-        if hasattr(magic, "from_file"):
-            encoding = magic.Magic(mime_encoding=True).from_buffer(txt)
-        elif hasattr(magic, "detect_from_filename"):
-            encoding = magic.detect_from_content(txt).encoding
-        else:
-            raise RuntimeError('Unknown version or type of "magic" library.')
-
-        if not any(
-            encoding.startswith(enc)
-            for enc in ["binary", "utf-8", "utf-16", "iso-8859-1", "latin-1", "ascii", "us-ascii"]
-        ):
-            raise UnsupportedEncodingError(
-                "Unsupported encoding '{}' detected, "
-                "please check the manual for supported encodings.".format(encoding)
-            )
-
-        if logger:
-            logger.debug(
-                (
-                    "magic.Magic detected {}\n"
-                    "BOM characters present in content:\n"
-                    "\tBOM_UTF8:{}\n"
-                    "\tBOM_UTF16_LE:{}\n"
-                    "\tBOM_UTF16_BE:{}"
-                ).format(
-                    encoding,
-                    txt.startswith(codecs.BOM_UTF8),
-                    txt.startswith(codecs.BOM_UTF16_LE),
-                    txt.startswith(codecs.BOM_UTF16_BE),
-                )
-            )
-        # auto detect utf-8 with BOM
-        if encoding == "utf-8" and txt.startswith(codecs.BOM_UTF8):
-            encoding = "utf-8-sig"
-
-        # Bug #56746
-        elif encoding.startswith("utf-16"):
-            encoding = "utf-16"
-
-        elif encoding == "us-ascii":
-            encoding = "ascii"
-
-        return encoding
-
     def get_dialect(self, fp, encoding):  # type: (BinaryIO, str) -> Type[Dialect]
         """
         Overwrite me to force a certain CSV dialect.
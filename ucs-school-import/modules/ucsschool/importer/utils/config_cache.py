@@ -0,0 +1,287 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+Cache of compiled import configurations.
+
+Two kinds of entries are stored:
+
+* *files* entries hold the merged and schema validated content of a chain of
+  configuration files. They are keyed by the paths, modification times and
+  sizes of the configuration files and the JSON schema.
+* *checked* entries hold the final configuration after the command line
+  arguments were applied, the ``ConfigPyHook`` hooks ran and the configuration
+  checks passed. They are keyed by the *files* key and the command line
+  arguments. Additionally the state of the UCR files, the configuration checks
+  directory and the Python hooks directory is stored in the entry and compared
+  when loading it.
+
+Entries older than the UCR variable ``ucsschool/import/config_cache/max_age``
+are ignored and removed. The cache can be disabled with the UCR variable
+``ucsschool/import/config_cache``.
+"""
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple  # noqa: F401
+
+CONFIG_CACHE_DIR = "/var/cache/ucs-school-import/config"
+CONFIG_CACHE_MAX_AGE = 3600
+UCR_FILES = (
+    "/etc/univention/base.conf",
+    "/etc/univention/base-defaults.conf",
+    "/etc/univention/base-forced.conf",
+    "/etc/univention/base-ldap.conf",
+)
+
+
+class ConfigurationCache(object):
+    """
+    File based cache of compiled configurations.
+
+    All errors accessing the cache are logged and treated as cache misses, the
+    cache never prevents the configuration from being read.
+    """
+
+    def __init__(self, cache_dir=CONFIG_CACHE_DIR, max_age=CONFIG_CACHE_MAX_AGE, enabled=True):
+        # type: (str, int, bool) -> None
+        """
+        :param str cache_dir: directory to store the cache entries in
+        :param int max_age: number of seconds after which entries are ignored
+        :param bool enabled: whether to use the cache at all
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.enabled = enabled
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_ucr(cls):  # type: () -> ConfigurationCache
+        """Create a cache object configured by UCR variables."""
+        from ucsschool.lib.models.utils import ucr
+
+        try:
+            max_age = int(ucr.get("ucsschool/import/config_cache/max_age", CONFIG_CACHE_MAX_AGE))
+        except ValueError:
+            max_age = CONFIG_CACHE_MAX_AGE
+        return cls(max_age=max_age, enabled=ucr.is_true("ucsschool/import/config_cache", True))
+
+    @staticmethod
+    def file_state(path):  # type: (str) -> Optional[List[float]]
+        """
+        :param str path: file or directory
+        :return: modification time and size of `path` or `None` if it does not exist
+        :rtype: list or None
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_mtime, st.st_size]
+
+    @classmethod
+    def dir_state(cls, path):  # type: (str) -> Dict[str, Optional[List[float]]]
+        """
+        State of a directory and the Python modules in it.
+
+        :param str path: directory
+        :return: mapping of paths to their :py:meth:`file_state`
+        :rtype: dict
+        """
+        res = {path: cls.file_state(path)}
+        try:
+            names = os.listdir(path)
+        except OSError:
+            names = []
+        for name in names:
+            if name.endswith(".py"):
+                filename = os.path.join(path, name)
+                res[filename] = cls.file_state(filename)
+        return res
+
+    @staticmethod
+    def make_key(data):  # type: (Any) -> str
+        """
+        :param data: JSON serializable data
+        :return: hex digest
+        :rtype: str
+        :raises TypeError: if `data` is not JSON serializable
+        """
+        serialized = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def files_key(self, filenames, schema_file):  # type: (Iterable[str], str) -> Optional[str]
+        """
+        :param filenames: configuration files in the order they are read
+        :type filenames: list(str)
+        :param str schema_file: JSON schema the files are validated against
+        :return: key of the *files* entry or `None` if the cache is disabled
+        :rtype: str or None
+        """
+        if not self.enabled:
+            return None
+        return self.make_key(
+            [
+                "files",
+                [schema_file, self.file_state(schema_file)],
+                [[os.path.abspath(fn), self.file_state(fn)] for fn in filenames],
+            ]
+        )
+
+    def checked_key(self, files_key, kwargs):  # type: (Optional[str], Dict[str, Any]) -> Optional[str]
+        """
+        :param files_key: result of :py:meth:`files_key`
+        :type files_key: str or None
+        :param dict kwargs: command line arguments without callables (see :py:meth:`split_kwargs`)
+        :return: key of the *checked* entry or `None` if the cache is disabled or
+            `kwargs` is not JSON serializable
+        :rtype: str or None
+        """
+        if not files_key:
+            return None
+        try:
+            return self.make_key(["checked", files_key, kwargs])
+        except (TypeError, ValueError):
+            self.logger.debug("Not caching configuration: command line arguments not serializable.")
+            return None
+
+    @staticmethod
+    def split_kwargs(kwargs):  # type: (Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]
+        """
+        Separate callables (like `progress_notification_function`) from the
+        command line arguments, as they can neither be part of a key nor be
+        stored.
+
+        :param dict kwargs: command line arguments
+        :return: 2-tuple: arguments without callables, callables
+        :rtype: tuple(dict, dict)
+        """
+        plain, volatile = {}, {}
+        for k, v in kwargs.items():
+            (volatile if callable(v) else plain)[k] = v
+        return plain, volatile
+
+    def dependencies(self, hooks_dir, checks_dir):  # type: (str, str) -> Dict[str, Any]
+        """
+        State of the files that influence the outcome of the config hooks and
+        configuration checks, besides the configuration itself.
+
+        :param str hooks_dir: directory of the Python hooks
+        :param str checks_dir: directory of the configuration checks
+        :return: mapping of paths to their :py:meth:`file_state`
+        :rtype: dict
+        """
+        res = {fn: self.file_state(fn) for fn in UCR_FILES}
+        res.update(self.dir_state(checks_dir))
+        res.update(self.dir_state(hooks_dir))
+        return res
+
+    def _path(self, key):  # type: (str) -> str
+        return os.path.join(self.cache_dir, "{}.json".format(key))
+
+    def load(self, key):  # type: (Optional[str]) -> Optional[Dict[str, Any]]
+        """
+        :param key: cache key, if `None`, `None` is returned
+        :type key: str or None
+        :return: the cached configuration or `None` if there is no valid entry
+        :rtype: dict or None
+        """
+        if not key:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.max_age:
+                self.logger.debug("Configuration cache entry %r expired.", path)
+                return None
+            with open(path) as fp:
+                entry = json.load(fp)
+        except (IOError, OSError, ValueError) as exc:
+            if getattr(exc, "errno", None) != errno.ENOENT:
+                self.logger.debug("Ignoring configuration cache entry %r: %s", path, exc)
+            return None
+        for filename, state in entry.get("dependencies", {}).items():
+            if self.file_state(filename) != state:
+                self.logger.debug("Configuration cache entry %r outdated by %r.", path, filename)
+                return None
+        return entry["config"]
+
+    def store(self, key, config, dependencies=None):
+        # type: (Optional[str], Dict[str, Any], Optional[Dict[str, Any]]) -> None
+        """
+        Atomically store a cache entry and remove expired entries.
+
+        :param key: cache key, if `None`, nothing is stored
+        :type key: str or None
+        :param dict config: configuration to store, must be JSON serializable
+        :param dependencies: result of :py:meth:`dependencies`, validated when loading
+        :type dependencies: dict or None
+        :return: None
+        """
+        if not key:
+            return
+        try:
+            data = json.dumps({"config": config, "dependencies": dependencies or {}})
+        except (TypeError, ValueError) as exc:
+            self.logger.debug("Not caching configuration: %s", exc)
+            return
+        try:
+            try:
+                os.makedirs(self.cache_dir, 0o700)
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            self.remove_expired()
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w") as fp:
+                    fp.write(data)
+                os.rename(tmp_path, self._path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (IOError, OSError) as exc:
+            self.logger.debug("Could not write configuration cache entry: %s", exc)
+
+    def remove_expired(self):  # type: () -> None
+        """Remove entries older than `max_age`."""
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if now - os.stat(path).st_mtime > self.max_age:
+                    os.unlink(path)
+            except OSError:
+                pass
@@ -41,6 +41,12 @@ module in ``/usr/share/ucs-school-import/checks`` and add its module name
 Remove ``defaults`` from your ``configuration_checks`` only if you know what you
 are doing.
 
+The checked configuration is cached (see
+:py:mod:`ucsschool.importer.utils.config_cache`). Checks do not run again until
+a configuration file, a command line argument, a UCR variable, a module in the
+checks or Python hooks directory changes, or the cache entry expires after
+``ucsschool/import/config_cache/max_age`` seconds.
+
 ----
 
 Example: Save the following to ``/usr/share/ucs-school-import/checks/mychecks.py``:
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Storage of fingerprints of imported input records, used by the delta import mode."""
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Tuple  # noqa: F401
+
+
+class FingerprintStore(object):
+    """
+    SQLite database storing a fingerprint of the last successfully imported input record for each
+    `(source_uid, record_uid)`.
+    """
+
+    def __init__(self, filename):  # type: (str) -> None
+        """:param str filename: path to the SQLite database file, will be created if missing"""
+        self.filename = filename
+        self.logger = logging.getLogger(__name__)
+        self._db = None  # type: sqlite3.Connection
+
+    @property
+    def db(self):  # type: () -> sqlite3.Connection
+        if self._db is None:
+            try:
+                os.makedirs(os.path.dirname(self.filename), 0o700)
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            self.logger.debug("Opening fingerprint database %r...", self.filename)
+            self._db = sqlite3.connect(self.filename)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS fingerprints ("
+                    "source_uid TEXT NOT NULL, "
+                    "record_uid TEXT NOT NULL, "
+                    "fingerprint TEXT NOT NULL, "
+                    "PRIMARY KEY (source_uid, record_uid))"
+                )
+        return self._db
+
+    @staticmethod
+    def make_fingerprint(data):  # type: (Any) -> str
+        """
+        Calculate fingerprint of JSON serializable `data`.
+
+        :param data: data to create the fingerprint of
+        :return: hex digest
+        :rtype: str
+        """
+        serialized = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def load(self, source_uid):  # type: (str) -> Dict[Tuple[str, str], str]
+        """
+        Load all fingerprints of a source database.
+
+        :param str source_uid: ID of the source database
+        :return: mapping (source_uid, record_uid) -> fingerprint
+        :rtype: dict
+        """
+        cursor = self.db.execute(
+            "SELECT record_uid, fingerprint FROM fingerprints WHERE source_uid=?", (source_uid,)
+        )
+        return {(source_uid, record_uid): fingerprint for record_uid, fingerprint in cursor}
+
+    def store(self, fingerprints):  # type: (Iterable[Tuple[str, str, str]]) -> None
+        """
+        Store fingerprints, replacing existing ones.
+
+        :param fingerprints: tuples (source_uid, record_uid, fingerprint)
+        :type fingerprints: Iterable(tuple(str, str, str))
+        :return: None
+        """
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO fingerprints (source_uid, record_uid, fingerprint) "
+                "VALUES (?, ?, ?)",
+                fingerprints,
+            )
+
+    def remove(self, ids):  # type: (Iterable[Tuple[str, str]]) -> None
+        """
+        Remove fingerprints.
+
+        :param ids: tuples (source_uid, record_uid)
+        :type ids: Iterable(tuple(str, str))
+        :return: None
+        """
+        with self.db:
+            self.db.executemany(
+                "DELETE FROM fingerprints WHERE source_uid=? AND record_uid=?",
+                ids,
+            )
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Collect membership changes of school classes and workgroups and write them per group."""
+
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List  # noqa: F401
+
+import univention.admin.modules
+from univention.admin.uexceptions import base as UdmBaseError
+
+from ..exceptions import GroupMembershipError
+
+if TYPE_CHECKING:
+    from .ldap_connection import LoType, PoType  # noqa: F401
+
+
+class GroupMembershipBatch(object):
+    """
+    Membership changes of groups (school classes and workgroups), collected while importing users
+    and written with one LDAP modify per group (and kind of change) by :py:meth:`flush()`.
+
+    A user added to and then removed from a group (or vice versa) results in no change.
+    """
+
+    def __init__(self):  # type: () -> None
+        self.logger = logging.getLogger(__name__)
+        # group DN (lower case) -> group DN, {user DN: uid} to add, {user DN: uid} to remove
+        self._changes = OrderedDict()  # type: Dict[str, List[Any]]
+
+    def __len__(self):  # type: () -> int
+        return len(self._changes)
+
+    def add(self, user_dn, uid, added_groups, removed_groups):
+        # type: (str, str, Iterable[str], Iterable[str]) -> None
+        """
+        Record membership changes of a user.
+
+        :param str user_dn: DN of the user
+        :param str uid: username of the user
+        :param added_groups: DNs of groups the user should be added to
+        :type added_groups: Iterable(str)
+        :param removed_groups: DNs of groups the user should be removed from
+        :type removed_groups: Iterable(str)
+        :return: None
+        """
+        for group_dn, to, other in [(dn, 1, 2) for dn in added_groups] + [
+            (dn, 2, 1) for dn in removed_groups
+        ]:
+            change = self._changes.setdefault(group_dn.lower(), [group_dn, {}, {}])
+            if change[other].pop(user_dn, None) is None:
+                change[to][user_dn] = uid
+
+    def flush(self, lo, position):  # type: (LoType, PoType) -> List[GroupMembershipError]
+        """
+        Write all recorded changes to LDAP and forget them.
+
+        :param univention.admin.uldap.access lo: LDAP connection object
+        :param univention.admin.uldap.position position: LDAP position object
+        :return: errors of groups that could not be modified
+        :rtype: list(GroupMembershipError)
+        """
+        errors = []  # type: List[GroupMembershipError]
+        if not self._changes:
+            return errors
+        group_mod = univention.admin.modules.get("groups/group")
+        univention.admin.modules.init(lo, position, group_mod)
+        self.logger.info("Writing membership changes of %d groups...", len(self._changes))
+        changes, self._changes = self._changes, OrderedDict()
+        for group_dn, add, remove in changes.values():
+            if not add and not remove:
+                continue
+            self.logger.debug(
+                "Group %r: adding %d users, removing %d users.", group_dn, len(add), len(remove)
+            )
+            try:
+                group_obj = group_mod.object(None, lo, position, group_dn)
+                if add:
+                    group_obj.fast_member_add(list(add.keys()), list(add.values()))
+                if remove:
+                    group_obj.fast_member_remove(list(remove.keys()), list(remove.values()))
+            except UdmBaseError as exc:
+                self.logger.error("Error modifying members of group %r: %s", group_dn, exc)
+                errors.append(
+                    GroupMembershipError(
+                        "Error adding users {!r} to and removing users {!r} from group {!r}: "
+                        "{}".format(sorted(add.values()), sorted(remove.values()), group_dn, exc)
+                    )
+                )
+        return errors
@@ -0,0 +1,699 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of the user import against an in-memory LDAP directory.
+
+A directory with the school OUs is set up in an
+:py:class:`~ucsschool.importer.utils.memory_ldap.InMemoryAccess` object, and users created by
+:py:class:`~ucsschool.importer.utils.test_user_creator.TestUserCreator` are imported in up to three
+passes: `create` (all users are new), `modify` (all users changed) and `delete` (empty input). Each
+pass runs in its own process (forked from the one before it, so it inherits the directory), like a
+real import job. Per pass users/sec, LDAP operations per user, peak memory and the durations of the
+import phases are reported.
+
+UDM, ucsschool.lib and the import must be installed, but no LDAP server, joined domain or UCR
+configuration is needed.
+"""
+
+import json
+import logging
+import os
+import random
+import resource
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence  # noqa: F401
+
+import univention.admin
+from ucsschool.lib.models.utils import get_file_handler, ucr
+from ucsschool.lib.schoolldap import SchoolSearchBase
+from univention.admin import uldap
+
+from ..configuration import setup_configuration
+from ..factory import setup_factory
+from ..writer.test_user_csv_exporter import TestUserCsvExporter
+from . import ldap_connection
+from .memory_ldap import InMemoryAccess
+from .test_user_creator import TestUserCreator
+from .timing import get_import_timer
+
+CONFIG_DIR = "/usr/share/ucs-school-import/configs"
+DEFAULT_LDAP_BASE = "dc=school,dc=bench"
+DEFAULT_SCHOOLS = ("bench1", "bench2")
+DOMAIN_SID = "S-1-5-21-1000000000-2000000000-3000000000"
+PASSES = ("create", "modify", "delete")
+SCENARIOS = {
+    "default": [],
+    "sisopi": ["user_import_sisopi.json"],
+}
+SOURCE_UID = "TESTID"  # from ucs-school-testuser-import.json
+USERS_PER_CLASS = 25
+# fractions of students, teachers, staff and staff_and_teachers
+ROLE_MIX = (("students", 0.85), ("teachers", 0.1), ("staff", 0.03), ("staffteachers", 0.02))
+
+_USER_OPTIONS = ("ucsschoolStudent", "ucsschoolTeacher", "ucsschoolStaff", "ucsschoolAdministrator")
+# name, modules, CLI name, LDAP attribute, object class, multi value, options
+_EXTENDED_ATTRIBUTES = (
+    (
+        "ucsschoolSchool",
+        ("users/user",),
+        "school",
+        "ucsschoolSchool",
+        "ucsschoolType",
+        True,
+        _USER_OPTIONS,
+    ),
+    (
+        "ucsschoolSourceUID",
+        ("users/user",),
+        "ucsschoolSourceUID",
+        "ucsschoolSourceUID",
+        "ucsschoolType",
+        False,
+        _USER_OPTIONS,
+    ),
+    (
+        "ucsschoolRecordUID",
+        ("users/user",),
+        "ucsschoolRecordUID",
+        "ucsschoolRecordUID",
+        "ucsschoolType",
+        False,
+        _USER_OPTIONS,
+    ),
+    (
+        "ucsschoolPurgeTimestamp",
+        ("users/user",),
+        "ucsschoolPurgeTimestamp",
+        "ucsschoolPurgeTimestamp",
+        "ucsschoolType",
+        False,
+        _USER_OPTIONS,
+    ),
+    (
+        "ucsschoolRoleUsers",
+        ("users/user",),
+        "ucsschoolRole",
+        "ucsschoolRole",
+        "ucsschoolType",
+        True,
+        _USER_OPTIONS,
+    ),
+    (
+        "ucsschoolRoleGroups",
+        ("groups/group",),
+        "ucsschoolRole",
+        "ucsschoolRole",
+        "ucsschoolGroup",
+        True,
+        (),
+    ),
+    (
+        "ucsschoolRoleOU",
+        ("container/ou",),
+        "ucsschoolRole",
+        "ucsschoolRole",
+        "ucsschoolOrganizationalUnit",
+        True,
+        ("UCSschool-School-OU",),
+    ),
+    (
+        "UCSschool-School-displayName",
+        ("container/ou",),
+        "displayName",
+        "displayName",
+        "ucsschoolOrganizationalUnit",
+        False,
+        ("UCSschool-School-OU",),
+    ),
+    (
+        "UCSschool-School-HomeShareFileServer",
+        ("container/ou",),
+        "ucsschoolHomeShareFileServer",
+        "ucsschoolHomeShareFileServer",
+        "ucsschoolOrganizationalUnit",
+        False,
+        ("UCSschool-School-OU",),
+    ),
+    (
+        "UCSschool-School-ClassShareFileServer",
+        ("container/ou",),
+        "ucsschoolClassShareFileServer",
+        "ucsschoolClassShareFileServer",
+        "ucsschoolOrganizationalUnit",
+        False,
+        ("UCSschool-School-OU",),
+    ),
+)
+# name, module, object class
+_EXTENDED_OPTIONS = tuple((option, "users/user", option) for option in _USER_OPTIONS)
+_EXTENDED_OPTIONS += (("ucsschoolExam", "users/user", "ucsschoolExam"),)
+_EXTENDED_OPTIONS += (("UCSschool-School-OU", "container/ou", "ucsschoolOrganizationalUnit"),)
+
+
+def set_ucr_defaults(ldap_base, domainname="bench.test", hostname="primary"):
+    # type: (str, Optional[str], Optional[str]) -> None
+    """
+    Set UCR variables (in memory) that UDM and ucsschool.lib require, if they are not already set.
+
+    :param str ldap_base: LDAP base
+    :param str domainname: DNS domain
+    :param str hostname: hostname of the pretended Primary Directory Node
+    :return: None
+    """
+    defaults = {
+        "domainname": domainname,
+        "hostname": hostname,
+        "ldap/base": ldap_base,
+        "ldap/hostdn": "cn={},cn=dc,cn=computers,{}".format(hostname, ldap_base),
+        "ldap/master": "{}.{}".format(hostname, domainname),
+        "server/role": "domaincontroller_master",
+        "windows/domain": "BENCH",
+    }
+    for registry in (ucr, univention.admin.configRegistry):
+        for key, value in defaults.items():
+            if not registry.get(key):
+                registry[key] = value
+
+
+def seed_directory(lo, schools, mail_domain=None):
+    # type: (InMemoryAccess, Iterable[str], Optional[str]) -> None
+    """
+    Create the LDAP objects the import of users into `schools` requires: containers, the Samba
+    domain, counters of the UDM allocators, UCS@school extended attributes and options, and school
+    OUs with their containers, groups and (pretended) school server.
+
+    :param InMemoryAccess lo: directory to fill
+    :param schools: names of the school OUs to create
+    :type schools: Iterable(str)
+    :param str mail_domain: mail domain to create, if email addresses are imported
+    :return: None
+    """
+    base = lo.base
+    id_counter = iter(range(5000, 1000000))
+
+    def container(dn):  # type: (str) -> None
+        lo.add_entry(
+            dn,
+            {
+                "objectClass": ["top", "organizationalRole", "univentionObject", "univentionContainer"],
+                "cn": dn.split(",", 1)[0].split("=", 1)[1],
+                "univentionObjectType": "container/cn",
+            },
+        )
+
+    def group(dn, roles=()):  # type: (str, Sequence[str]) -> None
+        gid = next(id_counter)
+        lo.add_entry(
+            dn,
+            {
+                "objectClass": [
+                    "top",
+                    "posixGroup",
+                    "univentionGroup",
+                    "univentionObject",
+                    "sambaGroupMapping",
+                    "ucsschoolGroup",
+                ],
+                "cn": dn.split(",", 1)[0].split("=", 1)[1],
+                "gidNumber": str(gid),
+                "sambaSID": "{}-{}".format(DOMAIN_SID, 2 * gid + 1001),
+                "sambaGroupType": "2",
+                "univentionGroupType": "-2147483646",
+                "univentionObjectType": "groups/group",
+                "ucsschoolRole": list(roles),
+            },
+        )
+
+    for dn in (
+        "cn=univention",
+        "cn=temporary,cn=univention",
+        "cn=custom attributes,cn=univention",
+        "cn=UCSschool,cn=custom attributes,cn=univention",
+        "cn=ucsschool,cn=univention",
+        "cn=unique-usernames,cn=ucsschool,cn=univention",
+        "cn=unique-email,cn=ucsschool,cn=univention",
+        "cn=users",
+        "cn=groups",
+        "cn=computers",
+        "cn=dc,cn=computers",
+        "cn=policies",
+        "cn=mail",
+        "cn=domain,cn=mail",
+    ):
+        container("{},{}".format(dn, base))
+    for lock_type in ("uid", "gid", "groupName", "mailPrimaryAddress", "mail", "sid", "aRecord", "mac"):
+        container("cn={},cn=temporary,cn=univention,{}".format(lock_type, base))
+    lo.add_entry(
+        "sambaDomainName=BENCH,{}".format(base),
+        {"objectClass": ["top", "sambaDomain"], "sambaDomainName": "BENCH", "sambaSID": DOMAIN_SID},
+    )
+    domain_users_dn = "cn=Domain Users,cn=groups,{}".format(base)
+    group(domain_users_dn)
+    lo.add_entry(
+        "cn=default,cn=univention,{}".format(base),
+        {
+            "objectClass": ["top", "univentionDefault"],
+            "cn": "default",
+            "univentionDefaultGroup": domain_users_dn,
+        },
+    )
+    for name, modules, cli_name, ldap_attr, object_class, multi_value, options in _EXTENDED_ATTRIBUTES:
+        lo.add_entry(
+            "cn={},cn=UCSschool,cn=custom attributes,cn=univention,{}".format(name, base),
+            {
+                "objectClass": ["top", "univentionUDMProperty"],
+                "cn": name,
+                "univentionUDMPropertyModule": list(modules),
+                "univentionUDMPropertyCLIName": cli_name,
+                "univentionUDMPropertyLdapMapping": ldap_attr,
+                "univentionUDMPropertyObjectClass": object_class,
+                "univentionUDMPropertySyntax": "string",
+                "univentionUDMPropertyMultivalue": "1" if multi_value else "0",
+                "univentionUDMPropertyValueMayChange": "1",
+                "univentionUDMPropertyValueRequired": "0",
+                "univentionUDMPropertyDeleteObjectClass": "0",
+                "univentionUDMPropertyOptions": list(options),
+                "univentionUDMPropertyShortDescription": name,
+            },
+        )
+    for name, module, object_class in _EXTENDED_OPTIONS:
+        lo.add_entry(
+            "cn={},cn=UCSschool,cn=custom attributes,cn=univention,{}".format(name, base),
+            {
+                "objectClass": ["top", "univentionUDMOption"],
+                "cn": name,
+                "univentionUDMOptionModule": module,
+                "univentionUDMOptionObjectClass": object_class,
+                "univentionUDMOptionDefault": "0",
+                "univentionUDMOptionEditable": "1",
+                "univentionUDMOptionShortDescription": name,
+            },
+        )
+    if mail_domain:
+        lo.add_entry(
+            "cn={},cn=domain,cn=mail,{}".format(mail_domain, base),
+            {
+                "objectClass": ["top", "univentionMailDomainname", "univentionObject"],
+                "cn": mail_domain,
+                "univentionObjectType": "mail/domain",
+            },
+        )
+
+    for school in schools:
+        school_dn = "ou={},{}".format(school, base)
+        search_base = SchoolSearchBase([school], school, school_dn, base)
+        dc_dn = "cn=dc{},cn=dc,cn=server,cn=computers,{}".format(school.lower(), school_dn)
+        lo.add_entry(
+            school_dn,
+            {
+                "objectClass": [
+                    "top",
+                    "organizationalUnit",
+                    "univentionObject",
+                    "ucsschoolOrganizationalUnit",
+                ],
+                "ou": school,
+                "displayName": school,
+                "univentionObjectType": "container/ou",
+                "ucsschoolRole": "school:school:{}".format(school),
+                "ucsschoolHomeShareFileServer": dc_dn,
+                "ucsschoolClassShareFileServer": dc_dn,
+            },
+        )
+        for dn in (
+            search_base.users,
+            search_base.groups,
+            search_base.students,
+            search_base.teachers,
+            search_base.staff,
+            search_base.teachersAndStaff,
+            search_base.admins,
+            search_base.classes,
+            search_base.rooms,
+            search_base.shares,
+            search_base.classShares,
+            "cn=computers,{}".format(school_dn),
+            "cn=server,cn=computers,{}".format(school_dn),
+            "cn=dc,cn=server,cn=computers,{}".format(school_dn),
+        ):
+            container(dn)
+        lo.add_entry(
+            dc_dn,
+            {
+                "objectClass": [
+                    "top",
+                    "person",
+                    "univentionHost",
+                    "univentionDomainController",
+                    "univentionObject",
+                    "ucsschoolServer",
+                ],
+                "cn": "dc{}".format(school.lower()),
+                "sn": "dc{}".format(school.lower()),
+                "associatedDomain": ucr.get("domainname", "bench.test"),
+                "univentionServerRole": "slave",
+                "univentionObjectType": "computers/domaincontroller_slave",
+                "ucsschoolRole": "dc_slave_edu:school:{}".format(school),
+            },
+        )
+        group(
+            "cn=Domain Users {},cn=groups,{}".format(school, school_dn),
+            ["school_domain_group:school:{}".format(school)],
+        )
+        group(search_base.students_group, ["school_students_group:school:{}".format(school)])
+        group(search_base.teachers_group, ["school_teachers_group:school:{}".format(school)])
+        group(search_base.staff_group, ["school_staff_group:school:{}".format(school)])
+
+    for counter in ("uidNumber", "gidNumber"):
+        lo.add_entry(
+            "cn={},cn=temporary,cn=univention,{}".format(counter, base),
+            {
+                "objectClass": ["top", "organizationalRole", "univentionLastUsedValue"],
+                "cn": counter,
+                "univentionLastUsedValue": str(next(id_counter)),
+            },
+        )
+
+
+@contextmanager
+def use_connection(lo):  # type: (InMemoryAccess) -> Iterator[None]
+    """
+    Context manager that makes all connections of the import (and of UDM's connection factories)
+    use `lo`.
+
+    :param InMemoryAccess lo: connection to use
+    """
+    po = lo.get_position()
+    read_only_lo = ldap_connection.ReadOnlyAccess(lo, po)
+    names = (
+        "_admin_connection",
+        "_admin_position",
+        "_machine_connection",
+        "_machine_position",
+        "_unprivileged_connection",
+        "_unprivileged_position",
+        "_read_only_admin_connection",
+        "_read_only_admin_position",
+    )
+    saved = {name: getattr(ldap_connection, name) for name in names}
+    saved_factories = uldap.getAdminConnection, uldap.getMachineConnection
+    for name in names:
+        setattr(ldap_connection, name, po if name.endswith("_position") else lo)
+    ldap_connection._read_only_admin_connection = read_only_lo
+    uldap.getAdminConnection = uldap.getMachineConnection = lambda *args, **kwargs: (lo, po)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(ldap_connection, name, value)
+        uldap.getAdminConnection, uldap.getMachineConnection = saved_factories
+
+
+def get_peak_memory():  # type: () -> int
+    """Peak resident set size of this process in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class ImportBenchmark(object):
+    """
+    Import `num_users` test users with the `scenario` importer into a fresh in-memory directory.
+
+    Usage::
+
+        results = ImportBenchmark(10000, "/tmp/benchmark").run()
+    """
+
+    def __init__(
+        self,
+        num_users,
+        work_dir,
+        schools=DEFAULT_SCHOOLS,
+        scenario="default",
+        passes=PASSES,
+        workers=1,
+        seed=0,
+        email=False,
+        seed_ldif=None,
+        conffiles=None,
+        logfile=None,
+        ldap_base=DEFAULT_LDAP_BASE,
+    ):
+        # type: (int, str, Sequence[str], Optional[str], Optional[Sequence[str]], Optional[int], Optional[int], Optional[bool], Optional[str], Optional[List[str]], Optional[str], Optional[str]) -> None  # noqa: E501
+        """
+        :param int num_users: number of users to import
+        :param str work_dir: directory for input, output and log files, must exist
+        :param schools: names of the school OUs
+        :type schools: list(str)
+        :param str scenario: importer to use, a key of :py:data:`SCENARIOS`
+        :param passes: passes to run, out of :py:data:`PASSES`
+        :type passes: list(str)
+        :param int workers: value of configuration key `parallel:workers` (uses `thread` mode,
+            as the directory cannot be shared with processes)
+        :param int seed: seed of the random number generator used to create the test users
+        :param bool email: whether to import email addresses
+        :param str seed_ldif: LDIF file with additional objects to load into the directory
+        :param conffiles: additional configuration files
+        :type conffiles: list(str)
+        :param str logfile: debug log of the import, `None` for `<work_dir>/ucs-school-import.log`,
+            empty to disable logging
+        :param str ldap_base: LDAP base, if the UCR variable `ldap/base` is not set
+        """
+        self.num_users = num_users
+        self.work_dir = work_dir
+        self.schools = sorted(schools)
+        if "sisopi" in scenario and "limbo" not in self.schools:
+            self.schools.append("limbo")
+        self.scenario = scenario
+        self.passes = passes
+        self.workers = workers
+        self.seed = seed
+        self.email = email
+        self.seed_ldif = seed_ldif
+        self.conffiles = conffiles or []
+        self.logfile = os.path.join(work_dir, "ucs-school-import.log") if logfile is None else logfile
+        self.ldap_base = ldap_base
+        self.input_file = os.path.join(work_dir, "input.csv")
+        self.logger = logging.getLogger(__name__)
+        self.lo = None  # type: InMemoryAccess
+
+    @property
+    def configuration_files(self):  # type: () -> List[str]
+        res = [
+            os.path.join(CONFIG_DIR, "global_defaults.json"),
+            os.path.join(CONFIG_DIR, "user_import_defaults.json"),
+            os.path.join(CONFIG_DIR, "ucs-school-testuser-import.json"),
+        ]
+        res.extend(os.path.join(CONFIG_DIR, filename) for filename in SCENARIOS[self.scenario])
+        res.extend(self.conffiles)
+        return res
+
+    @property
+    def settings(self):  # type: () -> Dict[str, Any]
+        """Configuration overriding the configuration files (like command line arguments)."""
+        res = {
+            "dry_run": False,
+            "input": {"filename": self.input_file},
+            "output": {
+                "new_user_passwords": "",
+                "user_import_summary": os.path.join(self.work_dir, "user_import_summary.csv"),
+            },
+            "source_uid": SOURCE_UID,
+            "verbose": False,
+        }  # type: Dict[str, Any]
+        if self.workers > 1:
+            res["parallel"] = {"mode": "thread", "workers": self.workers}
+        return res
+
+    def run(self):  # type: () -> List[Dict[str, Any]]
+        """
+        Run the benchmark in a child process.
+
+        :return: a result (see :py:meth:`run_pass()`) per pass
+        :rtype: list(dict)
+        """
+        result_files = [
+            os.path.join(self.work_dir, "result_{}.json".format(name)) for name in self.passes
+        ]
+        for filename in result_files:
+            if os.path.exists(filename):
+                os.remove(filename)
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                self._run_passes()
+                exit_code = 0
+            except Exception:
+                traceback.print_exc()
+            finally:
+                os._exit(exit_code)
+        os.waitpid(pid, 0)
+        res = []
+        for name, filename in zip(self.passes, result_files):
+            try:
+                with open(filename) as fp:
+                    res.append(json.load(fp))
+            except (IOError, ValueError):
+                res.append({"pass": name, "users": self.num_users, "failed": True})
+        return res
+
+    def setup_directory(self):  # type: () -> InMemoryAccess
+        set_ucr_defaults(self.ldap_base)
+        self.lo = InMemoryAccess(ucr["ldap/base"])
+        mail_domain = ucr.get("mail/hosteddomains", ucr["domainname"]).split()[0] if self.email else None
+        seed_directory(self.lo, self.schools, mail_domain)
+        if self.seed_ldif:
+            with open(self.seed_ldif, "rb") as fp:
+                self.logger.info("Read %d objects from %r.", self.lo.load_ldif(fp), self.seed_ldif)
+        return self.lo
+
+    def write_input(self, name):  # type: (str) -> None
+        """Write the input file of pass `name`. The users are the same in every pass."""
+        random.seed(self.seed)
+        num_users = {}
+        remaining = self.num_users
+        for role, fraction in ROLE_MIX[1:]:
+            num_users[role] = int(self.num_users * fraction)
+            remaining -= num_users[role]
+        num_users[ROLE_MIX[0][0]] = remaining
+        creator_kwargs = dict(
+            num_users,
+            classes=max(1, self.num_users // USERS_PER_CLASS),
+            schools=min(2, len(self.schools)),
+            email=self.email,
+        )
+        creator = TestUserCreator(self.schools, **creator_kwargs)
+        creator.make_classes()
+        users = creator.make_users()
+        if name == "modify":
+            users = self._modified(users)
+        elif name == "delete":
+            users = []
+        TestUserCsvExporter(email=self.email).dump(users, self.input_file)
+
+    @staticmethod
+    def _modified(users):  # type: (Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]
+        for user in users:
+            user["Beschreibung"] = "A modified {}.".format(user["Benutzertyp"])
+            user["Telefon"] = user["Telefon"][::-1]
+            yield user
+
+    def _run_passes(self):  # type: () -> None
+        """Set up directory and configuration, then run each pass in a child of the one before."""
+        self.setup_directory()
+        with use_connection(self.lo):
+            if self.logfile:
+                logger = logging.getLogger("ucsschool")
+                logger.setLevel(logging.DEBUG)
+                logger.addHandler(get_file_handler("DEBUG", self.logfile))
+            self.write_input(self.passes[0])
+            config = setup_configuration(self.configuration_files, **self.settings)
+            factory = setup_factory(config["factory"])
+            for name in self.passes:
+                pid = os.fork()
+                if pid:
+                    # this process is done, the child continues with the next pass
+                    _pid, status = os.waitpid(pid, 0)
+                    os._exit(os.WEXITSTATUS(status))
+                result = self.run_pass(name, factory)
+                with open(os.path.join(self.work_dir, "result_{}.json".format(name)), "w") as fp:
+                    json.dump(result, fp)
+
+    def run_pass(self, name, factory):  # type: (str, Any) -> Dict[str, Any]
+        """
+        Import the input of pass `name`.
+
+        :param str name: name of the pass
+        :param factory: import factory
+        :return: `pass`, `users`, `seconds`, `users_per_second`, `ldap_operations`,
+            `ldap_operations_per_user`, `peak_memory_kib`, `errors`, `users_in_ldap` and `phases`
+            (statistics of the import phases, see
+            :py:meth:`~ucsschool.importer.utils.timing.ImportTimer.get_stats()`)
+        :rtype: dict
+        """
+        self.write_input(name)
+        self.lo.operations.clear()
+        start = time.time()
+        importer = factory.make_mass_importer(False)
+        importer.mass_import()
+        seconds = time.time() - start
+        operations = dict(self.lo.operations)
+        num_ops = sum(operations.values())
+        users_in_ldap = len(self.lo.searchDn("(ucsschoolSourceUID={})".format(SOURCE_UID)))
+        return {
+            "pass": name,
+            "users": self.num_users,
+            "seconds": seconds,
+            "users_per_second": self.num_users / seconds if seconds else 0.0,
+            "ldap_operations": operations,
+            "ldap_operations_per_user": float(num_ops) / self.num_users if self.num_users else 0.0,
+            "peak_memory_kib": get_peak_memory(),
+            "errors": len(importer.errors),
+            "users_in_ldap": users_in_ldap,
+            "phases": get_import_timer().get_stats(),
+        }
+
+    @staticmethod
+    def get_summary_lines(results):  # type: (Iterable[Dict[str, Any]]) -> List[str]
+        """
+        Format results of :py:meth:`run()` as a text table.
+
+        :param results: results of :py:meth:`run()`
+        :type results: list(dict)
+        :return: lines of text
+        :rtype: list(str)
+        """
+        lines = [
+            "{:<8} {:>8} {:>10} {:>10} {:>10} {:>12} {:>8} {:>8}".format(
+                "pass", "users", "seconds", "users/s", "LDAP ops/u", "peak KiB", "errors", "in LDAP"
+            )
+        ]
+        for result in results:
+            if result.get("failed"):
+                lines.append("{:<8} {:>8} failed".format(result["pass"], result["users"]))
+                continue
+            lines.append(
+                "{:<8} {:>8} {:>10.1f} {:>10.1f} {:>10.1f} {:>12} {:>8} {:>8}".format(
+                    result["pass"],
+                    result["users"],
+                    result["seconds"],
+                    result["users_per_second"],
+                    result["ldap_operations_per_user"],
+                    result["peak_memory_kib"],
+                    result["errors"],
+                    result["users_in_ldap"],
+                )
+            )
+        return lines
@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Append-only journal of the users committed by an import job, used to resume an aborted job."""
+
+import errno
+import fcntl
+import io
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+from ..exceptions import JournalLockedError
+
+
+class ImportJournal(object):
+    """
+    Journal file with one JSON object per line: a header written when the import job is started or
+    resumed, followed by one record for each user that was created, modified or deleted.
+
+    Each record is written (flushed to the operating system) right after the change was committed to
+    LDAP, so it survives the import process being killed. It is synced to disk every
+    `fsync_interval` records and when the journal is closed. A line that was only partly written
+    when the process died is ignored by :py:meth:`load()`.
+
+    Every record is appended with a single `write()` system call to the file opened with `O_APPEND`,
+    so processes forked after the journal was opened can write to it concurrently, without their
+    records getting mixed up.
+
+    The file is locked while it is open, so a job cannot be resumed while it is still running.
+    The records contain the passwords of new users, the file is readable only by its owner.
+    """
+
+    def __init__(self, filename, fsync_interval=100):  # type: (str, Optional[int]) -> None
+        """
+        :param str filename: path to the journal file, will be created if missing
+        :param int fsync_interval: number of records after which to sync the file to disk, 0 to sync
+            only when closing the journal
+        """
+        self.filename = filename
+        self.fsync_interval = fsync_interval
+        self.logger = logging.getLogger(__name__)
+        self._fd = None  # type: Optional[int]
+        self._lock = threading.Lock()
+        self._unsynced = 0
+
+    def exists(self):  # type: () -> bool
+        return os.path.exists(self.filename)
+
+    @property
+    def fd(self):  # type: () -> int
+        if self._fd is None:
+            try:
+                os.makedirs(os.path.dirname(self.filename), 0o700)
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            self.logger.debug("Opening import journal %r...", self.filename)
+            fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError) as exc:
+                os.close(fd)
+                if exc.errno in (errno.EAGAIN, errno.EACCES):
+                    raise JournalLockedError(
+                        "Import journal {!r} is in use by another process.".format(self.filename),
+                        log_traceback=False,
+                    )
+                raise
+            if os.fstat(fd).st_size > 0 and not self._last_line_complete():
+                # terminate a line that was only partly written when the process died
+                os.write(fd, b"\n")
+            self._fd = fd
+        return self._fd
+
+    def is_locked(self):  # type: () -> bool
+        """
+        Check if the journal is locked by another process, meaning the import job is running.
+
+        :return: whether the journal is locked, False if it does not exist
+        :rtype: bool
+        """
+        try:
+            fd = os.open(self.filename, os.O_RDONLY)
+        except OSError as exc:
+            if exc.errno == errno.ENOENT:
+                return False
+            raise
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError) as exc:
+            if exc.errno in (errno.EAGAIN, errno.EACCES):
+                return True
+            raise
+        finally:
+            os.close(fd)
+        return False
+
+    def _last_line_complete(self):  # type: () -> bool
+        with open(self.filename, "rb") as fp:
+            fp.seek(-1, os.SEEK_END)
+            return fp.read(1) == b"\n"
+
+    @staticmethod
+    def _json_default(obj):  # type: (Any) -> Any
+        if isinstance(obj, bytes):
+            return obj.decode("utf-8", "replace")
+        if isinstance(obj, (set, tuple)):
+            return list(obj)
+        return str(obj)
+
+    def write(self, records):  # type: (List[Dict[str, Any]]) -> None
+        """
+        Append records to the journal. Thread-safe, and safe to use in processes forked after the
+        journal was opened.
+
+        :param records: JSON serializable dicts
+        :type records: list(dict)
+        :return: None
+        :raises JournalLockedError: if the journal is in use by another process
+        """
+        lines = [
+            "{}\n".format(json.dumps(record, sort_keys=True, default=self._json_default)).encode("utf-8")
+            for record in records
+        ]
+        with self._lock:
+            for line in lines:
+                os.write(self.fd, line)
+            self._unsynced += len(records)
+            if self.fsync_interval and self._unsynced >= self.fsync_interval:
+                os.fsync(self.fd)
+                self._unsynced = 0
+
+    def load(self):  # type: () -> List[Dict[str, Any]]
+        """
+        Read all records from the journal.
+
+        :return: list of records (headers and user records) in the order they were written
+        :rtype: list(dict)
+        """
+        records = []
+        with io.open(self.filename, "r", encoding="utf-8") as fp:
+            for num, line in enumerate(fp, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    self.logger.warning(
+                        "Ignoring incomplete line %d in import journal %r.", num, self.filename
+                    )
+        return records
+
+    def close(self):  # type: () -> None
+        """Sync and close the journal file."""
+        with self._lock:
+            if self._fd is None:
+                return
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._unsynced = 0
+
+    def remove(self):  # type: () -> None
+        """Close and delete the journal file."""
+        self.close()
+        try:
+            os.remove(self.filename)
+        except OSError as exc:
+            if exc.errno != errno.ENOENT:
+                raise
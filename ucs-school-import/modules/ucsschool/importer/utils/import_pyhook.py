@@ -40,6 +40,7 @@ from ucsschool.lib.pyhooks import PyHook, PyHooksLoader
 
 from ..exceptions import InitialisationError
 from .ldap_connection import get_admin_connection, get_readonly_connection
+from .timing import get_import_timer, hook_phase
 
 if TYPE_CHECKING:
     import univention.admin.uldap  # noqa: F401
@@ -111,7 +112,9 @@ class ImportPyHookLoader(object):
     before :py:meth:`call_hook()`.
     """
 
-    _pyhook_obj_cache = {}  # type: Dict[Type[ImportPyHookTV], Dict[str, List[Callable[..., Any]]]]
+    _pyhook_obj_cache = (
+        {}
+    )  # type: Dict[Union[Type[ImportPyHookTV], str], Dict[str, List[Callable[..., Any]]]]  # noqa: E501
 
     def __init__(self, pyhooks_base_path):  # type: (str) -> None
         self.pyhooks_base_path = pyhooks_base_path
@@ -135,7 +138,12 @@ class ImportPyHookLoader(object):
         """
         # The PyHook objects themselves are already cached by PyHooksLoader, but we don't want to
         # initialize a PyHooksLoader each time we run a hook, so we'll keep a dict linking directly to
-        # all PyHooksLoader caches.
+        # all PyHooksLoader caches. It is also indexed by `hook_cls` as passed in (a class object or
+        # its dotted path), so resolving and checking it is only done once.
+        try:
+            return self._pyhook_obj_cache[hook_cls]
+        except KeyError:
+            pass
         base_class = PyHooksLoader.hook_cls2importpyhook(hook_cls, "hook_cls")
         if not issubclass(base_class, ImportPyHook):
             raise TypeError("Argument 'hook_cls' must be a subclass of ImportPyHook.")
@@ -143,7 +151,8 @@ class ImportPyHookLoader(object):
         if base_class not in self._pyhook_obj_cache:
             pyhooks_loader = PyHooksLoader(self.pyhooks_base_path, base_class, self.logger, filter_func)
             self._pyhook_obj_cache[base_class] = pyhooks_loader.get_hook_objects(*args, **kwargs)
-        return self._pyhook_obj_cache[base_class]
+        self._pyhook_obj_cache[hook_cls] = self._pyhook_obj_cache[base_class]
+        return self._pyhook_obj_cache[hook_cls]
 
     def call_hooks(self, hook_cls, func_name, *args, **kwargs):
         # type: (Type[ImportPyHookTV], str, *Any, **Any) -> List[Any]
@@ -163,7 +172,8 @@ class ImportPyHookLoader(object):
         res = []
         for func in hooks.get(func_name, []):
             self.logger.info("Running %s %s hook %s ...", self.__class__.__name__, func_name, func)
-            res.append(func(*args, **kwargs))
+            with get_import_timer().measure(hook_phase(func)):
+                res.append(func(*args, **kwargs))
         return res
 
 
@@ -32,7 +32,9 @@
 
 """Create LDAP connections for import."""
 
-from typing import TYPE_CHECKING, Tuple  # noqa: F401
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple  # noqa: F401
+
+from ldap.controls import SimplePagedResultsControl
 
 from univention.admin import uldap
 
@@ -53,6 +55,12 @@ _unprivileged_position = None
 _read_only_admin_connection = None
 _read_only_admin_position = None
 
+PAGED_SEARCH_PAGE_SIZE = 1000
+
+# Connections inherited by a forked worker process. They share their sockets with the parent process,
+# so they must never be garbage collected (which would unbind them) in the child.
+_inherited_connections = []  # type: List[Any]
+
 
 def get_admin_connection():  # type: () -> (Tuple[LoType, PoType])
     """
@@ -105,8 +113,17 @@ class ReadOnlyAccess(uldap.access):
     will raise a :py:exc:`TypeError`.
     """
 
-    def __init__(self, *args, **kwargs):
-        self._real_lo, self._real_po = get_admin_connection()
+    def __init__(self, lo=None, po=None, *args, **kwargs):
+        # type: (Optional[LoType], Optional[PoType], *Any, **Any) -> None
+        """
+        :param univention.admin.uldap.access lo: cn=admin connection to wrap, `None` to use the
+            one from :py:func:`get_admin_connection()`
+        :param univention.admin.uldap.position po: position object belonging to `lo`
+        """
+        if lo and po:
+            self._real_lo, self._real_po = lo, po
+        else:
+            self._real_lo, self._real_po = get_admin_connection()
         self._real_lo.allow_modify = 1
 
     def __getattr__(self, item):
@@ -138,3 +155,79 @@ def get_readonly_connection():  # type: () -> (Tuple[LoType, PoType])
         lo_rw = ReadOnlyAccess()
         _read_only_admin_connection, _read_only_admin_position = lo_rw, lo_rw._real_po
     return _read_only_admin_connection, _read_only_admin_position
+
+
+def create_connection(read_only=False):  # type: (Optional[bool]) -> (Tuple[LoType, PoType])
+    """
+    New, not cached cn=admin connection, for example for a worker thread.
+
+    :param bool read_only: whether to return a :py:class:`ReadOnlyAccess` connection
+    :rtype: tuple(univention.admin.uldap.access, univention.admin.uldap.position)
+    """
+    try:
+        lo, po = uldap.getAdminConnection()
+    except IOError:
+        raise UcsSchoolImportFatalError("This script must be executed on a Primary Directory Node.")
+    if read_only:
+        lo = ReadOnlyAccess(lo, po)
+    return lo, po
+
+
+def reset_connections():  # type: () -> None
+    """
+    Drop all cached connections, so new ones are opened on next use.
+
+    To be called in a forked worker process: the connection objects are kept referenced, because
+    their sockets are shared with the parent process.
+    """
+    global _admin_connection, _admin_position, _machine_connection, _machine_position
+    global _unprivileged_connection, _unprivileged_position
+    global _read_only_admin_connection, _read_only_admin_position
+    _inherited_connections.extend(
+        lo
+        for lo in (
+            _admin_connection,
+            _machine_connection,
+            _unprivileged_connection,
+            _read_only_admin_connection,
+        )
+        if lo
+    )
+    _admin_connection = _admin_position = None
+    _machine_connection = _machine_position = None
+    _unprivileged_connection = _unprivileged_position = None
+    _read_only_admin_connection = _read_only_admin_position = None
+
+
+def paged_search(lo, filter_s, attr=None, base="", page_size=PAGED_SEARCH_PAGE_SIZE):
+    # type: (LoType, str, Optional[List[str]], Optional[str], Optional[int]) -> Iterator[Tuple[str, Dict[str, List[bytes]]]]  # noqa: E501
+    """
+    Search LDAP using the "simple paged results" control (RFC 2696).
+
+    Results are fetched in pages of `page_size` entries, so that large result sets neither hit the
+    servers size limit nor have to be kept in memory at once.
+
+    :param univention.admin.uldap.access lo: LDAP connection object
+    :param str filter_s: LDAP filter
+    :param attr: attributes to retrieve, `None` for all
+    :type attr: list(str) or None
+    :param str base: search base, empty for the LDAP base
+    :param int page_size: number of entries to fetch per request
+    :return: iterator over (dn, attributes) tuples
+    :rtype: Iterator(tuple(str, dict))
+    """
+    page_ctrl = SimplePagedResultsControl(True, size=page_size, cookie="")
+    while True:
+        response = {}  # type: Dict[str, Any]
+        for dn, attrs in lo.search(
+            filter_s, base=base, attr=attr or [], serverctrls=[page_ctrl], response=response
+        ):
+            yield dn, attrs
+        cookies = [
+            ctrl.cookie
+            for ctrl in response.get("ctrls", [])
+            if ctrl.controlType == SimplePagedResultsControl.controlType
+        ]
+        if not cookies or not cookies[0]:
+            break
+        page_ctrl.cookie = cookies[0]
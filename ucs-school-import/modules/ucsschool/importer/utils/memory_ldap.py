@@ -0,0 +1,590 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+LDAP connection that keeps the directory in memory.
+
+Used to run the import without an LDAP server (see :py:mod:`ucsschool.importer.utils.import_benchmark`).
+It implements the search/get/add/modify/rename/delete surface of
+:py:class:`univention.admin.uldap.access` used by UDM, ucsschool.lib and the import. Simplifications:
+all values are compared case insensitively, the schema is not checked and parents of new entries do
+not have to exist.
+"""
+
+import datetime
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple  # noqa: F401
+
+import ldap.dn
+import six
+from ldap.controls.readentry import PostReadControl
+from ldif import LDIFRecordList
+
+from univention.admin import uldap
+from univention.admin.uexceptions import (
+    insufficientInformation,
+    ldapSizelimitExceeded,
+    noObject,
+    objectExists,
+)
+
+if TYPE_CHECKING:
+    from .ldap_connection import PoType  # noqa: F401
+
+    Filter = Tuple[Any, ...]
+
+# equality indexes, like the ones of a UCS@school LDAP server
+INDEXED_ATTRIBUTES = frozenset(
+    (
+        "cn",
+        "gidnumber",
+        "mailprimaryaddress",
+        "memberuid",
+        "objectclass",
+        "sambasid",
+        "uid",
+        "uidnumber",
+        "ucsschoolrecorduid",
+        "ucsschoolrole",
+        "ucsschoolschool",
+        "ucsschoolsourceuid",
+        "uniquemember",
+        "univentionobjecttype",
+    )
+)
+OPERATIONAL_ATTRIBUTES = frozenset(
+    (
+        "createtimestamp",
+        "creatorsname",
+        "entrycsn",
+        "entrydn",
+        "entryuuid",
+        "hassubordinates",
+        "modifiersname",
+        "modifytimestamp",
+    )
+)
+_HEX_ESCAPE = re.compile(b"\\\\([0-9a-fA-F]{2})")
+
+
+def normalize_dn(dn):  # type: (str) -> str
+    """Lower case DN without optional whitespace, used as key of the directory."""
+    return ldap.dn.dn2str(ldap.dn.str2dn(dn.lower()))
+
+
+def _to_bytes_list(value):  # type: (Any) -> List[bytes]
+    if value is None:
+        return []
+    if isinstance(value, (six.binary_type, six.text_type)):
+        value = [value]
+    return [v if isinstance(v, six.binary_type) else six.text_type(v).encode("utf-8") for v in value]
+
+
+def _unescape(value):  # type: (bytes) -> bytes
+    return _HEX_ESCAPE.sub(lambda m: six.int2byte(int(m.group(1), 16)), value)
+
+
+def parse_filter(filter_s):  # type: (str) -> Filter
+    """
+    Parse an LDAP filter (RFC 4515) into a tree of tuples.
+
+    :param str filter_s: LDAP filter, the outer parentheses may be omitted
+    :return: `("&"|"|", [subfilters])`, `("!", subfilter)`, `("=*", attr)`,
+        `("=", attr, value)`, `("sub", attr, compiled regex)`, `(">=" | "<=", attr, value)`
+    :rtype: tuple
+    """
+    filter_b = filter_s.strip().encode("utf-8")
+    if not filter_b.startswith(b"("):
+        filter_b = b"(" + filter_b + b")"
+    node, pos = _parse_filter(filter_b, 0)
+    if pos != len(filter_b):
+        raise ValueError("Trailing characters in LDAP filter {!r}.".format(filter_s))
+    return node
+
+
+def _parse_filter(filter_b, pos):  # type: (bytes, int) -> Tuple[Filter, int]
+    if filter_b[pos : pos + 1] != b"(":
+        raise ValueError("Expected '(' at position {} of LDAP filter {!r}.".format(pos, filter_b))
+    pos += 1
+    op = filter_b[pos : pos + 1]
+    if op in (b"&", b"|"):
+        pos += 1
+        children = []
+        while filter_b[pos : pos + 1] == b"(":
+            child, pos = _parse_filter(filter_b, pos)
+            children.append(child)
+        node = (op.decode("ascii"), children)  # type: Filter
+    elif op == b"!":
+        child, pos = _parse_filter(filter_b, pos + 1)
+        node = ("!", child)
+    else:
+        end = filter_b.index(b")", pos)
+        node = _parse_item(filter_b[pos:end])
+        pos = end
+    if filter_b[pos : pos + 1] != b")":
+        raise ValueError("Expected ')' at position {} of LDAP filter {!r}.".format(pos, filter_b))
+    return node, pos + 1
+
+
+def _parse_item(item):  # type: (bytes) -> Filter
+    attr, _sep, value = item.partition(b"=")
+    op = b"="
+    if attr[-1:] in (b">", b"<", b"~"):
+        op = attr[-1:] + b"="
+        attr = attr[:-1]
+    attr = attr.strip().decode("ascii").lower()
+    if op == b"~=":
+        op = b"="
+    if op == b"=" and value == b"*":
+        return "=*", attr
+    if op == b"=" and b"*" in value:
+        parts = [re.escape(_unescape(part).lower()) for part in value.split(b"*")]
+        return "sub", attr, re.compile(b"^" + b".*".join(parts) + b"$", re.DOTALL)
+    return op.decode("ascii"), attr, _unescape(value).lower()
+
+
+def _compare(a, b):  # type: (bytes, bytes) -> int
+    if a.isdigit() and b.isdigit():
+        a, b = int(a), int(b)
+    return (a > b) - (a < b)
+
+
+class _Entry(object):
+    __slots__ = ("dn", "attrs", "names")
+
+    def __init__(self, dn):  # type: (str) -> None
+        self.dn = dn
+        self.attrs = {}  # type: Dict[str, List[bytes]]  # lower case attribute name -> values
+        self.names = {}  # type: Dict[str, str]  # lower case attribute name -> attribute name
+
+    def set(self, attr, values):  # type: (str, List[bytes]) -> None
+        key = attr.lower()
+        if values:
+            self.attrs[key] = values
+            self.names.setdefault(key, attr)
+        else:
+            self.attrs.pop(key, None)
+            self.names.pop(key, None)
+
+    def matches(self, node):  # type: (Filter) -> bool
+        op = node[0]
+        if op == "&":
+            return all(self.matches(child) for child in node[1])
+        if op == "|":
+            return any(self.matches(child) for child in node[1])
+        if op == "!":
+            return not self.matches(node[1])
+        if op == "=*":
+            return node[1] in self.attrs
+        values = self.attrs.get(node[1], ())
+        if op == "=":
+            return any(v.lower() == node[2] for v in values)
+        if op == "sub":
+            return any(node[2].match(v.lower()) for v in values)
+        if op == ">=":
+            return any(_compare(v.lower(), node[2]) >= 0 for v in values)
+        return any(_compare(v.lower(), node[2]) <= 0 for v in values)
+
+    def result(self, attr=None):  # type: (Optional[List[str]]) -> Dict[str, List[bytes]]
+        wanted = {a.lower() for a in attr or ()}
+        all_user = not wanted or "*" in wanted
+        all_operational = "+" in wanted
+        return {
+            self.names[key]: list(values)
+            for key, values in self.attrs.items()
+            if key in wanted
+            or (all_operational and key in OPERATIONAL_ATTRIBUTES)
+            or (all_user and key not in OPERATIONAL_ATTRIBUTES)
+        }
+
+
+class InMemoryAccess(uldap.access):
+    """
+    :py:class:`univention.admin.uldap.access` that stores the directory in memory.
+
+    The number of operations is counted per kind in :py:attr:`operations`.
+    """
+
+    def __init__(self, base, binddn=None):  # type: (str, Optional[str]) -> None
+        """
+        :param str base: LDAP base, an entry for it is created
+        :param str binddn: DN to pretend to be bound as, `cn=admin,<base>` if unset
+        """
+        # no call to super(): there is no server to connect to
+        self.base = base
+        self.binddn = binddn or "cn=admin,{}".format(base)
+        self.bindpw = ""
+        self.host = "localhost"
+        self.port = 7389
+        self.allow_modify = True
+        self.require_license = False
+        self.lo = self
+        self.operations = Counter()  # type: Counter
+        self._lock = threading.RLock()
+        self._entries = {}  # type: Dict[str, _Entry]
+        self._children = {}  # type: Dict[str, Set[str]]
+        self._index = {}  # type: Dict[str, Dict[bytes, Set[str]]]
+        rdn_attr, rdn_value, _ = ldap.dn.str2dn(base)[0][0]
+        self.add_entry(base, {"objectClass": [b"top", b"domain"], rdn_attr: [rdn_value]})
+
+    def __len__(self):  # type: () -> int
+        return len(self._entries)
+
+    def get_position(self):  # type: () -> PoType
+        return uldap.position(self.base)
+
+    def load_ldif(self, fp):  # type: (Any) -> int
+        """
+        Add the entries of an LDIF file, for example one exported with `slapcat` from a UCS@school
+        system. Existing entries are replaced. The operations are not counted.
+
+        :param fp: file object opened in binary mode
+        :return: number of entries read
+        :rtype: int
+        """
+        records = LDIFRecordList(fp)
+        records.parse()
+        for dn, attrs in records.all_records:
+            self.add_entry(dn, attrs)
+        return len(records.all_records)
+
+    def add_entry(self, dn, attrs):  # type: (str, Dict[str, Any]) -> None
+        """Add or replace an entry without counting the operation. Used to set up the directory."""
+        with self._lock:
+            key = normalize_dn(dn)
+            if key in self._entries:
+                self._remove(key)
+            self._store(dn, {attr: _to_bytes_list(values) for attr, values in attrs.items()})
+
+    def dump_ldif(self, fp):  # type: (Any) -> None
+        """Write all entries as LDIF to `fp` (opened in text mode)."""
+        from ldif import LDIFWriter
+
+        writer = LDIFWriter(fp)
+        for entry in sorted(self._entries.values(), key=lambda e: len(ldap.dn.str2dn(e.dn))):
+            writer.unparse(entry.dn, entry.result(["*", "+"]))
+
+    # uldap.access interface
+
+    def whoami(self):  # type: () -> str
+        return self.binddn
+
+    def parentDn(self, dn):  # type: (str) -> Optional[str]
+        rdns = ldap.dn.str2dn(dn)
+        return ldap.dn.dn2str(rdns[1:]) if len(rdns) > 1 else None
+
+    @classmethod
+    def explodeDn(cls, dn, notypes=False):  # type: (str, Optional[bool]) -> List[str]
+        return ldap.dn.explode_dn(dn, notypes)
+
+    def getPolicies(self, dn, policies=None, attrs=None, result=None, fixedattrs=None):
+        # type: (str, Any, Any, Any, Any) -> Dict[str, Any]
+        return {}
+
+    def get(self, dn, attr=[], required=False, exceptions=False):
+        # type: (str, Optional[List[str]], Optional[bool], Optional[bool]) -> Dict[str, List[bytes]]
+        with self._lock:
+            self.operations["search"] += 1
+            entry = self._entries.get(normalize_dn(dn)) if dn else None
+            if entry:
+                return entry.result(attr)
+            if required:
+                raise noObject(dn)
+            return {}
+
+    def getAttr(self, dn, attr, required=False, exceptions=False):
+        # type: (str, str, Optional[bool], Optional[bool]) -> List[bytes]
+        res = self.get(dn, [attr], required)
+        return next((values for name, values in res.items() if name.lower() == attr.lower()), [])
+
+    def search(
+        self,
+        filter="(objectClass=*)",
+        base="",
+        scope="sub",
+        attr=[],
+        unique=False,
+        required=False,
+        timeout=-1,
+        sizelimit=0,
+        serverctrls=None,
+        response=None,
+    ):
+        # type: (str, Optional[str], Optional[str], Optional[List[str]], Optional[bool], Optional[bool], Optional[int], Optional[int], Any, Optional[Dict[str, Any]]) -> List[Tuple[str, Dict[str, List[bytes]]]]  # noqa: E501
+        with self._lock:
+            self.operations["search"] += 1
+            res = [(entry.dn, entry.result(attr)) for entry in self._search(filter, base, scope)]
+        if response is not None:
+            response["ctrls"] = []
+        if unique and len(res) > 1:
+            raise insufficientInformation("more than one object")
+        if required and not res:
+            raise noObject(filter)
+        if sizelimit and len(res) > sizelimit:
+            raise ldapSizelimitExceeded(filter)
+        return res
+
+    def searchDn(
+        self,
+        filter="(objectClass=*)",
+        base="",
+        scope="sub",
+        unique=False,
+        required=False,
+        timeout=-1,
+        sizelimit=0,
+        serverctrls=None,
+        response=None,
+    ):
+        # type: (str, Optional[str], Optional[str], Optional[bool], Optional[bool], Optional[int], Optional[int], Any, Optional[Dict[str, Any]]) -> List[str]  # noqa: E501
+        return [
+            dn
+            for dn, _attrs in self.search(
+                filter, base, scope, ["1.1"], unique, required, timeout, sizelimit, serverctrls, response
+            )
+        ]
+
+    def add(self, dn, al, exceptions=False, serverctrls=None, response=None, ignore_license=False):
+        # type: (str, List[Tuple[Any, ...]], Optional[bool], Any, Optional[Dict[str, Any]], Optional[bool]) -> str  # noqa: E501
+        with self._lock:
+            self.operations["add"] += 1
+            if normalize_dn(dn) in self._entries:
+                raise objectExists(dn)
+            attrs = {}  # type: Dict[str, List[bytes]]
+            for item in al:
+                if item[-1] not in (None, b"", "", []):
+                    attrs.setdefault(item[0], []).extend(_to_bytes_list(item[-1]))
+            now = self._timestamp()
+            attrs.update(
+                {
+                    "entryUUID": [str(uuid.uuid4()).encode("ascii")],
+                    "entryCSN": [now + b".000000Z#000000#000#000000"],
+                    "createTimestamp": [now + b"Z"],
+                    "modifyTimestamp": [now + b"Z"],
+                    "creatorsName": [self.binddn.encode("utf-8")],
+                    "modifiersName": [self.binddn.encode("utf-8")],
+                }
+            )
+            entry = self._store(dn, attrs)
+            self._post_read(entry, serverctrls, response)
+        return dn
+
+    def modify(
+        self,
+        dn,
+        changes,
+        exceptions=False,
+        ignore_license=0,
+        serverctrls=None,
+        response=None,
+        rename_callback=None,
+    ):
+        # type: (str, List[Tuple[str, Any, Any]], Optional[bool], Optional[int], Any, Optional[Dict[str, Any]], Any) -> str  # noqa: E501
+        with self._lock:
+            self.operations["modify"] += 1
+            key = normalize_dn(dn)
+            try:
+                entry = self._entries[key]
+            except KeyError:
+                raise noObject(dn)
+            self._unindex(key, entry)
+            for attr, old_values, new_values in changes:
+                old_values, new_values = _to_bytes_list(old_values), _to_bytes_list(new_values)
+                old_values = [v for v in old_values if v]
+                new_values = [v for v in new_values if v]
+                current = entry.attrs.get(attr.lower(), [])
+                if new_values and old_values:
+                    values = new_values
+                elif new_values:
+                    values = current + [v for v in new_values if v not in current]
+                elif old_values:
+                    removed = {v.lower() for v in old_values}
+                    values = [v for v in current if v.lower() not in removed]
+                else:
+                    values = []
+                entry.set(attr, values)
+            now = self._timestamp()
+            entry.set("entryCSN", [now + b".000000Z#000000#000#000000"])
+            entry.set("modifyTimestamp", [now + b"Z"])
+            entry.set("modifiersName", [self.binddn.encode("utf-8")])
+            self._index_entry(key, entry)
+            rdn_attr, rdn_value, _ = ldap.dn.str2dn(entry.dn)[0][0]
+            rdn_values = [v.decode("utf-8").lower() for v in entry.attrs.get(rdn_attr.lower(), [])]
+            if rdn_values and rdn_value.lower() not in rdn_values:
+                new_rdn = ldap.dn.dn2str(
+                    [[(rdn_attr, entry.attrs[rdn_attr.lower()][0].decode("utf-8"), 1)]]
+                )
+                dn = self._rename(entry.dn, "{},{}".format(new_rdn, self.parentDn(entry.dn)))
+                entry = self._entries[normalize_dn(dn)]
+            self._post_read(entry, serverctrls, response)
+        return dn
+
+    def rename(self, dn, newdn, move_childs=0, ignore_license=False, serverctrls=None, response=None):
+        # type: (str, str, Optional[int], Optional[bool], Any, Optional[Dict[str, Any]]) -> str
+        with self._lock:
+            self.operations["rename"] += 1
+            if normalize_dn(dn) not in self._entries:
+                raise noObject(dn)
+            if normalize_dn(newdn) in self._entries:
+                raise objectExists(newdn)
+            newdn = self._rename(dn, newdn)
+            self._post_read(self._entries[normalize_dn(newdn)], serverctrls, response)
+        return newdn
+
+    def delete(self, dn, exceptions=False):  # type: (str, Optional[bool]) -> None
+        with self._lock:
+            self.operations["delete"] += 1
+            key = normalize_dn(dn)
+            if key not in self._entries:
+                raise noObject(dn)
+            self._remove(key)
+
+    # internal
+
+    @staticmethod
+    def _timestamp():  # type: () -> bytes
+        return datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S").encode("ascii")
+
+    def _store(self, dn, attrs):  # type: (str, Dict[str, List[bytes]]) -> _Entry
+        key = normalize_dn(dn)
+        entry = _Entry(dn)
+        for attr, values in attrs.items():
+            entry.set(attr, values)
+        entry.set("entryDN", [dn.encode("utf-8")])
+        self._entries[key] = entry
+        parent = self.parentDn(key)
+        if parent is not None:
+            self._children.setdefault(parent, set()).add(key)
+        self._index_entry(key, entry)
+        return entry
+
+    def _remove(self, key):  # type: (str) -> _Entry
+        entry = self._entries.pop(key)
+        self._unindex(key, entry)
+        parent = self.parentDn(key)
+        if parent is not None:
+            self._children.get(parent, set()).discard(key)
+        return entry
+
+    def _rename(self, dn, newdn):  # type: (str, str) -> str
+        old_key = normalize_dn(dn)
+        descendants = [key for key in self._subtree(old_key) if key != old_key]
+        entry = self._remove(old_key)
+        old_rdn_attr, old_rdn_value, _ = ldap.dn.str2dn(dn)[0][0]
+        new_rdn_attr, new_rdn_value, _ = ldap.dn.str2dn(newdn)[0][0]
+        attrs = {entry.names[key]: values for key, values in entry.attrs.items()}
+        old_values = attrs.get(entry.names.get(old_rdn_attr.lower()), [])
+        old_values[:] = [v for v in old_values if v.decode("utf-8").lower() != old_rdn_value.lower()]
+        new_values = attrs.setdefault(entry.names.get(new_rdn_attr.lower(), new_rdn_attr), [])
+        if new_rdn_value.encode("utf-8") not in new_values:
+            new_values.append(new_rdn_value.encode("utf-8"))
+        self._store(newdn, attrs)
+        for key in sorted(descendants, key=lambda k: k.count(",")):
+            child = self._remove(key)
+            child_dn = "{},{}".format(ldap.dn.dn2str(ldap.dn.str2dn(child.dn)[:1]), newdn)
+            self._store(child_dn, {child.names[k]: v for k, v in child.attrs.items()})
+        return newdn
+
+    def _index_entry(self, key, entry):  # type: (str, _Entry) -> None
+        for attr in INDEXED_ATTRIBUTES.intersection(entry.attrs):
+            index = self._index.setdefault(attr, {})
+            for value in entry.attrs[attr]:
+                index.setdefault(value.lower(), set()).add(key)
+
+    def _unindex(self, key, entry):  # type: (str, _Entry) -> None
+        for attr in INDEXED_ATTRIBUTES.intersection(entry.attrs):
+            index = self._index.get(attr, {})
+            for value in entry.attrs[attr]:
+                index.get(value.lower(), set()).discard(key)
+
+    def _candidates(self, node):  # type: (Filter) -> Optional[Set[str]]
+        """Keys of entries that may match `node`, `None` if no index can be used."""
+        op = node[0]
+        if op == "=" and node[1] in INDEXED_ATTRIBUTES:
+            return self._index.get(node[1], {}).get(node[2], set())
+        if op == "&":
+            sets = [s for s in (self._candidates(child) for child in node[1]) if s is not None]
+            if not sets:
+                return None
+            sets.sort(key=len)
+            return sets[0].intersection(*sets[1:])
+        if op == "|":
+            sets = [self._candidates(child) for child in node[1]]
+            if not sets or any(s is None for s in sets):
+                return None
+            return set().union(*sets)
+        return None
+
+    def _subtree(self, key):  # type: (str) -> Iterable[str]
+        todo = [key]
+        while todo:
+            current = todo.pop()
+            yield current
+            todo.extend(self._children.get(current, ()))
+
+    def _search(self, filter_s, base, scope):
+        # type: (str, Optional[str], Optional[str]) -> List[_Entry]
+        base_key = normalize_dn(base or self.base)
+        if base_key not in self._entries:
+            raise noObject(base)
+        node = parse_filter(filter_s)
+        candidates = self._candidates(node)
+        if scope == "base":
+            keys = [base_key] if candidates is None or base_key in candidates else []
+        elif scope == "one":
+            children = self._children.get(base_key, set())
+            keys = children if candidates is None else candidates.intersection(children)
+        elif candidates is not None:
+            suffix = "," + base_key
+            keys = [k for k in candidates if k == base_key or k.endswith(suffix)]
+        elif base_key == normalize_dn(self.base):
+            keys = list(self._entries)
+        else:
+            keys = list(self._subtree(base_key))
+        entries = (self._entries.get(key) for key in keys)
+        return [entry for entry in entries if entry and entry.matches(node)]
+
+    @staticmethod
+    def _post_read(entry, serverctrls, response):
+        # type: (_Entry, Optional[List[Any]], Optional[Dict[str, Any]]) -> None
+        if response is None:
+            return
+        response["ctrls"] = []
+        for ctrl in serverctrls or []:
+            if isinstance(ctrl, PostReadControl):
+                ctrl_res = PostReadControl(False, ctrl.attrList)
+                ctrl_res.dn = entry.dn
+                ctrl_res.entry = entry.result(ctrl.attrList)
+                response["ctrls"].append(ctrl_res)
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Coalesce progress notifications of an import job."""
+
+import threading
+from timeit import default_timer
+from typing import Any, Callable, Dict, Optional, Tuple  # noqa: F401
+
+
+class ThrottledProgressNotifier(object):
+    """
+    Wraps a progress notification function (see
+    :py:meth:`ucsschool.importer.mass_import.user_import.UserImport.progress_report()`) and
+    forwards a notification only if the (whole) percentage changed or if no notification was
+    forwarded for `min_interval` seconds. Other notifications are kept, and only the latest one is
+    forwarded by :py:meth:`flush()`.
+
+    Objects of this class can be used as `progress_notification_function` in the configuration.
+    """
+
+    def __init__(self, notification_function, min_interval=1.0):
+        # type: (Callable[..., Any], float) -> None
+        """
+        :param notification_function: function to forward notifications to, with the signature
+            `(description, percentage, done, total, **kwargs)`
+        :param float min_interval: minimum number of seconds between two notifications with the
+            same percentage
+        """
+        self.notification_function = notification_function
+        self.min_interval = min_interval
+        self.forwarded = 0
+        self.suppressed = 0
+        self._last_percentage = None  # type: Optional[int]
+        self._last_time = 0.0
+        self._pending = None  # type: Optional[Tuple[Tuple[Any, ...], Dict[str, Any]]]
+        self._lock = threading.Lock()
+
+    def __call__(self, description, percentage=0, done=0, total=0, **kwargs):
+        # type: (str, int, int, int, **Any) -> None
+        """
+        Forward or keep a progress notification.
+
+        :param str description: the description
+        :param int percentage: progress
+        :param int done: number of objects done
+        :param int total: number of objects
+        :param dict kwargs: additional arguments for the notification function
+        :return: None
+        """
+        now = default_timer()
+        with self._lock:
+            if percentage == self._last_percentage and now - self._last_time < self.min_interval:
+                self._pending = (description, percentage, done, total), kwargs
+                self.suppressed += 1
+                return
+            self._pending = None
+            self._last_percentage = percentage
+            self._last_time = now
+            self.forwarded += 1
+            # keep the lock, so notifications are forwarded in order
+            self.notification_function(description, percentage, done, total, **kwargs)
+
+    def flush(self):  # type: () -> None
+        """
+        Forward the last notification, if it was kept back.
+
+        :return: None
+        """
+        with self._lock:
+            if self._pending is None:
+                return
+            (args, kwargs), self._pending = self._pending, None
+            self._last_time = default_timer()
+            self.forwarded += 1
+            self.notification_function(*args, **kwargs)
@@ -0,0 +1,371 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Measure the duration of the phases of an import job."""
+
+import functools
+import json
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from timeit import default_timer
+from typing import Any, Callable, Dict, Iterator, List, Optional  # noqa: F401
+
+from six.moves import builtins
+
+# phases of the user import, in the order they are listed in the statistics
+PHASES = (
+    "read",
+    "ldap_lookup",
+    "prepare",
+    "validate",
+    "pre_hooks",
+    "udm_write",
+    "post_hooks",
+    "delete",
+    "result_export",
+)
+HOOK_PHASE_PREFIX = "hook "
+
+_import_timer = None  # type: Optional[ImportTimer]
+
+
+class ImportTimer(object):
+    """
+    Collects the durations of the phases of an import job.
+
+    Durations measured inside a :py:meth:`user()` block are summed up per phase and recorded as one
+    sample per user and phase when the block ends. Durations measured outside of such a block are
+    recorded as samples directly. The :py:meth:`user()` block is thread local.
+    """
+
+    def __init__(self):  # type: () -> None
+        self._samples = {}  # type: Dict[str, array]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):  # type: (str, float) -> None
+        """
+        Record a duration.
+
+        :param str phase: name of the phase, one of :py:data:`PHASES` or
+            ``HOOK_PHASE_PREFIX + <hook class name>.<hook method name>`` (see :py:func:`hook_phase()`)
+        :param float seconds: duration
+        :return: None
+        """
+        durations = getattr(self._local, "user_durations", None)
+        if durations is None:
+            self._append(phase, seconds)
+        else:
+            durations[phase] = durations.get(phase, 0.0) + seconds
+
+    def _append(self, phase, seconds):  # type: (str, float) -> None
+        try:
+            self._samples[phase].append(seconds)
+        except KeyError:
+            with self._lock:
+                self._samples.setdefault(phase, array("d")).append(seconds)
+
+    @contextmanager
+    def measure(self, phase):  # type: (str) -> Iterator[None]
+        """
+        Context manager measuring the duration of its block.
+
+        :param str phase: name of the phase
+        """
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.add(phase, default_timer() - start)
+
+    @contextmanager
+    def user(self):  # type: () -> Iterator[None]
+        """Context manager to record one sample per phase for the user handled in its block."""
+        if getattr(self._local, "user_durations", None) is not None:
+            # nested, record in outer block
+            yield
+            return
+        self._local.user_durations = {}
+        try:
+            yield
+        finally:
+            durations, self._local.user_durations = self._local.user_durations, None
+            for phase, seconds in durations.items():
+                self._append(phase, seconds)
+
+    def pop_samples(self):  # type: () -> Dict[str, List[float]]
+        """
+        Get and remove all samples, for example to transfer them from a worker process.
+
+        :return: mapping phase -> list of durations
+        :rtype: dict(str, list(float))
+        """
+        with self._lock:
+            samples, self._samples = self._samples, {}
+        return {phase: values.tolist() for phase, values in samples.items()}
+
+    def merge(self, samples):  # type: (Dict[str, List[float]]) -> None
+        """
+        Add samples returned by :py:meth:`pop_samples()` of another timer.
+
+        :param dict samples: mapping phase -> list of durations
+        :return: None
+        """
+        for phase, values in samples.items():
+            with self._lock:
+                self._samples.setdefault(phase, array("d")).extend(values)
+
+    def clear(self):  # type: () -> None
+        with self._lock:
+            self._samples = {}
+
+    def get_stats(self):  # type: () -> Dict[str, Dict[str, Any]]
+        """
+        Statistics of all phases: number of samples, total, 50th and 95th percentile and maximum
+        duration in seconds. Phases without samples are omitted.
+
+        :return: ordered mapping phase -> statistics
+        :rtype: OrderedDict
+        """
+        with self._lock:
+            phases = sorted(
+                self._samples,
+                key=lambda x: (PHASES.index(x), "") if x in PHASES else (len(PHASES), x),
+            )
+            res = OrderedDict()  # type: Dict[str, Dict[str, Any]]
+            for phase in phases:
+                values = sorted(self._samples[phase])
+                if not values:
+                    continue
+                res[phase] = OrderedDict(
+                    [
+                        ("count", len(values)),
+                        ("total", sum(values)),
+                        ("p50", self.percentile(values, 50)),
+                        ("p95", self.percentile(values, 95)),
+                        ("max", values[-1]),
+                    ]
+                )
+        return res
+
+    @staticmethod
+    def percentile(sorted_values, percent):  # type: (List[float], int) -> float
+        """
+        Nearest-rank percentile.
+
+        :param list sorted_values: sorted, not empty list of values
+        :param int percent: percentile (1-100)
+        :return: value
+        :rtype: float
+        """
+        rank = max(1, -(-len(sorted_values) * percent // 100))  # ceil
+        return sorted_values[rank - 1]
+
+    def get_summary_lines(self):  # type: () -> List[str]
+        """
+        Statistics of all phases as text table.
+
+        :return: lines of text
+        :rtype: list(str)
+        """
+        stats = self.get_stats()
+        if not stats:
+            return []
+        width = max(len(phase) for phase in stats)
+        header = ("{: <%d} | {: >7} | {: >9} | {: >8} | {: >8} | {: >8}" % (width,)).format(
+            "Phase", "Count", "Total [s]", "p50 [s]", "p95 [s]", "max [s]"
+        )
+        lines = [header, "-" * len(header)]
+        for phase, values in stats.items():
+            lines.append(
+                ("{: <%d} | {: >7} | {: >9.2f} | {: >8.4f} | {: >8.4f} | {: >8.4f}" % (width,)).format(
+                    phase,
+                    values["count"],
+                    values["total"],
+                    values["p50"],
+                    values["p95"],
+                    values["max"],
+                )
+            )
+        return lines
+
+    def dump(self, filename):  # type: (str) -> None
+        """
+        Write statistics of all phases to a JSON file.
+
+        :param str filename: path of the file to write
+        :return: None
+        """
+        with open(filename, "w") as fp:
+            json.dump({"phases": self.get_stats()}, fp, indent=4)
+
+
+class StartupProfiler(object):
+    """
+    Measures the start-up of an import: the duration of its phases and of the
+    import of Python modules (similar to ``python -X importtime``).
+
+    While installed, :py:func:`__import__` is replaced. Only use it during the
+    single threaded start-up.
+    """
+
+    def __init__(self):  # type: () -> None
+        self.start = default_timer()
+        self.phases = OrderedDict()  # type: Dict[str, float]
+        self.imports = {}  # type: Dict[str, List[float]]  # module -> [cumulative, self]
+        self._stack = []  # type: List[float]  # durations of nested imports
+        self._orig_import = None  # type: Optional[Callable[..., Any]]
+
+    def install(self):  # type: () -> None
+        """Start measuring module imports."""
+        if self._orig_import is None:
+            self._orig_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):  # type: () -> None
+        """Stop measuring module imports."""
+        if self._orig_import is not None:
+            builtins.__import__ = self._orig_import
+            self._orig_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # type: (str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], Any, int) -> Any
+        if level == 0 and not fromlist and name in sys.modules:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        num_modules = len(sys.modules)
+        self._stack.append(0.0)
+        start = default_timer()
+        try:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = default_timer() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if len(sys.modules) != num_modules:
+                if level:
+                    package = (globals or {}).get("__package__") or ""
+                    base = package.rsplit(".", level - 1)[0] if level > 1 else package
+                    name = "{}.{}".format(base, name) if name else base
+                durations = self.imports.setdefault(name, [0.0, 0.0])
+                durations[0] += elapsed
+                durations[1] += elapsed - children
+
+    @contextmanager
+    def phase(self, name):  # type: (str) -> Iterator[None]
+        """
+        Context manager measuring the duration of a start-up phase.
+
+        :param str name: name of the phase
+        """
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + default_timer() - start
+
+    def get_report_lines(self, num_imports=20):  # type: (int) -> List[str]
+        """
+        Durations of the start-up phases and the slowest module imports as text.
+
+        :param int num_imports: number of module imports to list
+        :return: lines of text
+        :rtype: list(str)
+        """
+        lines = ["Start-up took {:.3f} s.".format(default_timer() - self.start)]
+        if self.phases:
+            width = max(len(phase) for phase in list(self.phases) + ["Phase"])
+            lines.append(("{: <%d} | {: >9}" % (width,)).format("Phase", "Total [s]"))
+            lines.append("-" * len(lines[-1]))
+            for phase, seconds in self.phases.items():
+                lines.append(("{: <%d} | {: >9.3f}" % (width,)).format(phase, seconds))
+        if self.imports:
+            slowest = sorted(self.imports.items(), key=lambda x: x[1][1], reverse=True)[:num_imports]
+            width = max(len(name) for name in [x[0] for x in slowest] + ["Module"])
+            lines.append(
+                "Imported {} modules in {:.3f} s, slowest:".format(
+                    len(self.imports), sum(d[1] for d in self.imports.values())
+                )
+            )
+            lines.append(
+                ("{: <%d} | {: >8} | {: >14}" % (width,)).format("Module", "Self [s]", "Cumulative [s]")
+            )
+            lines.append("-" * len(lines[-1]))
+            for name, (cumulative, own) in slowest:
+                lines.append(
+                    ("{: <%d} | {: >8.3f} | {: >14.3f}" % (width,)).format(name, own, cumulative)
+                )
+        return lines
+
+
+def get_import_timer():  # type: () -> ImportTimer
+    """
+    The timer of the current import job.
+
+    :rtype: ImportTimer
+    """
+    global _import_timer
+    if _import_timer is None:
+        _import_timer = ImportTimer()
+    return _import_timer
+
+
+def hook_phase(func):  # type: (Callable[..., Any]) -> str
+    """
+    Name of the phase to record the durations of a hook method in.
+
+    :param func: bound method of a hook object
+    :return: ``HOOK_PHASE_PREFIX + <hook class name>.<hook method name>``
+    :rtype: str
+    """
+    return "{}{}.{}".format(HOOK_PHASE_PREFIX, func.__self__.__class__.__name__, func.__func__.__name__)
+
+
+def timed(phase):  # type: (str) -> Callable[[Callable[..., Any]], Callable[..., Any]]
+    """
+    Decorator measuring the duration of the decorated function with :py:func:`get_import_timer()`.
+
+    :param str phase: name of the phase
+    """
+
+    def decorator(func):  # type: (Callable[..., Any]) -> Callable[..., Any]
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):  # type: (*Any, **Any) -> Any
+            with get_import_timer().measure(phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -36,13 +36,15 @@ from __future__ import absolute_import
 import logging
 import re
 import string
-from typing import TYPE_CHECKING, Callable, Dict, Optional  # noqa: F401
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional  # noqa: F401
 
 import lazy_object_proxy
+from ldap import LDAPError
 from ldap.dn import escape_dn_chars
+from ldap.filter import filter_format
 from six import PY3, string_types
 
-from univention.admin.uexceptions import noObject, objectExists
+from univention.admin.uexceptions import ldapError, noObject, objectExists
 
 from ..configuration import Configuration
 from ..exceptions import BadValueStored, FormatError, NameKeyExists, NoValueStored
@@ -104,6 +106,22 @@ class NameCounterStorageBackend(object):
         """
         raise NotImplementedError()
 
+    def prewarm(self, names):  # type: (Iterable[str]) -> None
+        """
+        Optionally load the values of `names` in advance, because they will be retrieved soon.
+
+        :param names: names that will probably be retrieved
+        :type names: Iterable(str)
+        :return: None
+        """
+
+    def release(self):  # type: () -> None
+        """
+        Optionally return values that were reserved, but not used.
+
+        :return: None
+        """
+
 
 class LdapStorageBackend(NameCounterStorageBackend):
     """
@@ -180,6 +198,140 @@ class LdapStorageBackend(NameCounterStorageBackend):
             self.lo.delete(dn)
 
 
+class LeasedLdapStorageBackend(LdapStorageBackend):
+    """
+    :py:class:`LdapStorageBackend` that reserves a block of `lease_size` values of a counter with a
+    single conditional LDAP modify and hands them out without further LDAP access.
+
+    Reserved but unused values are returned by :py:meth:`release()`, if the counter was not changed by
+    someone else in the meantime. Otherwise they are skipped.
+    """
+
+    LEASE_ATTEMPTS = 10
+    PREWARM_NAMES_PER_SEARCH = 500
+
+    def __init__(self, attribute_storage_name, lease_size, lo=None, pos=None):
+        # type: (str, int, Optional[univention.admin.uldap.access], Optional[univention.admin.uldap.position]) -> None  # noqa: E501
+        super(LeasedLdapStorageBackend, self).__init__(attribute_storage_name, lo, pos)
+        self.lease_size = lease_size
+        self.logger = logging.getLogger(__name__)
+        # LDAP is case insensitive, so the dicts use lower case names as keys
+        self._leases = {}  # type: Dict[str, List[int]]  # name -> [next value, end of lease]
+        self._known_values = {}  # type: Dict[str, Optional[int]]  # name -> value in LDAP or None
+
+    def create(self, name, value):  # type: (str, int) -> None
+        super(LeasedLdapStorageBackend, self).create(name, value + self.lease_size)
+        self._leases[name.lower()] = [value, value + self.lease_size]
+
+    def modify(self, name, old_value, new_value):  # type: (str, int, int) -> None
+        lease = self._leases.get(name.lower())
+        if lease and lease[0] == old_value and old_value < new_value <= lease[1]:
+            lease[0] = new_value
+        else:
+            super(LeasedLdapStorageBackend, self).modify(name, old_value, new_value)
+
+    def retrieve(self, name):  # type: (str) -> int
+        lease = self._leases.get(name.lower())
+        if not lease or lease[0] >= lease[1]:
+            lease = self._lease(name)
+        return lease[0]
+
+    def remove(self, name):  # type: (str) -> None
+        self._leases.pop(name.lower(), None)
+        self._known_values.pop(name.lower(), None)
+        super(LeasedLdapStorageBackend, self).remove(name)
+
+    def purge(self):  # type: () -> None
+        self._leases.clear()
+        self._known_values.clear()
+        super(LeasedLdapStorageBackend, self).purge()
+
+    def prewarm(self, names):  # type: (Iterable[str]) -> None
+        """
+        Read the current values of the counters `names` with one LDAP search (per
+        :py:attr:`PREWARM_NAMES_PER_SEARCH` names), so reserving a block of values does not require
+        reading it first.
+
+        :param names: names that will probably be retrieved
+        :type names: Iterable(str)
+        :return: None
+        """
+        names = sorted({name.lower() for name in names}.difference(self._leases, self._known_values))
+        for i in range(0, len(names), self.PREWARM_NAMES_PER_SEARCH):
+            chunk = names[i : i + self.PREWARM_NAMES_PER_SEARCH]
+            filter_s = "(&(objectClass=ucsschoolUsername)(|{}))".format(
+                "".join(filter_format("(cn=%s)", (name,)) for name in chunk)
+            )
+            self._known_values.update(dict.fromkeys(chunk))
+            for _dn, attrs in self.lo.search(
+                filter=filter_s,
+                base=self.ldap_base,
+                scope="one",
+                attr=["cn", "ucsschoolUsernameNextNumber"],
+            ):
+                name = attrs["cn"][0].decode("UTF-8").lower()
+                try:
+                    self._known_values[name] = int(attrs["ucsschoolUsernameNextNumber"][0])
+                except (KeyError, ValueError):
+                    # let retrieve() handle it
+                    del self._known_values[name]
+        self.logger.debug("Prewarmed %d %s counters.", len(names), self.ldap_base.split(",", 1)[0])
+
+    def release(self):  # type: () -> None
+        """
+        Return reserved but unused values, if no one else reserved values of the same counter in the
+        meantime.
+
+        :return: None
+        """
+        for name, (next_value, end) in self._leases.items():
+            if next_value >= end:
+                continue
+            try:
+                super(LeasedLdapStorageBackend, self).modify(name, end, next_value)
+            except (LDAPError, NoValueStored, ldapError) as exc:
+                self.logger.debug(
+                    "Not returning unused values %d-%d of counter %r: %s", next_value, end - 1, name, exc
+                )
+        self._leases.clear()
+        self._known_values.clear()
+
+    def _lease(self, name):  # type: (str) -> List[int]
+        """
+        Reserve a block of values of the counter `name` with a conditional modify.
+
+        :param str name: name
+        :return: lease: [next value, end of lease]
+        :rtype: list(int)
+        :raises NoValueStored: if no value is stored by that `name`
+        :raises BadValueStored: if the value has a bad format
+        """
+        key = name.lower()
+        for _attempt in range(self.LEASE_ATTEMPTS):
+            if key in self._known_values:
+                value = self._known_values.pop(key)
+                if value is None:
+                    raise NoValueStored("Name {!r} not found.".format(name))
+            elif key in self._leases:
+                # most probably unchanged since the last lease
+                value = self._leases[key][1]
+            else:
+                value = super(LeasedLdapStorageBackend, self).retrieve(name)
+            try:
+                super(LeasedLdapStorageBackend, self).modify(name, value, value + self.lease_size)
+            except (LDAPError, ldapError) as exc:
+                # value was changed concurrently or is outdated, read it again
+                self.logger.debug("Reserving values of counter %r failed: %s", name, exc)
+                self._leases.pop(key, None)
+                self._known_values.pop(key, None)
+                continue
+            self._leases[key] = [value, value + self.lease_size]
+            return self._leases[key]
+        raise BadValueStored(
+            "Could not reserve values of counter {!r} in {} attempts.".format(name, self.LEASE_ATTEMPTS)
+        )
+
+
 class MemoryStorageBackend(NameCounterStorageBackend):
     def __init__(self, attribute_storage_name):  # type: (str) -> None
         self._mem_store = {}  # type: Dict[str, int]
@@ -298,6 +450,7 @@ class UsernameHandler(object):
         self.logger = logging.getLogger(__name__)
         self.config = lazy_object_proxy.Proxy(lambda: Configuration())
         self.storage_backend = self.get_storage_backend()
+        self._log_bad_chars = True
         self.logger.debug("%r storage_backend=%r", self, self.storage_backend.__class__.__name__)
         self.replacement_variable_pattern = re.compile(
             r"(%s)" % "|".join(map(re.escape, self.counter_variable_to_function.keys())), flags=re.I
@@ -319,8 +472,13 @@ class UsernameHandler(object):
         :return: NameCounterStorageBackend instance
         :rtype: NameCounterStorageBackend
         """
+        lease_size = int(self.config.get("counter_lease_size", 1))
         if self.dry_run:
             return MemoryStorageBackend(attribute_storage_name=self.attribute_storage_name)
+        elif lease_size > 1:
+            return LeasedLdapStorageBackend(
+                attribute_storage_name=self.attribute_storage_name, lease_size=lease_size
+            )
         else:
             return LdapStorageBackend(attribute_storage_name=self.attribute_storage_name)
 
@@ -338,7 +496,7 @@ class UsernameHandler(object):
             return name
 
         bad_chars = "".join(set(name).difference(set(self.allowed_chars)))
-        if bad_chars:
+        if bad_chars and self._log_bad_chars:
             self.logger.warning(
                 "Removing disallowed characters %r from %s %r.",
                 "".join(sorted(bad_chars)),
@@ -347,12 +505,13 @@ class UsernameHandler(object):
             )
         for char in self.config["username"]["allowed_special_chars"]:
             if name.startswith(char) or name.endswith(char):
-                self.logger.warning(
-                    "Removing disallowed character %r from start and end of %s %r.",
-                    char,
-                    self.attribute_name,
-                    name,
-                )
+                if self._log_bad_chars:
+                    self.logger.warning(
+                        "Removing disallowed character %r from start and end of %s %r.",
+                        char,
+                        self.attribute_name,
+                        name,
+                    )
                 name = name.strip(char)
         if PY3:
             return str(name).translate(str.maketrans("", "", bad_chars))
@@ -417,6 +576,27 @@ class UsernameHandler(object):
         username = username.strip(".")
         return username
 
+    def get_name_base(self, name, max_length=None):  # type: (str, Optional[int]) -> Optional[str]
+        """
+        Name under which :py:meth:`format_name()` would store the counter for `name`. Does not
+        change any counter.
+
+        :param str name: username/email, possibly a template
+        :param int max_length: overwrite max length specified at object instanciation time
+        :return: key of the counter or None if `name` has no counter variable
+        :rtype: str or None
+        """
+        PATTERN_FUNC_MAXLENGTH = 3  # maximum a counter function can produce is len('999')
+        if not self.replacement_variable_pattern.search(name):
+            return None
+        cut_pos = max(0, (max_length or self.max_length) - PATTERN_FUNC_MAXLENGTH)
+        self._log_bad_chars = False  # will be logged when the name is formatted
+        try:
+            without_pattern = self.remove_bad_chars(self.replacement_variable_pattern.sub("", name))
+        finally:
+            self._log_bad_chars = True
+        return without_pattern[:cut_pos]
+
     def format_username(self, name):  # type: (str) -> str
         """Deprecated method. Please use format_name() instead."""
         return self.format_name(name)
@@ -505,7 +685,7 @@ class EmailHandler(UsernameHandler):
         it anyway. (Although technically allowed, not all mail servers support it.)
         """
         bad_chars = "".join(set(name).intersection(set(string.whitespace)))
-        if bad_chars:
+        if bad_chars and self._log_bad_chars:
             self.logger.warning(
                 "Removing disallowed characters %r from %s %r.",
                 "".join(sorted(bad_chars)),
@@ -523,3 +703,8 @@ class EmailHandler(UsernameHandler):
             raise FormatError("Maximum email length is to small.", name, name)
         local_part_new = super(EmailHandler, self).format_name(local_part, max_length)
         return "{}@{}".format(local_part_new, domain_part)
+
+    def get_name_base(self, name, max_length=None):  # type: (str, Optional[int]) -> Optional[str]
+        local_part, _at, domain_part = name.rpartition("@")
+        max_length = max_length or self.max_length - len(domain_part) - 1  # 1 = len(@)
+        return super(EmailHandler, self).get_name_base(local_part, max(1, max_length))
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Compact index of the usernames in LDAP, used to check the uniqueness of usernames."""
+
+import logging
+import threading
+from array import array
+from collections import namedtuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional  # noqa: F401
+
+from .ldap_connection import paged_search
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+
+if TYPE_CHECKING:
+    from .ldap_connection import LoType  # noqa: F401
+
+UsernameUniquenessTuple = namedtuple("UsernameUniquenessTuple", ["record_uid", "source_uid", "dn"])
+
+
+class UsernameIndex(MutableMapping):
+    """
+    Mapping from username to :py:class:`UsernameUniquenessTuple` of all users in LDAP.
+
+    Like `uid` in LDAP, usernames are compared case-insensitively: the keys are the lower case
+    usernames.
+
+    In a domain with hundreds of thousands of accounts, a dict of tuples of strings uses hundreds of
+    MB. Here only the username and the record_uid are stored as individual strings:
+
+    * source_uids and parent DNs are stored once each, the entries reference them by their position
+      in arrays of machine integers
+    * the DN of an entry is recreated from its parent DN, unless its RDN is not `uid=<username>` (in
+      lower case)
+
+    Removed or renamed entries leave an unused position in the arrays behind.
+
+    The index is filled by :py:meth:`load()` and must be updated by the code that creates, renames,
+    moves or removes users. Changes are thread-safe.
+    """
+
+    def __init__(self):  # type: () -> None
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):  # type: () -> None
+        self.loaded = False
+        self._positions = {}  # type: Dict[str, int]
+        self._record_uids = []  # type: List[Optional[str]]
+        self._source_uids = array("l")
+        self._parent_dns = array("l")
+        self._other_dns = {}  # type: Dict[int, str]
+        self._strings = []  # type: List[Optional[str]]
+        self._string_positions = {}  # type: Dict[Optional[str], int]
+
+    def __getitem__(self, name):  # type: (str) -> UsernameUniquenessTuple
+        key = name.lower()
+        pos = self._positions[key]
+        dn = self._other_dns.get(pos)
+        if dn is None:
+            dn = "uid={},{}".format(key, self._strings[self._parent_dns[pos]])
+        return UsernameUniquenessTuple(self._record_uids[pos], self._strings[self._source_uids[pos]], dn)
+
+    def __setitem__(self, name, value):  # type: (str, UsernameUniquenessTuple) -> None
+        record_uid, source_uid, dn = value
+        rdn, _sep, parent_dn = (dn or "").partition(",")
+        key = name.lower()
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = len(self._record_uids)
+                self._record_uids.append(record_uid)
+                self._source_uids.append(self._string_position(source_uid))
+                self._parent_dns.append(self._string_position(parent_dn))
+                self._positions[key] = pos
+            else:
+                self._record_uids[pos] = record_uid
+                self._source_uids[pos] = self._string_position(source_uid)
+                self._parent_dns[pos] = self._string_position(parent_dn)
+            if rdn == "uid={}".format(key):
+                self._other_dns.pop(pos, None)
+            else:
+                self._other_dns[pos] = dn
+
+    def __delitem__(self, name):  # type: (str) -> None
+        with self._lock:
+            pos = self._positions.pop(name.lower())
+            self._record_uids[pos] = None
+            self._other_dns.pop(pos, None)
+
+    def __iter__(self):  # type: () -> Iterator[str]
+        return iter(list(self._positions))
+
+    def __len__(self):  # type: () -> int
+        return len(self._positions)
+
+    def _string_position(self, value):  # type: (Optional[str]) -> int
+        try:
+            return self._string_positions[value]
+        except KeyError:
+            self._string_positions[value] = len(self._strings)
+            self._strings.append(value)
+            return self._string_positions[value]
+
+    def clear(self):  # type: () -> None
+        with self._lock:
+            self._reset()
+
+    def load(self, lo):  # type: (LoType) -> None
+        """
+        Add the usernames of all users (not computers) in LDAP to the index, using a paged search.
+        Does nothing, if the index has already been loaded.
+
+        :param univention.admin.uldap.access connection lo: LDAP connection object
+        :return: None
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            self.logger.debug("Reading usernames of all users from LDAP...")
+            # it's faster to filter out computer names in Python than in LDAP
+            for dn, attrs in paged_search(
+                lo, "objectClass=posixAccount", attr=["uid", "ucsschoolRecordUID", "ucsschoolSourceUID"]
+            ):
+                if attrs["uid"][0].endswith(b"$"):
+                    continue
+                self[attrs["uid"][0].decode("UTF-8")] = UsernameUniquenessTuple(
+                    attrs.get("ucsschoolRecordUID", [b""])[0].decode("UTF-8") or None,
+                    attrs.get("ucsschoolSourceUID", [b""])[0].decode("UTF-8") or None,
+                    dn,
+                )
+            self.loaded = True
+            self.logger.debug("Read %d usernames.", len(self))
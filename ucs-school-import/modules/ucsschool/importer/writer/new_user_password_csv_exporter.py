@@ -54,6 +54,11 @@ class NewUserPasswordCsvExporter(ResultExporter):
         li.sort(key=lambda x: int(x["entry_count"]) if isinstance(x, dict) else int(x.entry_count))
         return li
 
+    def include_in_stream(self, user):
+        """Write only the new users."""
+        action = user["action"] if isinstance(user, dict) else user.action
+        return action == "A"
+
     def get_writer(self):
         """Use the user result csv writer."""
         return self.factory.make_user_writer(field_names=self.field_names)
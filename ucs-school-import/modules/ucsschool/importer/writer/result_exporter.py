@@ -33,6 +33,7 @@
 
 import os.path
 import stat
+import threading
 
 from ucsschool.lib.models.utils import mkdir_p
 
@@ -42,12 +43,16 @@ class ResultExporter(object):
     Write a CSV/JSON/XML file representing the result of an import job.
     Create one writer per object type.
 
-    Clients of this class should only call dump().
+    Clients of this class should only call dump(), or open_stream(),
+    write_results() and close_stream() to write the result while the import
+    job is running.
 
     Subclasses implement get_iter() to create a stream of objects to serialize
     and run serialize() on each of them.
     """
 
+    _stream = None  # (writer, context manager returned by writer.open(), file) while streaming
+
     def __init__(self, *arg, **kwargs):
         """
         Create a CSV file writer.
@@ -73,6 +78,85 @@ class ResultExporter(object):
                 writer.write_obj(row)
             writer.write_footer(self.get_footer())
 
+    def open_stream(self, filename):
+        """
+        Open a result file to write objects to with :py:meth:`write_results()`
+        as soon as they are committed, instead of keeping them until
+        :py:meth:`dump()` is called.
+
+        :param str filename: filename to write data to
+        :return: None
+        """
+        mkdir_p(os.path.dirname(filename), "root", "root", stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+        writer = self.get_writer()
+        context = writer.open(filename)
+        fp = context.__enter__()
+        self._stream = writer, context, fp
+        self._stream_lock = threading.Lock()
+        writer.write_header(self.get_header())
+
+    def write_results(self, objs):
+        """
+        Write objects to the result file opened with :py:meth:`open_stream()`,
+        skipping those for which :py:meth:`include_in_stream()` returns False.
+        Thread-safe, the data is flushed to the file.
+
+        :param list objs: objects to serialize (the same types as those
+            returned by :py:meth:`get_iter()`)
+        :return: None
+        """
+        with self._stream_lock:
+            writer, _context, fp = self._stream
+            for obj in objs:
+                if self.include_in_stream(obj):
+                    writer.write_obj(self.serialize(obj))
+            if hasattr(fp, "flush"):
+                fp.flush()
+
+    def close_stream(self, import_handler):
+        """
+        Write the objects returned by :py:meth:`get_stream_tail()` and the
+        footer to the result file opened with :py:meth:`open_stream()` and
+        close it. Does nothing if no file is open.
+
+        :param UserImport import_handler: object that contains data from an
+            import job (for example UserImport)
+        :return: None
+        """
+        if self._stream is None:
+            return
+        try:
+            self.write_results(self.get_stream_tail(import_handler))
+            self._stream[0].write_footer(self.get_footer())
+        finally:
+            context, self._stream = self._stream[1], None
+            context.__exit__(None, None, None)
+
+    def include_in_stream(self, obj):
+        """
+        Whether an object passed to :py:meth:`write_results()` should be
+        written to the result file.
+        IMPLEMENTME to write only some objects (e.g. new users).
+
+        :param obj: object that was committed by the import job
+        :return: whether to write `obj`
+        :rtype: bool
+        """
+        return True
+
+    def get_stream_tail(self, import_handler):
+        """
+        Objects that are written at the end of a result file opened with
+        :py:meth:`open_stream()`, because they are only known at the end of
+        the import job (e.g. errors).
+        IMPLEMENTME to add objects at the end of the generated output.
+
+        :param import_handler: object that contains data from an import job
+        :return: list of objects to serialize
+        :rtype: list
+        """
+        return []
+
     def get_footer(self):
         """
         Data for an optional footer (line) after the main data.
@@ -94,6 +94,19 @@ class UserImportCsvResultExporter(ResultExporter):
         li.sort(key=lambda x: int(x["entry_count"]) if isinstance(x, dict) else int(x.entry_count))
         return li
 
+    def get_stream_tail(self, user_import):
+        """
+        The errors of the user import, written at the end when streaming the result.
+
+        :param UserImport user_import: UserImport object used for the import
+        :return: list of UcsSchoolImportError objects
+        :rtype: list(UcsSchoolImportError)
+        """
+        return sorted(
+            user_import.errors,
+            key=lambda exc: max(exc.entry_count, exc.import_user.entry_count if exc.import_user else 0),
+        )
+
     def get_writer(self):
         """
         Object that will write the data to disk/network in the desired format.
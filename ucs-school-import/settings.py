@@ -231,6 +231,20 @@ UCSSCHOOL_IMPORT = {
         "api_logfile": os.path.join(LOG_DIR, "http_api.log"),
     },
     "import_jobs_basedir": os.path.join(IMPORT_USER_DATA_DIR, "jobs"),
+    # real import jobs of the same school are serialized by a file lock in this directory
+    "school_lock_dir": os.path.join(IMPORT_USER_DATA_DIR, "locks"),
+    # seconds after which a delayed import job tries again to start
+    "school_lock_retry_interval": 10,
+    # seconds after which an unstarted import job does not delay newer jobs of its school anymore
+    "school_queue_max_age": 86400,
+    # seconds for which the schools and roles a user may import are cached (0: no caching)
+    "permission_cache_timeout": 60,
+    # seconds a GET to /imports/users/{pk}/wait/ blocks by default and at most
+    "job_wait_timeout": 25,
+    "job_wait_max_timeout": 50,
+    # seconds between two database lookups of a waited for import job
+    "job_wait_poll_interval": 0.25,
+    "journal_filename": "journal.jsonl",
     "new_user_passwords_filename": "new_user_passwords.csv",
     "user_import_summary_filename": "user_import_summary.csv",
 }
@@ -143,6 +143,21 @@ class DefaultConfigurationChecks(ConfigurationChecks):
                     "No domain could be found in the configuration or under locally hosted domains."
                 )
 
+    def test_parallel_process_mode_with_streaming(self):
+        # Worker processes update their own copies of the indexes of existing users and usernames.
+        # The parent would search the following batches with stale indexes.
+        parallel = self.config.get("parallel", {})
+        if (
+            int(parallel.get("workers", 1)) > 1
+            and parallel.get("mode", "process") == "process"
+            and self.config.get("streaming", {}).get("enabled", False)
+        ):
+            raise InitialisationError(
+                "Streaming mode cannot be used with parallel worker processes, as the changes to the "
+                "indexes of existing users and usernames made by the workers do not reach the following "
+                "batches. Set 'parallel:mode' to 'thread' or disable 'streaming'."
+            )
+
     def test_scheme_valid_format(self):
         """
         Check validity of "scheme" entries.
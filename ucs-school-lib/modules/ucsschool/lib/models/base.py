@@ -34,6 +34,7 @@ from copy import deepcopy
 from typing import (
     TYPE_CHECKING,
     Any,  # noqa: F401
+    Callable,  # noqa: F401
     Dict,  # noqa: F401
     Iterable,  # noqa: F401
     List,  # noqa: F401
@@ -467,24 +468,28 @@ class UCSSchoolHelperAbstractClass(object):
         :return: None
         :rtype: None
         """
+        hooks = _pyhook_loader.get_hook_methods(self.__class__, "{}_{}".format(hook_time, func_name), lo)
+        if not hooks:
+            return
         state = self._in_hook
         self._in_hook = True
-        all_hooks = _pyhook_loader.get_hook_objects(lo)
-        meth_name = "{}_{}".format(hook_time, func_name)
         try:
-            for func in all_hooks.get(meth_name, []):
-                if issubclass(self.__class__, func.__self__.__class__.model):
-                    self.logger.debug(
-                        "Running %s hook %s.%s for %s...",
-                        meth_name,
-                        func.__self__.__class__.__name__,
-                        func.__func__.__name__,
-                        self,
-                    )
-                    func(self)
+            for func in hooks:
+                self._run_pyhook(func)
         finally:
             self._in_hook = state
 
+    def _run_pyhook(self, func):  # type: (Callable[[UCSSchoolHelperAbstractClass], Any]) -> None
+        """
+        Run a single hook method. Overwrite this method to measure or wrap the
+        execution of hook methods.
+
+        :param func: bound hook method
+        :return: None
+        :rtype: None
+        """
+        func(self)
+
     def call_hooks(self, hook_time, func_name, lo):  # type: (str, str, LoType) -> None
         """
         Calls Python
@@ -498,6 +503,8 @@ class UCSSchoolHelperAbstractClass(object):
         :param str func_name: `create`, `modify`, `move` or `remove`
         :param univention.admin.uldap.access lo: LDAP connection object
         """
+        if not _pyhook_loader.get_hook_methods(self.__class__, "{}_{}".format(hook_time, func_name), lo):
+            return
         lo_name = lo.__class__.__name__
         if lo_name == "access":
             lo_name = "lo"
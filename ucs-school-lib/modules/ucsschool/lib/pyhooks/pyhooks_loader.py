@@ -100,6 +100,7 @@ class PyHooksLoader(object):
             raise TypeError("Argument 'filter_func' must be a callable, got {!r}.".format(filter_func))
         self._filter_func = filter_func
         self._pyhook_obj_cache = None  # type: Union[None, Dict[str, List[Callable[..., Any]]]]
+        self._dispatch_tables = {}  # type: Dict[Optional[type], Dict[str, List[Callable[..., Any]]]]
 
     def drop_cache(self):  # type: () -> None
         """
@@ -110,6 +111,7 @@ class PyHooksLoader(object):
         :return: None
         """
         self._pyhook_obj_cache = None
+        self._dispatch_tables = {}
         if self.base_class_name in self._hook_classes:
             del self._hook_classes[self.base_class_name]
 
@@ -217,6 +219,44 @@ class PyHooksLoader(object):
             )
         return self._pyhook_obj_cache
 
+    def get_hook_methods(self, model, meth_name, *args, **kwargs):
+        # type: (Optional[type], str, *Any, **Any) -> List[Callable[..., Any]]
+        """
+        Get the initialized hook methods with name `meth_name` that are
+        responsible for objects of class `model`, sorted by priority.
+
+        A hook is responsible for `model`, if it has no `model` attribute or if
+        `model` is a subclass of it. The methods of all hook method names are
+        collected in a dispatch table when it is first requested for a
+        `model`, so this is a dictionary lookup after that.
+
+        :param type model: class of the objects to run the hooks for, `None`
+            to get the methods of all hooks
+        :param str meth_name: name of the hook method, e.g. `pre_create`
+        :param tuple args: arguments to pass to __init__ of hooks
+        :param dict kwargs: arguments to pass to __init__ of hooks
+        :return: list of methods of initialized hook objects, sorted by
+            method priority, empty if there are none
+        :rtype: List[Callable]
+        """
+        try:
+            return self._dispatch_tables[model].get(meth_name, [])
+        except KeyError:
+            pass
+        table = {}  # type: Dict[str, List[Callable[..., Any]]]
+        for name, meths in iteritems(self.get_hook_objects(*args, **kwargs)):
+            meths = [
+                meth
+                for meth in meths
+                if model is None
+                or getattr(meth.__self__, "model", None) is None
+                or issubclass(model, meth.__self__.model)
+            ]
+            if meths:
+                table[name] = meths
+        self._dispatch_tables[model] = table
+        return table.get(meth_name, [])
+
     @staticmethod
     def _load_hook_class(module_name, info, super_class):
         # type: (str, Tuple[IO, str, Tuple[str, str, int]], Type[PyHookTV]) -> Optional[Type[PyHookTV]]
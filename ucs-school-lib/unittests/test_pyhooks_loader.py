@@ -0,0 +1,112 @@
+import sys
+
+import pytest
+
+sys.path.insert(1, "modules")
+from ucsschool.lib.pyhooks.pyhook import PyHook  # noqa: E402
+from ucsschool.lib.pyhooks.pyhooks_loader import PyHooksLoader  # noqa: E402
+
+
+class Model(object):
+    pass
+
+
+class SubModel(Model):
+    pass
+
+
+class OtherModel(object):
+    pass
+
+
+class BaseHook(PyHook):
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super(BaseHook, self).__init__(*args, **kwargs)
+        self.args = args
+        self.instances.append(self)
+
+    def pre_create(self, obj):
+        pass
+
+    def post_create(self, obj):
+        pass
+
+
+class AllHook(BaseHook):
+    priority = {"pre_create": 10, "post_create": None}
+
+
+class ModelHook(BaseHook):
+    model = Model
+    priority = {"pre_create": 20, "post_create": 1}
+
+
+class OtherHook(BaseHook):
+    model = OtherModel
+    priority = {"pre_create": 30}
+
+
+@pytest.fixture()
+def loader(tmpdir, monkeypatch):
+    loader = PyHooksLoader(str(tmpdir), BaseHook)
+    monkeypatch.setattr(loader, "get_hook_classes", lambda: [AllHook, ModelHook, OtherHook])
+    monkeypatch.setattr(BaseHook, "instances", [])
+    yield loader
+    loader.drop_cache()
+
+
+def names(meths):
+    return ["{}.{}".format(meth.__self__.__class__.__name__, meth.__name__) for meth in meths]
+
+
+class TestGetHookMethods:
+    """Tests for PyHooksLoader.get_hook_methods"""
+
+    @pytest.mark.parametrize(
+        "model,expected",
+        [
+            (Model, ["ModelHook", "AllHook"]),
+            (SubModel, ["ModelHook", "AllHook"]),
+            (OtherModel, ["OtherHook", "AllHook"]),
+            (object, ["AllHook"]),
+            (None, ["OtherHook", "ModelHook", "AllHook"]),
+        ],
+    )
+    def test_filtered_by_model_and_sorted_by_priority(self, loader, model, expected):
+        meths = loader.get_hook_methods(model, "pre_create")
+        assert names(meths) == ["{}.pre_create".format(name) for name in expected]
+
+    def test_disabled_and_missing_methods(self, loader):
+        assert names(loader.get_hook_methods(Model, "post_create")) == ["ModelHook.post_create"]
+        assert loader.get_hook_methods(OtherModel, "post_create") == []
+        assert loader.get_hook_methods(Model, "pre_remove") == []
+
+    def test_hooks_are_initialized_once(self, loader):
+        for model in (Model, SubModel, OtherModel, None, Model):
+            for meth_name in ("pre_create", "post_create"):
+                loader.get_hook_methods(model, meth_name, "lo", dry_run=True)
+        assert len(BaseHook.instances) == 3
+        assert all(hook.args == ("lo",) for hook in BaseHook.instances)
+
+    def test_dispatch_table_is_built_once_per_model(self, loader, monkeypatch):
+        meths = loader.get_hook_methods(Model, "pre_create")
+        assert set(loader._dispatch_tables) == {Model}
+        assert sorted(loader._dispatch_tables[Model]) == ["post_create", "pre_create"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("get_hook_objects() called again")
+
+        monkeypatch.setattr(loader, "get_hook_objects", fail)
+        assert loader.get_hook_methods(Model, "pre_create") is meths
+        assert loader.get_hook_methods(Model, "pre_remove") == []
+
+    def test_drop_cache_rebuilds_dispatch_tables(self, loader):
+        meths = loader.get_hook_methods(Model, "pre_create")
+        loader.drop_cache()
+        assert loader._dispatch_tables == {}
+        new_meths = loader.get_hook_methods(Model, "pre_create")
+        assert names(new_meths) == names(meths)
+        assert new_meths[0].__self__ is not meths[0].__self__
+        assert len(BaseHook.instances) == 6
@@ -180,20 +180,35 @@ class Instance(SchoolBaseModule, ProgressMixin):
 
         SLEEP_TIME = 0.2
         # default: two minutes (as seconds):
-        TIMEOUT_AFTER = int(ucr.get("ucsschool/import/dry-run/timeout", 120)) / SLEEP_TIME
-        i = 0
-        finished = False
-        while not finished:
-            i += 1
-            if i > TIMEOUT_AFTER:
+        timeout_at = time.time() + int(ucr.get("ucsschool/import/dry-run/timeout", 120))
+        long_poll = True
+        job = None
+        while True:
+            remaining = timeout_at - time.time()
+            if remaining <= 0:
                 raise UMC_Error(_("A time out occurred during examining the data."), result=result)
-            time.sleep(SLEEP_TIME)
 
+            client = self.get_client(request)
             try:
-                job = self.get_client(request).userimportjob.get(jobid)
+                if job is None:
+                    job = client.userimportjob.get(jobid)
+                elif long_poll:
+                    # blocks until the job changes (or `remaining` seconds have passed)
+                    job = client.userimportjob.wait(
+                        jobid, job.status, job.result and job.result.date_done, timeout=remaining
+                    )
+                else:
+                    time.sleep(SLEEP_TIME)
+                    job = client.userimportjob.get(jobid)
             except ConnectionError:
+                time.sleep(SLEEP_TIME)
+                continue
+            except ObjectNotFound:
+                if job is None or not long_poll:
+                    raise
+                MODULE.warn("Import server does not support waiting for job changes, polling.")
+                long_poll = False
                 continue
-            finished = job.status in (JOB_FINISHED, JOB_ABORTED)
 
             if job.result and isinstance(job.result.result, dict):
                 progress.progress(True, job.result.result.get("description"))
@@ -201,6 +216,9 @@ class Instance(SchoolBaseModule, ProgressMixin):
             elif job.status == "Started":
                 progress.current = 75.0
 
+            if job.status in (JOB_FINISHED, JOB_ABORTED):
+                break
+
         progress.current = 99.0
         if job.status != JOB_FINISHED:
             message = _("The examination of the data failed.")
@@ -264,8 +282,9 @@ class Instance(SchoolBaseModule, ProgressMixin):
 
     def _jobs(self, request):
         try:
+            # keyset pagination ('cursor'): the pages are fetched without counting or skipping jobs
             return self.get_client(request).userimportjob.list(
-                limit=20, dryrun=False, ordering="date_created"
+                limit=20, dryrun=False, ordering="date_created", cursor=""
             )
         except ServerError as exc:
             raise UMC_Error(
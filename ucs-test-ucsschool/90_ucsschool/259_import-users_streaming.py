@@ -0,0 +1,75 @@
+#!/usr/share/ucs-test/runner python3
+## -*- coding: utf-8 -*-
+## desc: Import users in streaming mode, in batches smaller than the input
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: dangerous
+## packages:
+##   - ucs-school-import
+
+import copy
+
+import univention.testing.strings as uts
+from univention.testing.ucsschool.importusers import Person
+from univention.testing.ucsschool.importusers_cli_v2 import CLI_Import_v2_Tester
+
+
+class Test(CLI_Import_v2_Tester):
+    ou_B = None
+    ou_C = None
+
+    def test(self):
+        """
+        Users are created and modified batch by batch in streaming mode. Users missing in the input
+        are deleted after all batches have been created and modified.
+        """
+        source_uid = "source_uid-%s" % (uts.random_string(),)
+        config = copy.deepcopy(self.default_config)
+        config.update_entry("csv:mapping:Benutzername", "name")
+        config.update_entry("csv:mapping:record_uid", "record_uid")
+        config.update_entry("csv:mapping:role", "__role")
+        config.update_entry("source_uid", source_uid)
+        config.update_entry("user_role", None)
+        config.update_entry("deletion_grace_period:deletion", 0)
+        config.update_entry("streaming:enabled", True)
+        config.update_entry("streaming:batch_size", 2)
+
+        self.log.info("*** Importing 5 users in batches of 2...")
+        person_list = []
+        for role in ("student", "student", "teacher", "staff", "teacher_and_staff"):
+            person = Person(self.ou_A.name, role)
+            person.update(record_uid="record_uid-{}".format(uts.random_string()), source_uid=source_uid)
+            person_list.append(person)
+        fn_csv = self.create_csv_file(person_list=person_list, mapping=config["csv"]["mapping"])
+        fn_config = self.create_config_json(values=config)
+        self.save_ldap_status()
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        self.check_new_and_removed_users(5, 0)
+        for person in person_list:
+            person.verify()
+
+        self.log.info("*** Modifying 3 users, adding 2 users and deleting 2 users...")
+        kept_persons = person_list[:3]
+        removed_persons = person_list[3:]
+        for person in kept_persons:
+            person.set_mode_to_modify()
+            person.lastname = uts.random_name()
+        new_persons = []
+        for role in ("student", "teacher"):
+            person = Person(self.ou_A.name, role)
+            person.update(record_uid="record_uid-{}".format(uts.random_string()), source_uid=source_uid)
+            new_persons.append(person)
+        fn_csv = self.create_csv_file(
+            person_list=kept_persons + new_persons, mapping=config["csv"]["mapping"]
+        )
+        self.save_ldap_status()
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        self.check_new_and_removed_users(2, 2)
+        for person in removed_persons:
+            person.set_mode_to_delete()
+        for person in person_list + new_persons:
+            person.verify()
+
+
+if __name__ == "__main__":
+    Test().run()
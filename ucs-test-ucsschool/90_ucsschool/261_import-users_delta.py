@@ -0,0 +1,73 @@
+#!/usr/share/ucs-test/runner python3
+## -*- coding: utf-8 -*-
+## desc: Users with unchanged input data are skipped in delta mode
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: dangerous
+## packages:
+##   - ucs-school-import
+
+import copy
+import os
+
+import univention.testing.strings as uts
+from univention.testing import utils
+from univention.testing.ucsschool.importusers import Person
+from univention.testing.ucsschool.importusers_cli_v2 import CLI_Import_v2_Tester
+
+
+class Test(CLI_Import_v2_Tester):
+    ou_B = None
+    ou_C = None
+
+    def test(self):
+        """
+        In delta mode a user is only modified, if its input data changed since the last import.
+        --force-full-resync modifies all users.
+        """
+        source_uid = "source_uid-%s" % (uts.random_string(),)
+        config = copy.deepcopy(self.default_config)
+        config.update_entry("csv:mapping:Benutzername", "name")
+        config.update_entry("csv:mapping:record_uid", "record_uid")
+        config.update_entry("csv:mapping:role", "__role")
+        config.update_entry("source_uid", source_uid)
+        config.update_entry("user_role", None)
+        config.update_entry("delta:enabled", True)
+        config.update_entry("delta:database", os.path.join(self.tmpdir, "delta.sqlite"))
+
+        self.log.info("*** Importing 2 users in delta mode...")
+        unchanged, changed = person_list = [
+            Person(self.ou_A.name, "student", description=uts.random_string()),
+            Person(self.ou_A.name, "teacher", description=uts.random_string()),
+        ]
+        for person in person_list:
+            person.update(record_uid="record_uid-{}".format(uts.random_string()), source_uid=source_uid)
+        fn_csv = self.create_csv_file(person_list=person_list, mapping=config["csv"]["mapping"])
+        fn_config = self.create_config_json(values=config)
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        for person in person_list:
+            person.verify()
+
+        self.log.info("*** Changing description of %r in LDAP...", unchanged.username)
+        self.udm.modify_object("users/user", dn=unchanged.dn, description="changed in LDAP")
+
+        self.log.info("*** Importing again, only the input data of %r changed...", changed.username)
+        for person in person_list:
+            person.set_mode_to_modify()
+        changed.lastname = uts.random_name()
+        fn_csv = self.create_csv_file(person_list=person_list, mapping=config["csv"]["mapping"])
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        changed.verify()
+        # skipped: the change in LDAP was not overwritten
+        utils.verify_ldap_object(
+            unchanged.dn, expected_attr={"description": ["changed in LDAP"]}, strict=True
+        )
+
+        self.log.info("*** Importing again with --force-full-resync...")
+        self.run_import(["-c", fn_config, "-i", fn_csv, "--force-full-resync"])
+        for person in person_list:
+            person.verify()
+
+
+if __name__ == "__main__":
+    Test().run()
@@ -0,0 +1,101 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test the journal used to resume aborted import jobs
+## tags: [apptest,ucsschool,ucsschool_import1]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import os
+import stat
+
+import pytest
+
+import univention.testing.strings as uts
+from ucsschool.importer.exceptions import JournalLockedError
+from ucsschool.importer.utils.import_journal import ImportJournal
+
+
+@pytest.fixture()
+def journal(tmpdir):
+    journal = ImportJournal(os.path.join(str(tmpdir), "journal", "{}.jsonl".format(uts.random_name())))
+    yield journal
+    journal.close()
+
+
+def test_records_are_loaded_in_order(journal):
+    records = [{"header": True}] + [
+        {"action": "A", "record_uid": uts.random_name(), "password": uts.random_string()}
+        for _ in range(5)
+    ]
+    journal.write(records[:2])
+    journal.write(records[2:])
+    journal.close()
+    assert journal.exists()
+    assert journal.load() == records
+    assert stat.S_IMODE(os.stat(journal.filename).st_mode) == 0o600
+
+
+def test_incomplete_last_line_is_ignored(journal):
+    complete = {"action": "M", "record_uid": uts.random_name()}
+    journal.write([complete])
+    journal.close()
+    # process killed while writing a record
+    with open(journal.filename, "a") as fp:
+        fp.write('{"action": "A", "record_')
+    assert journal.load() == [complete]
+
+    # the next record starts on a new line
+    resumed = {"action": "D", "record_uid": uts.random_name()}
+    journal.write([resumed])
+    journal.close()
+    assert journal.load() == [complete, resumed]
+
+
+def test_journal_is_locked_while_in_use(journal):
+    journal.write([{"header": True}])
+    other = ImportJournal(journal.filename)
+    with pytest.raises(JournalLockedError):
+        other.write([{"header": True}])
+    journal.close()
+    other.write([{"action": "A"}])
+    other.close()
+    assert journal.load() == [{"header": True}, {"action": "A"}]
+
+
+def test_is_locked(journal):
+    other = ImportJournal(journal.filename)
+    assert not other.is_locked()
+    journal.write([{"header": True}])
+    assert other.is_locked()
+    journal.close()
+    assert not other.is_locked()
+
+
+def test_forked_processes_write_records_completely(journal):
+    journal.write([{"header": True}])
+    pids = []
+    for worker in range(4):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                journal.write([{"action": "A", "worker": worker, "num": num} for num in range(100)])
+            except Exception:
+                os._exit(1)
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        assert os.waitpid(pid, 0)[1] == 0
+    journal.close()
+    records = journal.load()
+    assert records[0] == {"header": True}
+    assert sorted((record["worker"], record["num"]) for record in records[1:]) == [
+        (worker, num) for worker in range(4) for num in range(100)
+    ]
+
+
+def test_remove(journal):
+    journal.write([{"header": True}])
+    journal.remove()
+    assert not journal.exists()
+    journal.remove()  # no error if missing
@@ -0,0 +1,75 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test the snapshot of an existing user used as old_user when modifying
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import copy
+
+import pytest
+
+import univention.testing.strings as uts
+from ucsschool.importer.models.import_user import ImportUserSnapshot
+from ucsschool.importer.utils.shell import ImportStudent
+
+
+@pytest.fixture()
+def student():
+    school = uts.random_name()
+    return ImportStudent(
+        name=uts.random_username(),
+        school=school,
+        firstname=uts.random_name(),
+        lastname=uts.random_name(),
+        school_classes={school: ["{}-{}".format(school, uts.random_name())]},
+        udm_properties={"title": uts.random_name()},
+        record_uid=uts.random_name(),
+        source_uid=uts.random_name(),
+    )
+
+
+def test_snapshot_does_not_change_with_user(student):
+    before = copy.deepcopy(student.to_dict())
+    snapshot = ImportUserSnapshot(student)
+
+    student.firstname = uts.random_name()
+    student.school_classes[student.school].append("{}-{}".format(student.school, uts.random_name()))
+    student.udm_properties["title"] = uts.random_name()
+
+    assert isinstance(snapshot, ImportStudent)
+    assert snapshot.name == before["name"]
+    assert snapshot.dn == before["$dn$"]
+    assert snapshot.firstname == before["firstname"]
+    assert snapshot.school_classes == before["school_classes"]
+    assert snapshot.udm_properties == before["udm_properties"]
+    assert snapshot.old_user is None
+
+
+def test_reading_attributes_does_not_create_user_object(student):
+    snapshot = ImportUserSnapshot(student)
+    assert snapshot.lastname == student.lastname
+    assert snapshot.record_uid == student.record_uid
+    assert snapshot._user is None
+
+
+def test_materialized_snapshot_is_independent_of_user(student):
+    firstname = student.firstname
+    snapshot = ImportUserSnapshot(student)
+
+    snapshot.firstname = uts.random_name()
+    assert snapshot._user is not None
+    assert snapshot.firstname != firstname
+    assert student.firstname == firstname
+    # the method of ImportUser is used
+    assert snapshot.to_dict()["firstname"] == snapshot.firstname
+
+
+def test_deepcopy_returns_import_user(student):
+    snapshot = ImportUserSnapshot(student)
+    user = copy.deepcopy(snapshot)
+    assert type(user) is ImportStudent
+    assert user.name == student.name
+    assert user.school_classes == student.school_classes
@@ -0,0 +1,173 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test the in-memory LDAP directory used by the import benchmark
+## tags: [apptest,ucsschool,ucsschool_import1]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import pytest
+
+from ucsschool.importer.utils.memory_ldap import InMemoryAccess, parse_filter
+from univention.admin.uexceptions import insufficientInformation, noObject, objectExists
+
+BASE = "dc=example,dc=com"
+USERS = "cn=users,{}".format(BASE)
+ALICE = "uid=alice,{}".format(USERS)
+BOB = "uid=bob,{}".format(USERS)
+CAROL = "uid=Carol,{}".format(USERS)
+
+
+@pytest.fixture()
+def lo():
+    lo = InMemoryAccess(BASE)
+    lo.add_entry(USERS, {"objectClass": [b"organizationalRole"], "cn": [b"users"]})
+    for dn, uid, number in ((ALICE, "alice", 5), (BOB, "bob", 12), (CAROL, "Carol", 100)):
+        lo.add_entry(
+            dn,
+            {
+                "objectClass": [b"person", b"posixAccount"],
+                "uid": [uid.encode("utf-8")],
+                "uidNumber": [str(number).encode("ascii")],
+                "sn": [uid.upper().encode("utf-8")],
+            },
+        )
+    return lo
+
+
+def dns(lo, filter_s, **kwargs):
+    return sorted(dn for dn, _attrs in lo.search(filter_s, **kwargs))
+
+
+def test_parse_filter_and_or_not():
+    assert parse_filter("(&(objectClass=Person)(|(uid=a)(uid=B))(!(cn=x)))") == (
+        "&",
+        [
+            ("=", "objectclass", b"person"),
+            ("|", [("=", "uid", b"a"), ("=", "uid", b"b")]),
+            ("!", ("=", "cn", b"x")),
+        ],
+    )
+
+
+def test_parse_filter_presence_without_parentheses():
+    assert parse_filter(" uid=* ") == ("=*", "uid")
+
+
+def test_parse_filter_substring():
+    op, attr, regex = parse_filter("(uid=Ab*c*)")
+    assert (op, attr) == ("sub", "uid")
+    assert regex.match(b"abc")
+    assert regex.match(b"abxxcyy")
+    assert not regex.match(b"xabc")
+
+
+def test_parse_filter_escaping():
+    assert parse_filter(r"(cn=a\2a\28b\29)") == ("=", "cn", b"a*(b)")
+    _op, _attr, regex = parse_filter(r"(cn=a\2a*)")
+    assert regex.match(b"a*x")
+    assert not regex.match(b"abc")
+
+
+@pytest.mark.parametrize("filter_s", ["(uid=a", "(uid=a))", "(&(uid=a)", "uid=a)(uid=b"])
+def test_parse_filter_invalid(filter_s):
+    with pytest.raises(ValueError):
+        parse_filter(filter_s)
+
+
+def test_search_is_case_insensitive(lo):
+    # indexed and not indexed attribute
+    assert dns(lo, "(uid=ALICE)") == [ALICE]
+    assert dns(lo, "(sn=alice)") == [ALICE]
+    assert dns(lo, "(uid=carol)") == [CAROL]
+    assert lo.get(ALICE.upper())["uid"] == [b"alice"]
+
+
+def test_search_filters(lo):
+    assert dns(lo, "(uid=*o*)") == [CAROL, BOB]
+    assert dns(lo, "(&(objectClass=posixAccount)(!(uid=bob)))") == [CAROL, ALICE]
+    assert dns(lo, "(|(uid=alice)(sn=BOB))") == [ALICE, BOB]
+    assert dns(lo, "(uidNumber>=12)") == [CAROL, BOB]
+    assert dns(lo, "(uidNumber<=12)") == [ALICE, BOB]
+    assert dns(lo, "(mail=*)") == []
+
+
+def test_search_scope_and_attributes(lo):
+    assert dns(lo, "(objectClass=*)", base=USERS, scope="one") == [CAROL, ALICE, BOB]
+    assert dns(lo, "(objectClass=*)", base=USERS, scope="base") == [USERS]
+    assert dns(lo, "(objectClass=*)", base=USERS) == [USERS, CAROL, ALICE, BOB]
+    assert lo.search("(uid=alice)", attr=["uid"]) == [(ALICE, {"uid": [b"alice"]})]
+    assert "entryDN" in lo.get(ALICE, ["+"])
+    assert "entryDN" not in lo.get(ALICE)
+    with pytest.raises(insufficientInformation):
+        lo.search("(objectClass=person)", unique=True)
+    with pytest.raises(noObject):
+        lo.search("(uid=nobody)", required=True)
+    with pytest.raises(noObject):
+        lo.search("(objectClass=*)", base="cn=missing,{}".format(BASE))
+
+
+def test_add(lo):
+    dn = "uid=dave,{}".format(USERS)
+    assert lo.add(dn, [("objectClass", [b"person"]), ("uid", b"dave"), ("description", "")]) == dn
+    attrs = lo.get(dn, ["*", "+"])
+    assert attrs["uid"] == [b"dave"]
+    assert "description" not in attrs
+    assert "entryUUID" in attrs
+    assert dns(lo, "(uid=dave)") == [dn]
+    assert lo.operations["add"] == 1
+    with pytest.raises(objectExists):
+        lo.add(dn, [("uid", b"dave")])
+
+
+def test_modify(lo):
+    lo.modify(
+        ALICE,
+        [
+            ("sn", b"ALICE", b"Smith"),
+            ("mail", None, b"alice@example.com"),
+            ("objectClass", [b"posixAccount"], None),
+        ],
+    )
+    attrs = lo.get(ALICE)
+    assert attrs["sn"] == [b"Smith"]
+    assert attrs["mail"] == [b"alice@example.com"]
+    assert attrs["objectClass"] == [b"person"]
+    # the index was updated
+    assert dns(lo, "(objectClass=posixAccount)") == [CAROL, BOB]
+    assert dns(lo, "(sn=smith)") == [ALICE]
+    assert lo.operations["modify"] == 1
+    with pytest.raises(noObject):
+        lo.modify("uid=nobody,{}".format(USERS), [("sn", None, b"x")])
+
+
+def test_modify_of_rdn_attribute_renames_entry(lo):
+    new_dn = lo.modify(BOB, [("uid", b"bob", b"robert")])
+    assert new_dn == "uid=robert,{}".format(USERS)
+    assert lo.get(BOB) == {}
+    assert dns(lo, "(uid=robert)") == [new_dn]
+    assert dns(lo, "(uid=bob)") == []
+
+
+def test_rename_moves_subtree(lo):
+    people = "cn=people,{}".format(BASE)
+    assert lo.rename(USERS, people) == people
+    assert lo.get(USERS) == {}
+    assert lo.get(people)["cn"] == [b"people"]
+    alice = "uid=alice,{}".format(people)
+    assert lo.get(alice)["uid"] == [b"alice"]
+    assert lo.get(ALICE) == {}
+    assert dns(lo, "(uid=alice)") == [alice]
+    assert len(lo.search("(objectClass=*)", base=people, scope="one")) == 3
+    with pytest.raises(noObject):
+        lo.rename(USERS, "cn=others,{}".format(BASE))
+    with pytest.raises(objectExists):
+        lo.rename(alice, "uid=bob,{}".format(people))
+
+
+def test_delete(lo):
+    lo.delete(ALICE)
+    assert dns(lo, "(uid=alice)") == []
+    assert lo.get(ALICE) == {}
+    with pytest.raises(noObject):
+        lo.delete(ALICE)
@@ -0,0 +1,101 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test the index of usernames used to check their uniqueness
+## tags: [apptest,ucsschool,ucsschool_import1]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import pytest
+
+from ucsschool.importer.utils.memory_ldap import InMemoryAccess
+from ucsschool.importer.utils.username_index import UsernameIndex, UsernameUniquenessTuple
+
+BASE = "dc=example,dc=com"
+USERS = "cn=users,{}".format(BASE)
+
+
+@pytest.fixture()
+def index():
+    index = UsernameIndex()
+    index["alice"] = UsernameUniquenessTuple("r-alice", "db1", "uid=alice,{}".format(USERS))
+    index["bob"] = UsernameUniquenessTuple("r-bob", "db1", "uid=bob,{}".format(USERS))
+    return index
+
+
+def test_add(index):
+    index["carol"] = UsernameUniquenessTuple(None, None, "uid=carol,cn=others,{}".format(BASE))
+    assert len(index) == 3
+    assert sorted(index) == ["alice", "bob", "carol"]
+    assert index["alice"] == ("r-alice", "db1", "uid=alice,{}".format(USERS))
+    assert index["carol"] == (None, None, "uid=carol,cn=others,{}".format(BASE))
+    # source_uids and parent DNs are stored once
+    assert len(index._strings) == 4
+
+
+def test_lookups_are_case_insensitive(index):
+    assert "ALICE" in index
+    assert index["Alice"] == index["alice"]
+    assert index.get("BoB").record_uid == "r-bob"
+    assert "dave" not in index
+    assert index.get("Dave") is None
+
+
+def test_dn_that_is_not_recreated_from_username(index):
+    index["Dave"] = UsernameUniquenessTuple("r-dave", "db2", "uid=Dave,{}".format(USERS))
+    index["eve"] = UsernameUniquenessTuple("r-eve", "db2", "cn=Eve Smith,{}".format(USERS))
+    assert sorted(index) == ["alice", "bob", "dave", "eve"]
+    assert index["dave"].dn == "uid=Dave,{}".format(USERS)
+    assert index["EVE"].dn == "cn=Eve Smith,{}".format(USERS)
+
+
+def test_modify(index):
+    index["ALICE"] = UsernameUniquenessTuple("r-alice2", "db2", "uid=alice,cn=others,{}".format(BASE))
+    assert len(index) == 2
+    assert index["alice"] == ("r-alice2", "db2", "uid=alice,cn=others,{}".format(BASE))
+
+
+def test_rename(index):
+    uut = index.pop("Alice")
+    index["alice2"] = uut._replace(dn="uid=alice2,{}".format(USERS))
+    assert "alice" not in index
+    assert index["alice2"] == ("r-alice", "db1", "uid=alice2,{}".format(USERS))
+    assert sorted(index) == ["alice2", "bob"]
+
+
+def test_delete(index):
+    del index["BOB"]
+    assert "bob" not in index
+    assert len(index) == 1
+    with pytest.raises(KeyError):
+        del index["bob"]
+    index.clear()
+    assert len(index) == 0
+    assert not index.loaded
+
+
+def test_load():
+    lo = InMemoryAccess(BASE)
+    lo.add_entry(
+        "uid=Alice,{}".format(USERS),
+        {
+            "objectClass": [b"posixAccount"],
+            "uid": [b"Alice"],
+            "ucsschoolRecordUID": [b"r-alice"],
+            "ucsschoolSourceUID": [b"db1"],
+        },
+    )
+    lo.add_entry("uid=bob,{}".format(USERS), {"objectClass": [b"posixAccount"], "uid": [b"bob"]})
+    lo.add_entry(
+        "cn=pc01,cn=computers,{}".format(BASE), {"objectClass": [b"posixAccount"], "uid": [b"pc01$"]}
+    )
+    index = UsernameIndex()
+    index.load(lo)
+    assert index.loaded
+    assert sorted(index) == ["alice", "bob"]
+    assert index["alice"] == ("r-alice", "db1", "uid=Alice,{}".format(USERS))
+    assert index["bob"] == (None, None, "uid=bob,{}".format(USERS))
+    # loaded only once
+    del index["bob"]
+    index.load(lo)
+    assert "bob" not in index
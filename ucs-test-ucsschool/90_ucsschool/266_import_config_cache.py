@@ -0,0 +1,121 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test the cache of compiled import configurations
+## tags: [apptest,ucsschool,ucsschool_import1]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import json
+import os
+import time
+
+import pytest
+
+from ucsschool.importer.utils.config_cache import ConfigurationCache
+
+
+def touch(path, offset=10):
+    """Set the modification time of `path` to `offset` seconds from now."""
+    mtime = time.time() + offset
+    os.utime(str(path), (mtime, mtime))
+
+
+@pytest.fixture()
+def cache(tmpdir):
+    return ConfigurationCache(cache_dir=str(tmpdir.join("cache")), max_age=60)
+
+
+@pytest.fixture()
+def files(tmpdir):
+    config = tmpdir.join("config.json")
+    config.write(json.dumps({"source_uid": "db1"}))
+    schema = tmpdir.join("schema.json")
+    schema.write(json.dumps({"type": "object"}))
+    hooks_dir = tmpdir.mkdir("pyhooks")
+    hooks_dir.join("hook.py").write("# hook\n")
+    checks_dir = tmpdir.mkdir("checks")
+    checks_dir.join("check.py").write("# check\n")
+    return {"config": config, "schema": schema, "hooks": hooks_dir, "checks": checks_dir}
+
+
+def cache_files(cache):
+    return sorted(os.listdir(cache.cache_dir)) if os.path.isdir(cache.cache_dir) else []
+
+
+def test_store_and_load(cache, files):
+    key = cache.files_key([str(files["config"])], str(files["schema"]))
+    assert cache.load(key) is None
+    cache.store(key, {"source_uid": "db1"})
+    assert cache.load(key) == {"source_uid": "db1"}
+    # stored atomically, no temporary files are left behind
+    assert cache_files(cache) == ["{}.json".format(key)]
+
+
+@pytest.mark.parametrize("name", ["config", "schema"])
+def test_config_file_change_changes_key(cache, files, name):
+    key = cache.files_key([str(files["config"])], str(files["schema"]))
+    cache.store(key, {"source_uid": "db1"})
+    touch(files[name])
+    new_key = cache.files_key([str(files["config"])], str(files["schema"]))
+    assert new_key != key
+    assert cache.load(new_key) is None
+
+
+@pytest.mark.parametrize("name", ["hooks", "checks"])
+def test_dependency_change_invalidates_entry(cache, files, name):
+    files_key = cache.files_key([str(files["config"])], str(files["schema"]))
+    key = cache.checked_key(files_key, {"dry_run": True})
+    dependencies = cache.dependencies(str(files["hooks"]), str(files["checks"]))
+    cache.store(key, {"dry_run": True}, dependencies)
+    assert cache.load(key) == {"dry_run": True}
+    # modified file
+    touch(files[name].listdir()[0])
+    assert cache.load(key) is None
+
+    dependencies = cache.dependencies(str(files["hooks"]), str(files["checks"]))
+    cache.store(key, {"dry_run": True}, dependencies)
+    assert cache.load(key) == {"dry_run": True}
+    # added file
+    files[name].join("new.py").write("# new\n")
+    touch(files[name])
+    assert cache.load(key) is None
+
+
+def test_expired_entries_are_ignored_and_removed(cache, files):
+    key = cache.files_key([str(files["config"])], str(files["schema"]))
+    cache.store(key, {"source_uid": "db1"})
+    touch(os.path.join(cache.cache_dir, "{}.json".format(key)), -120)
+    assert cache.load(key) is None
+    other_key = cache.checked_key(key, {})
+    cache.store(other_key, {"source_uid": "db1"})
+    assert cache_files(cache) == ["{}.json".format(other_key)]
+
+
+def test_not_serializable_kwargs_are_not_cached(cache, files):
+    def progress_notification_function(**kwargs):
+        pass
+
+    files_key = cache.files_key([str(files["config"])], str(files["schema"]))
+    plain, volatile = cache.split_kwargs(
+        {"dry_run": True, "progress_notification_function": progress_notification_function}
+    )
+    assert plain == {"dry_run": True}
+    assert volatile == {"progress_notification_function": progress_notification_function}
+    assert cache.checked_key(files_key, plain) != cache.checked_key(files_key, {"dry_run": False})
+    assert cache.checked_key(files_key, {"school": object()}) is None
+
+    key = cache.checked_key(files_key, plain)
+    cache.store(key, {"school": object()})
+    assert cache.load(key) is None
+    assert cache_files(cache) == []
+
+
+def test_disabled_cache(tmpdir, files):
+    cache = ConfigurationCache(cache_dir=str(tmpdir.join("cache")), enabled=False)
+    key = cache.files_key([str(files["config"])], str(files["schema"]))
+    assert key is None
+    assert cache.checked_key(key, {}) is None
+    cache.store(key, {"source_uid": "db1"})
+    assert cache.load(key) is None
+    assert cache_files(cache) == []
@@ -0,0 +1,190 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test reserving blocks of username counter values
+## tags: [apptest,ucsschool,ucsschool_import1]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import pytest
+
+from ucsschool.importer.exceptions import BadValueStored, NoValueStored
+from ucsschool.importer.utils.memory_ldap import InMemoryAccess, normalize_dn
+from ucsschool.importer.utils.username_handler import LeasedLdapStorageBackend
+from univention.admin.uexceptions import ldapError
+
+BASE = "dc=example,dc=com"
+COUNTERS = "cn=unique-usernames,cn=ucsschool,cn=univention,{}".format(BASE)
+LEASE_SIZE = 10
+
+
+class ConditionalAccess(InMemoryAccess):
+    """InMemoryAccess, that fails modifications of values that are not current, like a LDAP server."""
+
+    def __init__(self, base):
+        super(ConditionalAccess, self).__init__(base)
+        self.fail_modifications = 0
+
+    def modify(self, dn, changes, *args, **kwargs):
+        entry = self._entries.get(normalize_dn(dn))
+        for attr, old_value, new_value in changes:
+            current = entry.attrs.get(attr.lower(), []) if entry else []
+            if self.fail_modifications or (old_value and new_value and old_value not in current):
+                self.operations["modify"] += 1
+                self.fail_modifications = max(self.fail_modifications - 1, 0)
+                raise ldapError("{}: no such value {!r}".format(attr, old_value))
+        return super(ConditionalAccess, self).modify(dn, changes, *args, **kwargs)
+
+
+@pytest.fixture()
+def lo():
+    lo = ConditionalAccess(BASE)
+    lo.add_entry(COUNTERS, {"objectClass": [b"organizationalRole"], "cn": [b"unique-usernames"]})
+    for name, value in (("alice", 5), ("bob", 2), ("broken", "x")):
+        set_counter(lo, name, value)
+    lo.operations.clear()
+    return lo
+
+
+def backend(lo):
+    return LeasedLdapStorageBackend("usernames", LEASE_SIZE, lo, lo.get_position())
+
+
+def set_counter(lo, name, value):
+    lo.add_entry(
+        "cn={},{}".format(name, COUNTERS),
+        {
+            "objectClass": [b"ucsschoolUsername"],
+            "cn": [name.encode("UTF-8")],
+            "ucsschoolUsernameNextNumber": [str(value).encode("UTF-8")],
+        },
+    )
+
+
+def counter(lo, name):
+    """Value of the counter `name`, without counting a search."""
+    entry = lo._entries[normalize_dn("cn={},{}".format(name, COUNTERS))]
+    return int(entry.attrs["ucsschoolusernamenextnumber"][0])
+
+
+def use_values(storage, name, num):
+    """Hand out `num` values like the username handler does."""
+    values = []
+    for _i in range(num):
+        value = storage.retrieve(name)
+        storage.modify(name, value, value + 1)
+        values.append(value)
+    return values
+
+
+def test_create_reserves_block(lo):
+    storage = backend(lo)
+    storage.create("Carol", 2)
+    assert counter(lo, "carol") == 2 + LEASE_SIZE
+    assert use_values(storage, "carol", LEASE_SIZE) == list(range(2, 2 + LEASE_SIZE))
+    assert lo.operations["modify"] == 0
+
+
+def test_lease_reserves_block_with_one_modify(lo):
+    storage = backend(lo)
+    assert use_values(storage, "alice", LEASE_SIZE) == list(range(5, 5 + LEASE_SIZE))
+    assert counter(lo, "alice") == 5 + LEASE_SIZE
+    assert lo.operations["modify"] == 1
+    # the next block starts where the last one ended, without reading the counter again
+    lo.operations.clear()
+    assert use_values(storage, "ALICE", 1) == [5 + LEASE_SIZE]
+    assert counter(lo, "alice") == 5 + 2 * LEASE_SIZE
+    assert lo.operations == {"modify": 1}
+
+
+def test_retrieve_missing_or_broken_counter(lo):
+    storage = backend(lo)
+    with pytest.raises(NoValueStored):
+        storage.retrieve("dave")
+    with pytest.raises(BadValueStored):
+        storage.retrieve("broken")
+
+
+def test_prewarm(lo):
+    storage = backend(lo)
+    storage.prewarm(["Alice", "bob", "dave", "broken"])
+    assert lo.operations == {"search": 1}
+    lo.operations.clear()
+    assert storage.retrieve("alice") == 5
+    assert storage.retrieve("BOB") == 2
+    assert lo.operations == {"modify": 2}
+    # known to be missing, without reading it again
+    with pytest.raises(NoValueStored):
+        storage.retrieve("dave")
+    # not prewarmed, left to retrieve()
+    with pytest.raises(BadValueStored):
+        storage.retrieve("broken")
+    # leased counters are not read again
+    lo.operations.clear()
+    storage.prewarm(["alice", "bob"])
+    assert lo.operations["search"] == 0
+
+
+def test_prewarm_in_chunks(lo, monkeypatch):
+    monkeypatch.setattr(LeasedLdapStorageBackend, "PREWARM_NAMES_PER_SEARCH", 2)
+    storage = backend(lo)
+    storage.prewarm(["alice", "bob", "carol", "dave", "eve"])
+    assert lo.operations == {"search": 3}
+
+
+def test_retry_after_conflicting_modify(lo):
+    storage = backend(lo)
+    storage.prewarm(["alice"])
+    # another import reserved values after the counter was read
+    other = backend(lo)
+    assert use_values(other, "alice", 1) == [5]
+    lo.operations.clear()
+    assert use_values(storage, "alice", 1) == [5 + LEASE_SIZE]
+    assert counter(lo, "alice") == 5 + 2 * LEASE_SIZE
+    # the outdated value failed, the current one was read and reserved
+    assert lo.operations == {"modify": 2, "search": 1}
+
+
+def test_retry_after_conflicting_modify_of_next_block(lo):
+    storage = backend(lo)
+    assert use_values(storage, "alice", LEASE_SIZE) == list(range(5, 5 + LEASE_SIZE))
+    other = backend(lo)
+    assert use_values(other, "alice", 1) == [5 + LEASE_SIZE]
+    assert use_values(storage, "alice", 1) == [5 + 2 * LEASE_SIZE]
+    assert counter(lo, "alice") == 5 + 3 * LEASE_SIZE
+
+
+def test_lease_gives_up(lo):
+    storage = backend(lo)
+    lo.fail_modifications = LeasedLdapStorageBackend.LEASE_ATTEMPTS
+    with pytest.raises(BadValueStored):
+        storage.retrieve("alice")
+    assert lo.operations["modify"] == LeasedLdapStorageBackend.LEASE_ATTEMPTS
+    assert counter(lo, "alice") == 5
+
+
+def test_release_returns_unused_values(lo):
+    storage = backend(lo)
+    assert use_values(storage, "alice", 3) == [5, 6, 7]
+    assert use_values(storage, "bob", LEASE_SIZE) == list(range(2, 2 + LEASE_SIZE))
+    lo.operations.clear()
+    storage.release()
+    assert counter(lo, "alice") == 8
+    assert counter(lo, "bob") == 2 + LEASE_SIZE
+    # used up leases are not written
+    assert lo.operations == {"modify": 1}
+    # the next lease reads the counter again
+    assert use_values(storage, "alice", 1) == [8]
+
+
+def test_release_when_counter_was_advanced(lo):
+    storage = backend(lo)
+    assert use_values(storage, "alice", 3) == [5, 6, 7]
+    other = backend(lo)
+    assert use_values(other, "alice", 1) == [5 + LEASE_SIZE]
+    # the conditional modify fails, the values of the other import are not handed out twice
+    storage.release()
+    assert counter(lo, "alice") == 5 + 2 * LEASE_SIZE
+    other.release()
+    assert counter(lo, "alice") == 5 + LEASE_SIZE + 1
+    assert use_values(backend(lo), "alice", 1) == [5 + LEASE_SIZE + 1]
@@ -0,0 +1,127 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: test splitting the users of an import into chunks that can be handled concurrently
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import pytest
+
+from ucsschool.importer.mass_import.user_import import UserImport
+from ucsschool.importer.utils.shell import ImportStudent, config
+
+SCHOOL = "school1"
+
+
+class ChunkingUserImport(UserImport):
+    """UserImport with the unique names of the users given, instead of approximating them."""
+
+    def __init__(self, unique_names):
+        # no call to super(): no connections are needed
+        self.config = config
+        self.unique_names = unique_names
+
+    def get_unique_names(self, imported_user):
+        return self.unique_names.get(imported_user.record_uid, {})
+
+
+def make_users(*school_classes):
+    """Create one student per school class, with the record_uids 'r0', 'r1', ..."""
+    return [
+        (
+            num,
+            ImportStudent(
+                name="student{}".format(num),
+                school=SCHOOL,
+                firstname="Stu",
+                lastname="Dent{}".format(num),
+                school_classes={SCHOOL: [school_class]} if school_class else {},
+                record_uid="r{}".format(num),
+                source_uid="TestDB",
+            ),
+        )
+        for num, school_class in enumerate(school_classes)
+    ]
+
+
+def chunk_nums(chunks):
+    return [[num for num, _user in chunk] for chunk in chunks]
+
+
+def test_conflict_keys():
+    _num, user = make_users("{}-5A".format(SCHOOL))[0]
+    user.school_classes[SCHOOL].append("6 b")
+    user_import = ChunkingUserImport(
+        {"r0": {"username": ("Anton", None), "email": ("a.b@example.com", "a.b")}}
+    )
+    assert user_import.get_parallel_conflict_keys(user) == [
+        "record_uid:r0",
+        "name:anton",
+        "email:a.b",
+        "class:{}-5a".format(SCHOOL),
+        "class:{}-6 b".format(SCHOOL),
+    ]
+
+
+def test_conflict_keys_use_base_of_names_with_counter():
+    _num, user = make_users(None)[0]
+    user_import = ChunkingUserImport(
+        {"r0": {"username": ("anton.meier", "Anton.Mei"), "email": ("anton.meier@example.com", "anton")}}
+    )
+    assert user_import.get_parallel_conflict_keys(user) == [
+        "record_uid:r0",
+        "name:anton.mei",
+        "email:anton",
+    ]
+
+
+@pytest.mark.parametrize("num_chunks,expected", [(3, [[0, 1], [2, 3], [4, 5]]), (1, [list(range(6))])])
+def test_users_without_conflicts_are_distributed(num_chunks, expected):
+    users = make_users(*[None] * 6)
+    chunks = ChunkingUserImport({}).get_parallel_chunks(users, num_chunks)
+    assert chunk_nums(chunks) == expected
+
+
+def test_more_chunks_than_users():
+    users = make_users(None, None)
+    chunks = ChunkingUserImport({}).get_parallel_chunks(users, 8)
+    assert chunk_nums(chunks) == [[0], [1]]
+
+
+@pytest.mark.parametrize("shared", ["record_uid", "username", "email", "school_class"])
+def test_users_sharing_a_key_are_in_the_same_chunk(shared):
+    school_classes = ["{}-{}".format(SCHOOL, num) for num in range(6)]
+    unique_names = {
+        "r{}".format(num): {
+            "username": ("user{}".format(num), None),
+            "email": ("m{}@x.org".format(num), None),
+        }
+        for num in range(6)
+    }
+    if shared == "school_class":
+        school_classes[4] = school_classes[1]
+    elif shared in ("username", "email"):
+        unique_names["r4"][shared] = ("name4", "shared")
+        unique_names["r1"][shared] = ("name1", "Shared")
+    users = make_users(*school_classes)
+    if shared == "record_uid":
+        users[4][1].record_uid = "r1"
+    chunks = ChunkingUserImport(unique_names).get_parallel_chunks(users, 3)
+    # groups of users are added to a chunk until it is full, in the order of the input data
+    assert chunk_nums(chunks) == [[0, 1, 4], [2, 3], [5]]
+
+
+def test_conflicts_are_transitive():
+    users = make_users("{}-a".format(SCHOOL), None, "{}-A".format(SCHOOL), None, None, None)
+    unique_names = {"r2": {"username": ("bob", "bo")}, "r5": {"username": ("bolt", "BO")}}
+    chunks = ChunkingUserImport(unique_names).get_parallel_chunks(users, 6)
+    assert chunk_nums(chunks) == [[0, 2, 5], [1], [3], [4]]
+
+
+def test_all_users_in_one_chunk():
+    users = make_users(*["{}-a".format(SCHOOL)] * 4)
+    chunks = ChunkingUserImport({}).get_parallel_chunks(users, 4)
+    assert chunk_nums(chunks) == [[0, 1, 2, 3]]
+    assert [user for chunk in chunks for user in chunk] == users